@@ -1,5 +1,5 @@
 import pandas as pd
-from openalea.astk.sky_irradiance import sky_irradiance
+from openalea.astk.sky_irradiance import daily_sky_irradiances
 from openalea.astk.sky_sources import sky_sources, caribu_light_sources
 
 
@@ -20,8 +20,8 @@ def test_day_to_hour():
     'timezone': 'Europe/Paris'}
 
 
-    for row in df.itertuples():
-        irr = sky_irradiance(daydate=row.daydate, day_ghi=row.rad, **location)
+    hourly = daily_sky_irradiances(df.daydate, df.rad, **location)
+    for day, irr in hourly.groupby(hourly.index.date):
         sun, sky = sky_sources(sky_type='blended', sky_irradiance=irr, scale='global')
         lights = caribu_light_sources(sun, sky)
         # then caribu with caribuscene(scene,light=lights,...)
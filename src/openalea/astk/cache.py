@@ -0,0 +1,57 @@
+# -*- python -*-
+#
+#       Copyright 2016-2025 Inria - CIRAD - INRAe
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+#       WebSite : https://github.com/openalea/astk
+#
+# ==============================================================================
+""" On-disk cache of precomputed astk data (turtles, solar geometry tables)
+"""
+
+import os
+import tempfile
+
+
+def cache_dir():
+    """ Directory where astk caches data on disk: the ASTK_CACHE_DIR
+    environment variable if set, the openalea.astk directory of the user cache
+    (XDG_CACHE_HOME, defaulting to ~/.cache) otherwise"""
+    directory = os.environ.get('ASTK_CACHE_DIR')
+    if directory is None:
+        cache_home = os.environ.get('XDG_CACHE_HOME',
+                                    os.path.join(os.path.expanduser('~'),
+                                                 '.cache'))
+        directory = os.path.join(cache_home, 'openalea.astk')
+    return directory
+
+
+def save_atomic(path, save):
+    """ Write a cache file atomically
+
+    The file is written to a temporary file of the same directory, that is
+    renamed to path once complete, so that concurrent readers never see a
+    partial file.
+
+    Args:
+        path (str): the path of the file
+        save: a function writing the content of the file to a binary file
+            object passed as argument
+    """
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=os.path.splitext(path)[1], dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            save(f)
+        # mkstemp creates files readable by their owner only
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
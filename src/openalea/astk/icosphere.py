@@ -23,8 +23,10 @@ hexagonal/pentagonal duals.
 """
 
 import math
+import os
 import numpy
-from functools import reduce
+
+from openalea.astk.cache import cache_dir, save_atomic
 
 
 def normed(point):
@@ -157,70 +159,84 @@ def icosahedron():
     return vertices, faces
 
 
+def _normed(points):
+    """ normalised coordinates of an array of (x, y, z) points"""
+    points = numpy.asarray(points, dtype=float)
+    x, y, z = points[..., 0], points[..., 1], points[..., 2]
+    radius = numpy.sqrt(x ** 2 + y ** 2 + z ** 2)
+    return points / radius[..., None]
+
+
+def _padded(faces):
+    """ (F, m) array of vertex indices, padded with -1, and (F,) number of
+    vertices of (possibly ragged) faces"""
+    if isinstance(faces, numpy.ndarray) and faces.ndim == 2:
+        return faces.astype(int), numpy.full(len(faces), faces.shape[1])
+    n = numpy.array([len(f) for f in faces], dtype=int)
+    if len(n) > 0 and numpy.all(n == n[0]):
+        return numpy.array(faces, dtype=int).reshape(len(n), n[0]), n
+    padded = numpy.full((len(n), n.max(initial=0)), -1, dtype=int)
+    padded[numpy.arange(padded.shape[1]) < n[:, None]] = numpy.concatenate(
+        [numpy.asarray(f, dtype=int) for f in faces] + [numpy.zeros(0, int)])
+    return padded, n
+
+
+def _centroids(vertices, padded, n):
+    """ centroids of padded faces"""
+    total = numpy.zeros((len(padded), 3))
+    for j in range(padded.shape[1]):
+        valid = j < n
+        total[valid] += vertices[padded[valid, j]]
+    return total / n[:, None]
+
+
 def split_triangles(vertices, faces, tags=None):
     """ Iterate an icosphere by sub-dividing each triangle into 4.
 
     Args:
-        vertices (list of tuples): list of 3D coordinates of icosphere vertices
-        faces (list of tuple): list of vertex indices defining the faces
-        tags (list of int): list of integer identifying a face. if None (default)
-        no tags are returned
+        vertices (array-like): (V, 3) 3D coordinates of icosphere vertices
+        faces (array-like): (F, 3) vertex indices defining the faces
+        tags (array-like of int): (F,) integers identifying a face. if None
+        (default) no tags are returned
     Returns:
-        a list of vertices and a list of faces and, if tags is not None, a list
-        of tags referencing the tag of the parent face
-
-    This is a python implementation of the C code found here:
-    http://blog.andreaskahler.com/2009/06/creating-icosphere-mesh-in-code.html
+        a (V', 3) array of vertices and a (4F, 3) array of faces and, if tags is
+        not None, a (4F,) array of tags referencing the tag of the parent face
+
+    Details:
+        Middle points of edges are found through hashing of the (sorted) vertex
+        pairs, and are numbered in order of first encounter of their edge when
+        iterating faces, as in the C code found here:
+        http://blog.andreaskahler.com/2009/06/creating-icosphere-mesh-in-code.html
 """
-    # copy input
-    new_faces = [f for f in faces]
-    new_vertices = [v for v in vertices]
-    if tags is not None:
-        new_tags = [t for t in tags]
-    # cache is a (index_p1, index_p2): middle_point_index dict refering
-    # to vertices
-    cache = {}
-    for i in range(len(faces)):
-        face = new_faces.pop(0)
-        v1, v2, v3 = face
-        p1 = vertices[v1]
-        p2 = vertices[v2]
-        p3 = vertices[v3]
-        ka = tuple(sorted((v1, v2)))
-        kb = tuple(sorted((v2, v3)))
-        kc = tuple(sorted((v1, v3)))
-        if ka in cache:
-            va = cache[ka]
-        else:
-            new_vertices.append(normed(middle_point(p1, p2)))
-            va = len(new_vertices) - 1
-            cache.update({ka: va})
-        if kb in cache:
-            vb = cache[kb]
-        else:
-            new_vertices.append(normed(middle_point(p2, p3)))
-            vb = len(new_vertices) - 1
-            cache.update({kb: vb})
-        if kc in cache:
-            vc = cache[kc]
-        else:
-            new_vertices.append(normed(middle_point(p1, p3)))
-            vc = len(new_vertices) - 1
-            cache.update({kc: vc})
-
-        new_faces.append((v1, va, vc))
-        new_faces.append((v2, vb, va))
-        new_faces.append((v3, vc, vb))
-        new_faces.append((va, vb, vc))
-
-        if tags is not None:
-            tag = new_tags.pop(0)
-            new_tags.extend([tag] * 4)
+    vertices = numpy.asarray(vertices, dtype=float).reshape(-1, 3)
+    faces = numpy.asarray(faces, dtype=int).reshape(-1, 3)
+    nv = len(vertices)
+    v1, v2, v3 = faces.T
+    # edges a, b, c of each face, in order of processing
+    edges = numpy.stack([numpy.stack([v1, v2], -1),
+                         numpy.stack([v2, v3], -1),
+                         numpy.stack([v1, v3], -1)], 1).reshape(-1, 2)
+    edges.sort(axis=1)
+    keys = edges[:, 0] * nv + edges[:, 1]
+    _, first, inverse = numpy.unique(keys, return_index=True,
+                                     return_inverse=True)
+    order = numpy.argsort(first)
+    rank = numpy.empty_like(order)
+    rank[order] = numpy.arange(len(order))
+    va, vb, vc = (nv + rank[inverse.reshape(-1)]).reshape(-1, 3).T
+    first_edges = edges[first[order]]
+    middles = _normed((vertices[first_edges[:, 0]] +
+                       vertices[first_edges[:, 1]]) / 2.)
+    new_vertices = numpy.concatenate([vertices, middles])
+    new_faces = numpy.stack([numpy.stack([v1, va, vc], -1),
+                             numpy.stack([v2, vb, va], -1),
+                             numpy.stack([v3, vc, vb], -1),
+                             numpy.stack([va, vb, vc], -1)], 1).reshape(-1, 3)
 
     if tags is None:
         return new_vertices, new_faces
     else:
-        return new_vertices, new_faces, new_tags
+        return new_vertices, new_faces, numpy.repeat(numpy.asarray(tags), 4)
 
 
 def sorted_faces(center, face_indices, faces):
@@ -236,33 +252,90 @@ def sorted_faces(center, face_indices, faces):
     return sorted_indices
 
 
+def vertex_faces(faces, n_vertices=None):
+    """ Vertex-face adjacency table of a triangular mesh
+
+    Args:
+        faces (array-like): (F, 3) vertex indices defining the faces
+        n_vertices (int): the number of vertices. If None, it is deduced from
+        faces
+
+    Returns:
+        a (V, m) array of the indices of the faces around each vertex, sorted to
+        form a counter clockwise rotation starting at the face of lowest index,
+        padded with -1 (m being the maximal valence) and the (V,) valences.
+        Vertices at the boundary of an open mesh have no faces and a null
+        valence.
+    """
+    faces = numpy.asarray(faces, dtype=int).reshape(-1, 3)
+    if n_vertices is None:
+        n_vertices = faces.max(initial=-1) + 1
+    nf = len(faces)
+    valence = numpy.bincount(faces.reshape(-1), minlength=n_vertices)
+    # face of lowest index around each vertex
+    first = numpy.full(n_vertices, nf)
+    numpy.minimum.at(first, faces.reshape(-1), numpy.repeat(numpy.arange(nf), 3))
+    # directed edge -> face lookup table
+    tails = faces.reshape(-1)
+    heads = faces[:, [1, 2, 0]].reshape(-1)
+    edge_keys = tails * n_vertices + heads
+    edge_order = numpy.argsort(edge_keys)
+    edge_keys = edge_keys[edge_order]
+    edge_faces = edge_order // 3
+
+    ring = numpy.full((n_vertices, valence.max(initial=0)), -1, dtype=int)
+    is_open = numpy.zeros(n_vertices, dtype=bool)
+    centers = numpy.flatnonzero(valence > 0)
+    current = first[centers]
+    for j in range(ring.shape[1]):
+        active = j < valence[centers]
+        centers, current = centers[active], current[active]
+        ring[centers, j] = current
+        # next face shares the edge from center to the vertex preceding center
+        # in the current face
+        face = faces[current]
+        pos = numpy.argmax(face == centers[:, None], axis=1)
+        next_pt = face[numpy.arange(len(face)), (pos + 2) % 3]
+        key = centers * n_vertices + next_pt
+        found = numpy.minimum(numpy.searchsorted(edge_keys, key),
+                              len(edge_keys) - 1)
+        current = edge_faces[found]
+        is_open[centers[edge_keys[found] != key]] = True
+        last = j == valence[centers] - 1
+        is_open[centers[last & (current != first[centers])]] = True
+    # faces around a boundary vertex do not form a closed fan
+    ring[is_open] = -1
+    valence[is_open] = 0
+
+    return ring, valence
+
+
 def dual(vertices, faces):
     """Generate the dual polyhedron associated to an icosphere.
 
     Args:
-        vertices (list of tuples): list of 3D coordinates of icosphere vertices
-        faces (list of tuple): list of vertex indices defining the faces
+        vertices (array-like): (V, 3) 3D coordinates of icosphere vertices
+        faces (array-like): (F, 3) vertex indices defining the faces
     Returns:
-        a list of vertices and a list of faces
-    """
+        a (F, 3) array of vertices and a list of V faces (lists of vertex
+        indices)
 
-    # centers = []
-    dual_vertices = []
-    dual_faces = []
-    cache = {}
-    for icenter, center in enumerate(vertices):
-        new_face = []
-        # centers.append(center)
-        ifaces = [i for i, f in enumerate(faces) if icenter in f]
-        for iface in sorted_faces(icenter, ifaces, faces):
-            if iface in cache:
-                new_face.append(cache[iface])
-            else:
-                cache[iface] = len(dual_vertices)
-                new_face.append(len(dual_vertices))
-                points = [vertices[i] for i in faces[iface]]
-                dual_vertices.append(normed(centroid(points)))
-        dual_faces.append(new_face)
+    Details:
+        Dual vertices are the (normalised) centroids of the faces, numbered in
+        order of first encounter when iterating over vertices and the faces
+        surrounding them
+    """
+    vertices = numpy.asarray(vertices, dtype=float).reshape(-1, 3)
+    faces = numpy.asarray(faces, dtype=int).reshape(-1, 3)
+    ring, valence = vertex_faces(faces, len(vertices))
+    visit = ring[ring >= 0]
+    _, first = numpy.unique(visit, return_index=True)
+    order = visit[numpy.sort(first)]
+    index = numpy.full(len(faces), -1, dtype=int)
+    index[order] = numpy.arange(len(order))
+    dual_vertices = _normed(vertices[faces[order]].mean(axis=1))
+    dual_faces = numpy.where(ring >= 0, index[ring], -1).tolist()
+    dual_faces = [f[:n] for f, n in zip(dual_faces, valence)]
 
     return dual_vertices, dual_faces
 
@@ -271,36 +344,31 @@ def star_split(vertices, faces, tags=None):
     """ star-split the faces of a polyhedron
 
     Args:
-        vertices (list of tuples): list of 3D coordinates of polyhedron vertices
-        faces (list of tuple): list of vertex indices defining the faces
-        tags (list of int): list of integer identifying a face. if None (default)
+        vertices (array-like): (V, 3) 3D coordinates of polyhedron vertices
+        faces (list of list or array): vertex indices defining the faces
+        tags (array-like of int): integers identifying a face. if None (default)
         no tags are returned
     Returns:
-        a list of vertices and a list of faces and, if tags is not None, a list
-        of tags referencing the tag of the parent face
+        a (V + F, 3) array of vertices and a (F', 3) array of faces and, if tags
+        is not None, a (F',) array of tags referencing the tag of the parent
+        face
     """
-
-    # copy input
-    new_faces = [f for f in faces]
-    new_vertices = [v for v in vertices]
-    if tags is not None:
-        new_tags = [t for t in tags]
-
-    for i in range(len(faces)):
-        face = new_faces.pop(0)
-        center = normed(centroid([vertices[p] for p in face]))
-        icenter = len(new_vertices)
-        new_vertices.append(center)
-        for j in range(len(face) - 1):
-            new_faces.append((face[j], face[j + 1], icenter))
-        new_faces.append((face[-1], face[0], icenter))
-        if tags is not None:
-            tag = new_tags.pop(0)
-            new_tags.extend([tag] * len(face))
+    vertices = numpy.asarray(vertices, dtype=float).reshape(-1, 3)
+    padded, n = _padded(faces)
+    centers = _normed(_centroids(vertices, padded, n))
+    icenter = len(vertices) + numpy.arange(len(padded))
+    j = numpy.arange(padded.shape[1])
+    next_j = numpy.where(j[None, :] + 1 < n[:, None], j[None, :] + 1, 0)
+    valid = j[None, :] < n[:, None]
+    following = numpy.take_along_axis(padded, next_j, axis=1)
+    new_faces = numpy.stack([padded[valid], following[valid],
+                             numpy.broadcast_to(icenter[:, None],
+                                                padded.shape)[valid]], -1)
+    new_vertices = numpy.concatenate([vertices, centers])
     if tags is None:
         return new_vertices, new_faces
     else:
-        return new_vertices, new_faces, new_tags
+        return new_vertices, new_faces, numpy.repeat(numpy.asarray(tags), n)
 
 
 def icosphere(iter_triangle=0, iter_star=0):
@@ -354,6 +422,97 @@ def refine(level=0):
     return iter_triangle, iter_star
 
 
+def _compact(vertices, faces):
+    """ remove vertices not used by faces, keeping vertex order"""
+    padded, _ = _padded(faces)
+    valid = padded >= 0
+    used = numpy.zeros(len(vertices), dtype=bool)
+    used[padded[valid]] = True
+    mapping = numpy.cumsum(used) - 1
+    padded = numpy.where(valid, mapping[padded], -1)
+    return vertices[used], padded, valid.sum(axis=1)
+
+
+def _prune(vertices, faces, margin):
+    """ keep faces of a triangular mesh having a vertex above a horizontal plane
+    located margin times the largest edge length below the horizon"""
+    edges = vertices[faces] - vertices[numpy.roll(faces, 1, axis=1)]
+    length = numpy.sqrt((edges ** 2).sum(axis=-1)).max(initial=0)
+    upper = vertices[faces][..., 2].max(axis=1) > -margin * length
+    vertices, faces, _ = _compact(vertices, faces[upper])
+    return vertices, faces
+
+
+def upper_icosphere(iter_triangle=0, iter_star=0, margin=3):
+    """Generate the part of an icosphere that covers the Z+ hemisphere, only
+    refining the faces that can reach it.
+
+    Args:
+        iter_triangle (int): the number of iteration of the triangle split
+        iter_star (int): the number of iteration of the star-split
+        margin (float): faces located further below the horizontal plane than
+        margin times the largest edge length are discarded before each
+        refinement
+
+    Returns:
+        a (V, 3) array of vertices and a (F, 3) array of faces
+
+    Details:
+        Vertices and faces are ordered as in the full icosphere, and vertices
+        whose surrounding faces are all kept are located exactly as in the full
+        icosphere.
+    """
+    vertices, faces = icosahedron()
+    vertices = numpy.asarray(vertices, dtype=float)
+    faces = numpy.asarray(faces, dtype=int)
+    for i in range(iter_star):
+        vertices, faces = _prune(vertices, faces, margin)
+        vertices, faces = dual(vertices, faces)
+        # dual faces of boundary vertices are not closed
+        faces = [f for f in faces if len(f) > 0]
+        vertices, faces = star_split(vertices, faces)
+    for i in range(iter_triangle):
+        vertices, faces = _prune(vertices, faces, margin)
+        vertices, faces = split_triangles(vertices, faces)
+    return _prune(vertices, faces, margin)
+
+
+def _turtle(iter_triangle, iter_star):
+    """ dual faces of an icosphere whose centroids are above the horizontal
+    plane lowered by a quarter of the edge length of the polyhedron"""
+    vertices, faces = dual(*upper_icosphere(iter_triangle, iter_star))
+    padded, n = _padded([f for f in faces if len(f) > 0])
+    # the median height of the centroids of the (centrally symmetric) full
+    # polyhedron is zero
+    centers = _centroids(vertices, padded, n)
+    edge = vertices[padded[0, :2]]
+    t = norm(edge[1] - edge[0])
+    keep = centers[:, 2] > -t / 4.
+    new_vertices, new_faces, n = _compact(vertices, padded[keep])
+    new_faces = [f[:k] for f, k in zip(new_faces.tolist(), n)]
+    return new_vertices, new_faces
+
+
+def _turtle_refinements(min_faces):
+    """ (iter_triangle, iter_star) refinements of the icospheres that may
+    generate a turtle of at least min_faces, by increasing number of faces"""
+    sectors = [ 1, 6, 16, 26, 46, 66, 91, 136, 196, 251, 341, 406, 556, 751, 976]
+    refines = [-1, 0,  1,  2,  3,  4,  5,   6,   7,   8,   9,  10,  11,  12, 13]
+    if min_faces <= max(sectors):
+        refine_level = refines[numpy.searchsorted(sectors, min_faces)]
+        return [refine(refine_level)]
+    # beyond tabulated polyhedrons, try icospheres by increasing number of faces
+    # (the largest tabulated turtle is the dual of a 3840 faces icosphere).
+    # As turtles have more faces than half of the icosphere vertices, an
+    # icosphere with 4 * min_faces faces is always large enough
+    max_triangle = int(math.log(min_faces / 5., 4)) + 2
+    max_star = int(math.log(min_faces / 5., 3)) + 2
+    candidates = sorted((20 * 4 ** t * 3 ** s, t, s)
+                        for t in range(max_triangle) for s in range(max_star))
+    return [(t, s) for n_faces, t, s in candidates
+            if n_faces > 3840 and n_faces / 2 + 2 >= min_faces]
+
+
 def turtle_mesh(min_faces=46):
     """Generate faces of a dual icosphere polyhedron mapping the Z+ hemisphere
 
@@ -363,73 +522,406 @@ def turtle_mesh(min_faces=46):
         6, 16, 26, 46, 66, 91, 136, 196, 251, 341, 406
 
     Returns:
-        a list of vertices and a list of faces
-    """
-    sectors = [ 1, 6, 16, 26, 46, 66, 91, 136, 196, 251, 341, 406, 556, 751, 976]
-    refines = [-1, 0,  1,  2,  3,  4,  5,   6,   7,   8,   9,  10,  11,  12, 13]
-    refine_level = refines[numpy.searchsorted(sectors, min(max(sectors), min_faces))]
-    vertices, faces = dual(*icosphere(*refine(refine_level)))
-    # filter faces with centroids below horizontal plane
-    centers = [centroid([vertices[p] for p in face]) for face in faces]
-    median_height = numpy.median([c[2] for c in centers])
-    edge = [vertices[v] for v in faces[0]]
-    t = norm(numpy.array(edge[1]) - numpy.array(edge[0]))
-    median_height -= (t / 4.)
-    new_faces = [f for c, f in zip(centers, faces) if c[2] > median_height]
-    filtered = sum(new_faces, [])
-    mapping = {}
-    new_vertices = []
-    for v, pt in enumerate(vertices):
-        if v in filtered:
-            mapping[v] = len(new_vertices)
-            new_vertices.append(pt)
-    new_faces = [[mapping.get(v) for v in face] for face in new_faces]
+        a (V, 3) array of vertices and a list of faces
 
-    return new_vertices, new_faces
+    Details:
+        Only the faces of the icospheres reaching the Z+ hemisphere are refined
+        (see upper_icosphere).
+    """
+    for iter_triangle, iter_star in _turtle_refinements(min_faces):
+        mesh = _turtle(iter_triangle, iter_star)
+        if len(mesh[1]) >= min_faces:
+            return mesh
 
 
 def spherical_face_centers(turtle_mesh):
     """ Spherical coordinates of turtle mesh faces centers
     """
     vertices, faces = turtle_mesh
+    vertices = numpy.asarray(vertices, dtype=float)
 
     # Compute the centroid of each face
-    centers = [centroid([vertices[p] for p in face]) for face in faces]
-
-    zeniths, azimuths = zip(*spherical(centers))
+    padded, n = _padded(faces)
+    x, y, z = _normed(_centroids(vertices, padded, n)).T
+    zeniths = numpy.arccos(z)
+    azimuths = numpy.arctan2(y, x)
 
     return list(zip(90-numpy.degrees(zeniths), numpy.degrees(azimuths)))
 
 
+def face_solid_angles(vertices, faces):
+    """ Solid angles (sr) of the spherical polygons delimited by the (unit
+    sphere) vertices of polyhedron faces
+
+    Args:
+        vertices (array-like): (V, 3) 3D coordinates of polyhedron vertices
+        faces (list of list or array): vertex indices defining the faces
+
+    Returns:
+        a (F,) array of solid angles
+
+    Details:
+        Faces are triangulated as fans around their first vertex and solid
+        angles of the triangles are computed with the formula of Van Oosterom
+        and Strackee (1983) :
+        tan(omega / 2) = |a.(b x c)| / (1 + a.b + b.c + c.a)
+    """
+    vertices = _normed(vertices)
+    padded, n = _padded(faces)
+    a = vertices[padded[:, 0]]
+    omega = numpy.zeros(len(padded))
+    for j in range(1, padded.shape[1] - 1):
+        valid = j + 1 < n
+        b = vertices[padded[valid, j]]
+        c = vertices[padded[valid, j + 1]]
+        av = a[valid]
+        num = numpy.abs((av * numpy.cross(b, c)).sum(axis=1))
+        den = 1 + (av * b).sum(axis=1) + (b * c).sum(axis=1) + (c * av).sum(axis=1)
+        omega[valid] += 2 * numpy.arctan2(num, den)
+    return omega
+
+
+# in-memory cache of turtles, indexed by icosphere refinements
+_turtles = {}
+_turtle_format = 1
+
+
+def _save_turtle(path, vertices, faces, directions, solid_angles):
+    """ write a turtle npz file atomically"""
+    padded, n = _padded(faces)
+    save_atomic(path, lambda f: numpy.savez(
+        f, vertices=vertices, faces=padded[padded >= 0],
+        offsets=numpy.concatenate([[0], numpy.cumsum(n)]),
+        directions=directions, solid_angles=solid_angles))
+
+
+def _load_turtle(path):
+    """ read a turtle npz file"""
+    with numpy.load(path) as data:
+        offsets = data['offsets'].tolist()
+        flat = data['faces'].tolist()
+        faces = [flat[i:j] for i, j in zip(offsets[:-1], offsets[1:])]
+        return (data['vertices'], faces, data['directions'],
+                data['solid_angles'])
+
+
+def _cached_turtle(iter_triangle, iter_star, cache=True):
+    """ vertices, faces, directions and solid angles of the turtle built from a
+    refined icosphere, possibly cached in memory and on disk"""
+    key = (iter_triangle, iter_star)
+    if key in _turtles:
+        return _turtles[key]
+    path = None
+    if cache:
+        path = os.path.join(cache_dir(),
+                            'turtle_v%d_%d_%d.npz' % ((_turtle_format,) + key))
+        if os.path.exists(path):
+            try:
+                _turtles[key] = _load_turtle(path)
+                return _turtles[key]
+            except (OSError, ValueError, KeyError):
+                pass
+    vertices, faces = _turtle(iter_triangle, iter_star)
+    directions = numpy.array(spherical_face_centers((vertices, faces)))
+    solid_angles = face_solid_angles(vertices, faces)
+    turtle = (vertices, faces, directions, solid_angles)
+    if path is not None:
+        try:
+            _save_turtle(path, *turtle)
+        except OSError:
+            pass
+    _turtles[key] = turtle
+    return turtle
+
+
+def _turtle_refinement(sectors, cache=True):
+    """ icosphere refinement (iter_triangle, iter_star) and (cached) turtle
+    with at least sectors faces"""
+    for iter_triangle, iter_star in _turtle_refinements(sectors):
+        turtle = _cached_turtle(iter_triangle, iter_star, cache)
+        if len(turtle[1]) >= sectors:
+            return (iter_triangle, iter_star), turtle
+
+
+def turtle_sectors(sectors=46, cache=True):
+    """Turtle mesh, sector directions and solid angles, loaded from cache if
+    available
+
+    Args:
+        sectors (int): the minimal number of sectors (see turtle_mesh)
+        cache (bool): if True (default), turtles are read from / written to
+        the on-disk cache directory (see cache.cache_dir). Turtles are always
+        cached in memory.
+
+    Returns:
+        a (V, 3) array of vertices, a list of faces, a (F, 2) array of
+        (elevation, azimuth) sector directions (deg) and a (F,) array of sector
+        solid angles (sr)
+    """
+    _, turtle = _turtle_refinement(sectors, cache)
+    vertices, faces, directions, solid_angles = turtle
+    return (vertices.copy(), [list(f) for f in faces], directions.copy(),
+            solid_angles.copy())
+
+
+def _oriented_planes(normals, points):
+    """ unit normals of planes containing the origin, oriented to have points
+    on their positive side"""
+    orientation = numpy.sign((normals * points).sum(axis=-1, keepdims=True))
+    length = numpy.linalg.norm(normals, axis=-1, keepdims=True)
+    return normals * orientation / numpy.where(length > 0, length, 1)
+
+
+def _edge_neighbours(faces):
+    """ (F, 3) indices of the faces sharing the edges (face[k], face[k+1]) of
+    the faces of a closed triangular mesh"""
+    n_vertices = faces.max() + 1
+    keys = (faces * n_vertices + numpy.roll(faces, -1, axis=1)).reshape(-1)
+    order = numpy.argsort(keys)
+    reverse = (numpy.roll(faces, -1, axis=1) * n_vertices + faces).reshape(-1)
+    found = numpy.searchsorted(keys[order], reverse)
+    return (order[found] // 3).reshape(faces.shape)
+
+
+def _region_planes(vertices, faces):
+    """ (F, 3, 3) normals of the planes containing the dual edges crossing the
+    edges (face[k], face[k+1]) of triangular faces, oriented towards face[k]"""
+    centers = _normed(vertices[faces].mean(axis=1))
+    neighbours = centers[_edge_neighbours(faces)]
+    normals = numpy.cross(centers[:, None, :], neighbours)
+    return _oriented_planes(normals, vertices[faces])
+
+
+def _score(planes, points):
+    """ signed distances of points to their (N, ..., 3) planes"""
+    shape = planes.shape[:-1]
+    distance = numpy.matmul(planes.reshape(len(planes), -1, 3),
+                            points[:, :, None])
+    return distance.reshape(shape)
+
+
+class SectorLocator(object):
+    """Locate directions in the sectors of a turtle by descending the
+    refinement hierarchy of its icosphere
+
+    Args:
+        sectors (int): the minimal number of sectors of the turtle (see
+        turtle_mesh)
+
+    Details:
+        Directions are first located in one of the 20 faces of the
+        icosahedron, then in one of the faces refining this face at each star
+        or triangle split. Star-split faces are found by locating the vertex
+        whose dual face contains the direction, using the planes of the dual
+        edges crossing the current face, and then the wedge of the dual face
+        containing it. Triangle-split faces are found using the planes of the
+        edges of the middle triangle. Sectors are the dual faces of the
+        vertices of the last icosphere, and are found as for star splits.
+    """
+
+    def __init__(self, sectors=46):
+        (iter_triangle, iter_star), turtle = _turtle_refinement(sectors, False)
+        self.n_sectors = len(turtle[1])
+        vertices, faces = icosahedron()
+        vertices = numpy.asarray(vertices, dtype=float)
+        faces = numpy.asarray(faces, dtype=int)
+        # the faces of the (regular) icosahedron are the spherical Voronoi
+        # cells of their centers
+        self.centers = _normed(vertices[faces].mean(axis=1))
+        self.steps = []
+        for i in range(iter_star):
+            dual_vertices, dual_faces = dual(vertices, faces)
+            padded, n = _padded(dual_faces)
+            new_vertices, new_faces = star_split(dual_vertices, dual_faces)
+            # wedges j of dual faces lie between the planes containing the
+            # star center and the dual vertices j and j + 1
+            center = new_vertices[len(dual_vertices):][:, None, :]
+            j = numpy.arange(padded.shape[1])
+            valid = j[None, :] < n[:, None]
+            following = numpy.where(j[None, :] + 1 < n[:, None], j + 1, 0)
+            ring = dual_vertices[padded]
+            next_ring = numpy.take_along_axis(ring, following[..., None], 1)
+            planes = _oriented_planes(numpy.cross(center, ring), next_ring)
+            next_planes = numpy.take_along_axis(planes, following[..., None], 1)
+            wedges = numpy.stack([planes, -next_planes], axis=2)
+            # star-split faces of a dual face are contiguous
+            offsets = numpy.cumsum(n) - n
+            self.steps.append(('star', (faces, _region_planes(vertices, faces),
+                                        wedges, valid, offsets)))
+            vertices, faces = new_vertices, new_faces
+        for i in range(iter_triangle):
+            new_vertices, new_faces = split_triangles(vertices, faces)
+            # middle triangle vertices va, vb, vc of children 0, 1, 2
+            middle = new_faces[3::4]
+            edges = numpy.stack([middle[:, [0, 2]], middle[:, [1, 0]],
+                                 middle[:, [2, 1]]], axis=1)
+            normals = numpy.cross(new_vertices[edges[..., 0]],
+                                  new_vertices[edges[..., 1]])
+            planes = _oriented_planes(normals, vertices[faces])
+            self.steps.append(('split', planes))
+            vertices, faces = new_vertices, new_faces
+        self.faces = faces
+        self.planes = _region_planes(vertices, faces)
+        # sectors are the dual faces of the last icosphere vertices
+        dual_vertices, dual_faces = dual(vertices, faces)
+        padded, n = _padded(dual_faces)
+        centers = _centroids(dual_vertices, padded, n)
+        edge = dual_vertices[padded[0, :2]]
+        t = norm(edge[1] - edge[0])
+        kept = centers[:, 2] > -t / 4.
+        self.sector = numpy.where(kept, numpy.cumsum(kept) - 1, -1)
+
+    @staticmethod
+    def _region(planes, points):
+        """ index k of the face vertex whose dual face contains points"""
+        distance = _score(planes, points)
+        score = numpy.minimum(distance, -numpy.roll(distance, 1, axis=1))
+        return numpy.argmax(score, axis=1)
+
+    def locate(self, directions, chunk_size=2 ** 16):
+        """ Turtle sector of directions
+
+        Args:
+            directions (array-like): (N, 3) coordinates of direction vectors,
+            in the turtle mesh frame (Z+ pointing to zenith)
+            chunk_size (int): the number of directions processed together
+
+        Returns:
+            a (N,) array of sector indices, -1 for directions outside of the
+            turtle
+        """
+        directions = numpy.asarray(directions, dtype=float).reshape(-1, 3)
+        located = numpy.empty(len(directions), dtype=int)
+        for start in range(0, len(directions), chunk_size):
+            points = directions[start:start + chunk_size]
+            current = numpy.argmax(points @ self.centers.T, axis=1)
+            for kind, data in self.steps:
+                if kind == 'star':
+                    faces, planes, wedges, valid, offsets = data
+                    k = self._region(planes[current], points)
+                    vertex = faces[current, k]
+                    distance = _score(wedges[vertex], points)
+                    distance = numpy.minimum(distance[..., 0], distance[..., 1])
+                    distance[~valid[vertex]] = -numpy.inf
+                    current = offsets[vertex] + numpy.argmax(distance, axis=1)
+                else:
+                    distance = _score(data[current], points)
+                    score = numpy.concatenate(
+                        [distance, -distance.max(axis=1, keepdims=True)], axis=1)
+                    current = 4 * current + numpy.argmax(score, axis=1)
+            k = self._region(self.planes[current], points)
+            located[start:start + chunk_size] = self.sector[self.faces[current, k]]
+        return located
+
+
+_locators = {}
+
+
+def locate_sectors(directions, sectors=46, chunk_size=2 ** 16):
+    """ Turtle sector of directions
+
+    Args:
+        directions (array-like): (N, 3) coordinates of direction vectors, in the
+        turtle mesh frame (Z+ pointing to zenith)
+        sectors (int): the minimal number of sectors of the turtle (see
+        turtle_mesh)
+        chunk_size (int): the number of directions processed together
+
+    Returns:
+        a (N,) array of indices of turtle sectors (as ordered by turtle_mesh),
+        -1 for directions outside of the turtle
+    """
+    if sectors not in _locators:
+        _locators[sectors] = SectorLocator(sectors)
+    return _locators[sectors].locate(directions, chunk_size=chunk_size)
+
+
+def _sample(vertices, faces, tags, iter):
+    """ centroids and tags of the faces sampling faces"""
+    if iter is not None:
+        vertices, faces, tags = star_split(vertices, faces, tags)
+        for i in range(iter):
+            vertices, faces, tags = split_triangles(vertices, faces, tags)
+    padded, n = _padded(faces)
+    return _centroids(vertices, padded, n), numpy.asarray(tags, dtype=int)
+
+
+def _spherical(points):
+    """ (N, 2) zenithal and azimutal coordinates of an array of points"""
+    x, y, z = _normed(points).T
+    return numpy.stack([numpy.arccos(z), numpy.arctan2(y, x)], axis=-1)
+
+
 def sample_faces(vertices, faces, iter=2, spheric=False):
     """Generate a set of points or spherical directions that regularly sample
     the faces of a polyhedron
-    the number of sampling points is 6 * 4**iter or 5 * 4**iter
+    the number of sampling points is 6 * 4**iter or 5 * 4**iter per face
 
     Args:
-        vertices (list of tuples): list of 3D coordinates of polyhedron vertices
-        faces (list of tuple): list of vertex indices defining the faces
+        vertices (array-like): (V, 3) 3D coordinates of polyhedron vertices
+        faces (list of list or array): vertex indices defining the faces
         iter: the number of triangular iteration to apply on the star-split
         of the polyhedron. If None, face centers are returned
         spheric (bool): if True, zenithal and azimuth are returned
         instead of points
 
     Returns:
-        a list of points or of (theta, phi) tuples and a list of tags
+        a (N, 3) array of points or a (N, 2) array of (theta, phi) and a (N,)
+        array of tags (the index of the sampled face)
     """
-    tags = list(range(len(faces)))
-    if iter is not None:
-        vertices, faces, tags = star_split(vertices, faces, tags)
-        for i in range(iter):
-            vertices, faces, tags = split_triangles(vertices, faces, tags)
+    vertices = numpy.asarray(vertices, dtype=float).reshape(-1, 3)
+    points, tags = _sample(vertices, faces, numpy.arange(len(faces)), iter)
+    if spheric:
+        points = _spherical(points)
+    return points, tags
 
-    face_points = [[centroid([vertices[p] for p in face])] for face in faces]
 
-    points = reduce(lambda x, y: x + y, face_points)
-    npt = [len(x) for x in face_points]
-    tags = reduce(lambda x, y: x + y, [[t] * n for t, n in zip(tags, npt)])
-    if spheric:
-        points = spherical(points)
+def iter_sample_faces(vertices, faces, iter=2, spheric=False,
+                      chunk_size=2 ** 16):
+    """Generate chunks of the points or spherical directions returned by
+    sample_faces
 
-    return points, tags
+    Args:
+        vertices (array-like): (V, 3) 3D coordinates of polyhedron vertices
+        faces (list of list or array): vertex indices defining the faces
+        iter: the number of triangular iteration to apply on the star-split
+        of the polyhedron. If None, face centers are returned
+        spheric (bool): if True, zenithal and azimuth are returned
+        instead of points
+        chunk_size (int): the number of points per chunk
+
+    Yields:
+        (points, tags) arrays of chunk_size points (except for the last chunk)
 
+    Details:
+        Points sampling a face are contiguous, hence groups of faces are
+        sampled independently so that memory usage is bounded by the chunk
+        size.
+    """
+    vertices = numpy.asarray(vertices, dtype=float).reshape(-1, 3)
+    padded, n = _padded(faces)
+    per_face = n * 4 ** iter if iter is not None else numpy.ones_like(n)
+    # groups of consecutive faces sampled by at most chunk_size points
+    bounds = numpy.cumsum(per_face)
+    starts = [0]
+    while starts[-1] < len(padded):
+        done = bounds[starts[-1] - 1] if starts[-1] > 0 else 0
+        end = numpy.searchsorted(bounds, done + chunk_size, side='right')
+        starts.append(max(end, starts[-1] + 1))
+    buffer_points, buffer_tags, buffered = [], [], 0
+    for start, end in zip(starts[:-1], starts[1:]):
+        group = [f[:k] for f, k in zip(padded[start:end].tolist(), n[start:end])]
+        points, tags = _sample(vertices, group, numpy.arange(start, end), iter)
+        if spheric:
+            points = _spherical(points)
+        buffer_points.append(points)
+        buffer_tags.append(tags)
+        buffered += len(points)
+        while buffered >= chunk_size:
+            points = numpy.concatenate(buffer_points)
+            tags = numpy.concatenate(buffer_tags)
+            yield points[:chunk_size], tags[:chunk_size]
+            buffer_points, buffer_tags = [points[chunk_size:]], [tags[chunk_size:]]
+            buffered -= chunk_size
+    if buffered > 0:
+        yield numpy.concatenate(buffer_points), numpy.concatenate(buffer_tags)
@@ -20,6 +20,9 @@ This module is mainly a collection of syntactic sugar to pvlib clearsky and
 irradiances packages.
 """
 
+import calendar
+import os
+import time
 import numpy
 import pandas
 import warnings
@@ -27,18 +30,22 @@ import warnings
 try:
     import pvlib
 except ImportError:
+    pvlib = None
     warnings.warn('pvlib not installed: using pure python, but less accurate, functions')
 
 if pvlib:
     from openalea.astk.sun_position import (
         sun_position, 
+        sun_positions,
         sun_extraradiation
     )
 else:
     from openalea.astk.sun_position_astk import (
         sun_position, 
+        sun_positions,
         sun_extraradiation,
     )
+from openalea.astk.solar_geometry import SolarGeometry, SolarGeometryStore
 
 # default location and dates
 _daydate = '2000-06-21'
@@ -97,7 +104,7 @@ def all_weather_sky_clearness(dni, dhi, sun_zenith):
     return ((dhi + dni) / dhi + 1.041 * z**3) / (1 + 1.041 * z**3)
 
 
-def all_weather_sky_brightness(dates, dhi, sun_zenith, altitude=0, with_pvlib=True):
+def all_weather_sky_brightness(dates, dhi, sun_zenith, altitude=0, with_pvlib=True, geometry=None):
     """Sky brightness as defined in all_weather sky model (Perez et al. 1993)
 
     Args:
@@ -106,6 +113,7 @@ def all_weather_sky_brightness(dates, dhi, sun_zenith, altitude=0, with_pvlib=Tr
         sun_zenith: zenith angle of the sun (deg)
         altitude: altitude of the location
         with_pvlib : Should we use pvlib library to estimate air mass ?
+        geometry: a SolarGeometry of dates providing extraterrestrial radiation. If None (default), it is computed
 
     Returns:
         sky brightness
@@ -114,7 +122,7 @@ def all_weather_sky_brightness(dates, dhi, sun_zenith, altitude=0, with_pvlib=Tr
         validation", Solar Energy, Volume 50, Issue 3, 1993, Pages 235-245.
     """
     am = air_mass(sun_zenith, altitude, with_pvlib=with_pvlib)
-    dni_extra = sun_extraradiation(dates)
+    dni_extra = sun_extraradiation(dates) if geometry is None else geometry.dni_extra
     return am * dhi / dni_extra
 
 
@@ -132,12 +140,13 @@ def f_clear_sky(epsilon):
     return numpy.minimum(1, (epsilon - 1) / (1.41 - 1))
 
 
-def clearness_index(dates, ghi):
+def clearness_index(dates, ghi, geometry=None):
     """Clearness index (Liu and Jordan 1960)
 
     Args:
         dates: A pandas datetime index (as generated by pandas.date_range)
         ghi: global horizontal irradiance
+        geometry: a SolarGeometry of dates providing extraterrestrial radiation. If None (default), it is computed
 
     Returns:
         clearness index
@@ -146,7 +155,7 @@ def clearness_index(dates, ghi):
         Benjamin Y.H. Liu, Richard C. Jordan, "The interrelationship and characteristic distribution of direct, diffuse
         and total solar radiation", Solar Energy, Volume 4, Issue 3, 1960, Pages 1-19.
     """
-    dni_extra = sun_extraradiation(dates)
+    dni_extra = sun_extraradiation(dates) if geometry is None else geometry.dni_extra
     return ghi / dni_extra
 
 
@@ -162,7 +171,7 @@ def spitters_daily_diffuse_fraction(ghi, daydate=_daydate):
                                            0.23)))
 
 
-def micromol_per_joule(dates, ghi, sun_elevation, temp_dew=None):
+def micromol_per_joule(dates, ghi, sun_elevation, temp_dew=None, geometry=None):
     """Conversion factor between micromol of PAR and Joule of broadband shortwave solar radiation (Alados et al. 1996)
 
     Args:
@@ -170,22 +179,253 @@ def micromol_per_joule(dates, ghi, sun_elevation, temp_dew=None):
         ghi: global horizontal irradiance (W.m-2)
         sun_elevation: the elevation angle of the sun (deg)
         temp_dew: the dew point temperature (°C) (optional, yields better estimates)
+        geometry: a SolarGeometry of dates providing extraterrestrial radiation and sine of sun elevation. If None
+            (default), they are computed
 
     Details:
         I. Alados, I. Foyo-Moreno, L. Alados-Arboledas, "Photosynthetically active radiation: measurements and modelling",
         Agricultural and Forest Meteorology, Volume 78, Issues 1–2, 1996, Pages 121-131,
     """
-    beta = numpy.radians(sun_elevation)
-    kt = clearness_index(dates, ghi)
+    if geometry is None:
+        sin_beta = numpy.sin(numpy.radians(sun_elevation))
+    else:
+        sin_beta = geometry.sin_elevation
+    kt = clearness_index(dates, ghi, geometry=geometry)
     if temp_dew is None:
-        return 1.832 - 0.191 * numpy.log(kt) + 0.099 * numpy.sin(beta)
+        return 1.832 - 0.191 * numpy.log(kt) + 0.099 * sin_beta
+    else:
+        return 1.791 - 0.190 * numpy.log(kt) + 0.005 * temp_dew + 0.049 * sin_beta
+
+
+# in-memory cache of monthly Linke turbidity climatologies of sites (20 x turbidity, as stored in pvlib data file),
+# indexed by (latitude, longitude)
+_linke_turbidities = {}
+
+
+def preload_linke_turbidity(sites):
+    """Load monthly Linke turbidity climatologies of several sites in memory
+
+    Args:
+        sites: a list of (latitude, longitude) tuples (degrees)
+
+    Details:
+        Climatologies are read with pvlib.clearsky.lookup_linke_turbidity, once per site, and then served from memory
+        by linke_turbidity and linke_turbidities.
+    """
+    # one date per month: without interpolation, lookup_linke_turbidity returns the monthly values of the data file
+    months = pandas.DatetimeIndex(['2015-%02d-15' % m for m in range(1, 13)], tz='UTC')
+    for lat, lon in sites:
+        if (lat, lon) not in _linke_turbidities:
+            tl = pvlib.clearsky.lookup_linke_turbidity(months, lat, lon, interp_turbidity=False)
+            _linke_turbidities[(lat, lon)] = numpy.rint(tl.values * 20)
+
+
+def monthly_linke_turbidity(latitude=_latitude, longitude=_longitude):
+    """Monthly Linke turbidity climatology of a site, from pvlib data file, cached in memory
+
+    Args:
+        latitude: (float) in degrees
+        longitude: (float) in degrees
+
+    Returns:
+        a (12,) array of Linke turbidity, from January to December
+    """
+    preload_linke_turbidity([(latitude, longitude)])
+    return _linke_turbidities[(latitude, longitude)] / 20.
+
+
+def _month_middles(leap):
+    """day of year of the middle of months, from december of previous year to january of next year"""
+    mdays = numpy.array(calendar.mdays[1:], dtype=float)
+    if leap:
+        mdays[1] += 1
+    return numpy.concatenate([[-calendar.mdays[-1] / 2.],
+                              numpy.cumsum(mdays) - mdays / 2.,
+                              [mdays.sum() + calendar.mdays[1] / 2.]])
+
+
+def linke_turbidity(dates, latitude=_latitude, longitude=_longitude, interp_turbidity=True):
+    """Linke turbidity at dates, from the in-memory monthly climatology of the site
+
+    Args:
+        dates: A pandas datetime index (naive dates are assumed to be UTC)
+        latitude: (float) in degrees
+        longitude: (float) in degrees
+        interp_turbidity: if True (default), monthly values are linearly interpolated between the middles of months,
+            according to UTC day of year
+
+    Returns:
+        a pandas Series of Linke turbidity indexed by dates, identical to pvlib.clearsky.lookup_linke_turbidity
+    """
+    preload_linke_turbidity([(latitude, longitude)])
+    lts = _linke_turbidities[(latitude, longitude)]
+    utc = dates if dates.tz is None else dates.tz_convert('UTC')
+    if interp_turbidity:
+        lts = numpy.concatenate([[lts[-1]], lts, [lts[0]]])
+        doy = utc.dayofyear
+        tl = numpy.where(utc.is_leap_year,
+                         numpy.interp(doy, _month_middles(True), lts),
+                         numpy.interp(doy, _month_middles(False), lts))
     else:
-        return 1.791 - 0.190 * numpy.log(kt) + 0.005 * temp_dew + 0.049 * numpy.sin(beta)
+        tl = lts[utc.month - 1]
+    return pandas.Series(tl / 20., index=dates)
+
+
+def linke_turbidities(dates, latitude=_latitude, longitude=_longitude, interp_turbidity=True):
+    """Linke turbidity of several sites at dates (see linke_turbidity)
+
+    Args:
+        dates: A pandas datetime index (naive dates are assumed to be UTC)
+        latitude: float or (S,) array-like of site latitudes (degrees)
+        longitude: float or (S,) array-like of site longitudes (degrees)
+        interp_turbidity: if True (default), monthly values are linearly interpolated between the middles of months,
+            according to UTC day of year
+
+    Returns:
+        a (S, T) array of Linke turbidity
+    """
+    latitude, longitude = numpy.broadcast_arrays(numpy.atleast_1d(latitude), numpy.atleast_1d(longitude))
+    sites = list(zip(latitude.tolist(), longitude.tolist()))
+    preload_linke_turbidity(sites)
+    lts = numpy.array([_linke_turbidities[site] for site in sites])
+    utc = dates if dates.tz is None else dates.tz_convert('UTC')
+    if not interp_turbidity:
+        return lts[:, numpy.asarray(utc.month) - 1] / 20.
+    # interpolation weights are shared by all sites
+    lts = numpy.concatenate([lts[:, -1:], lts, lts[:, :1]], axis=1)
+    doy = numpy.asarray(utc.dayofyear, dtype=float)
+    leap = numpy.asarray(utc.is_leap_year)
+    middles = numpy.where(leap[:, None], _month_middles(True), _month_middles(False))
+    j = numpy.where(leap, numpy.searchsorted(_month_middles(True), doy, side='right'),
+                    numpy.searchsorted(_month_middles(False), doy, side='right')) - 1
+    x0 = middles[numpy.arange(len(doy)), j]
+    x1 = middles[numpy.arange(len(doy)), j + 1]
+    slope = (lts[:, j + 1] - lts[:, j]) / (x1 - x0)
+    return (slope * (doy - x0) + lts[:, j]) / 20.
+
+
+def ineichen_clear_sky(zenith, air_mass, dni_extra, turbidity=None, altitude=0):
+    """ Clear sky irradiance after Ineichen and Perez (2002), using pvlib
+
+    Args:
+        zenith: (array-like) apparent sun zenith angle (deg)
+        air_mass: (array-like) pressure-corrected air mass
+        dni_extra: (array-like) extraterrestrial radiation (W.m-2)
+        turbidity: (array-like) Linke turbidity
+        altitude: (float or array-like) site altitude (m)
+
+    Returns:
+        ghi, dni, dhi arrays
+
+    Details:
+        P. Ineichen and R. Perez, "A New airmass independent formulation for the Linke turbidity coefficient",
+         Solar Energy, vol 73, pp. 151-157, 2002
+    """
+    cs = pvlib.clearsky.ineichen(zenith, air_mass, turbidity, altitude=altitude, dni_extra=dni_extra)
+    return numpy.asarray(cs['ghi']), numpy.asarray(cs['dni']), numpy.asarray(cs['dhi'])
+
+
+def simplified_solis_clear_sky(zenith, air_mass, dni_extra, turbidity=None, altitude=0):
+    """ Clear sky irradiance after the simplified Solis model of Ineichen (2008), using pvlib with default aerosol
+    optical depth (0.1) and precipitable water (1 cm)
+
+    Args:
+        zenith: (array-like) apparent sun zenith angle (deg)
+        air_mass: (array-like) pressure-corrected air mass (not used)
+        dni_extra: (array-like) extraterrestrial radiation (W.m-2)
+        turbidity: (array-like) Linke turbidity (not used)
+        altitude: (float or array-like) site altitude (m)
+
+    Returns:
+        ghi, dni, dhi arrays
+
+    Details:
+        P. Ineichen, "A broadband simplified version of the Solis clear sky model", Solar Energy, 82, 758-762, 2008.
+    """
+    cs = pvlib.clearsky.simplified_solis(90 - zenith, pressure=pvlib.atmosphere.alt2pres(altitude),
+                                         dni_extra=dni_extra)
+    return numpy.asarray(cs['ghi']), numpy.asarray(cs['dni']), numpy.asarray(cs['dhi'])
+
+
+def haurwitz_clear_sky(zenith, air_mass, dni_extra, turbidity=None, altitude=0):
+    """ Clear sky irradiance with GHI after Haurwitz (1945), DNI after Meinel (1976) and DHI by difference
+
+    Args:
+        zenith: (array-like) apparent sun zenith angle (deg)
+        air_mass: (array-like) air mass
+        dni_extra: (array-like) extraterrestrial radiation (W.m-2)
+        turbidity: (array-like) Linke turbidity (not used)
+        altitude: (float or array-like) site altitude (m) (not used)
+
+    Returns:
+        ghi, dni, dhi arrays
+
+    Details:
+        B. Haurwitz, "Insolation in Relation to Cloudiness and Cloud Density", Journal of Meteorology, vol. 2,
+         pp. 154-166, 1945.
+        A. B. Meinel and M. P. Meinel, Applied solar energy. Reading, MA: Addison-Wesley Publishing Co., 1976
+    """
+    z = numpy.radians(zenith)
+    ghi = 1098 * numpy.cos(z) * numpy.exp(-0.057 / numpy.cos(z))
+    dni = dni_extra * numpy.power(0.7, numpy.power(air_mass, 0.678))
+    dhi = ghi - horizontal_irradiance(dni, 90 - zenith)
+    return numpy.asarray(ghi), numpy.asarray(dni), numpy.asarray(dhi)
+
+
+# registry of clear sky models: name -> (function, is_available, needs_turbidity)
+# functions take apparent sun zenith, air mass, extraterrestrial radiation, Linke turbidity and altitude and return
+# ghi, dni and dhi arrays
+_clear_sky_models = {}
+
+
+def register_clear_sky_model(name, function, available=True, turbidity=False):
+    """ Register a clear sky irradiance model
+
+    Args:
+        name (str): the name of the model
+        function: a function with (zenith, air_mass, dni_extra, turbidity=None, altitude=0) signature, returning ghi,
+            dni and dhi arrays broadcast from its arguments
+        available (bool): is the model usable on this system ?
+        turbidity (bool): does the model use Linke turbidity ?
+    """
+    _clear_sky_models[name] = (function, available, turbidity)
+
+
+def available_clear_sky_models():
+    """ Names of the clear sky models usable on this system"""
+    return [k for k, (_, available, _) in _clear_sky_models.items() if available]
+
+
+def _clear_sky_model_name(name=None, with_pvlib=True):
+    if name is None:
+        name = 'ineichen' if pvlib and with_pvlib else 'haurwitz'
+    if name not in available_clear_sky_models():
+        raise ValueError('unavailable clear sky model: ' + str(name))
+    return name
+
+
+def clear_sky_model(name=None, with_pvlib=True):
+    """ A registered clear sky model
+
+    Args:
+        name (str): the name of the model. If None (default), 'ineichen' is used if pvlib is available and
+            with_pvlib is True, 'haurwitz' otherwise
+        with_pvlib : Should we use pvlib library (only used if name is None)?
+
+    Returns:
+        the clear sky function
+    """
+    return _clear_sky_models[_clear_sky_model_name(name, with_pvlib)][0]
+
+
+register_clear_sky_model('ineichen', ineichen_clear_sky, pvlib is not None, turbidity=True)
+register_clear_sky_model('simplified_solis', simplified_solis_clear_sky, pvlib is not None)
+register_clear_sky_model('haurwitz', haurwitz_clear_sky)
 
 
 def clear_sky_irradiances(dates=None, daydate=_daydate, longitude=_longitude,
                           latitude=_latitude, altitude=_altitude,
-                          timezone=_timezone, with_pvlib=True):
+                          timezone=_timezone, with_pvlib=True, store=None, geometry=None, model=None):
     """ Estimate component of sky irradiance for clear sky conditions
 
     Args:
@@ -197,14 +437,22 @@ def clear_sky_irradiances(dates=None, daydate=_daydate, longitude=_longitude,
         altitude: (float) in meter
         timezone:(str) the time zone (not used if dates are already localised)
         with_pvlib : Should we use pvlib library to estimate clearsky ?
+        store: a SolarGeometryStore from which sun position, air mass and
+            extraterrestrial radiation are read. If None (default), they are
+            computed.
+        geometry: the SolarGeometry of the request. If not None, dates,
+            daydate, location and store arguments are not used.
+        model: (str) the name of the clear sky model (see
+            available_clear_sky_models). If None (default), the model is
+            chosen according to with_pvlib.
 
     Returns:
         a pandas dataframe with global horizontal irradiance, direct normal
         irradiance and diffuse horizontal irradiance.
 
     Details:
-        if with_pvlib is True, the Ineichen (2002) model is used, otherwise GHI is computed after Haurwitz (1945) and DNI
-        after Meinel (1976).
+        if model is None and with_pvlib is True, the Ineichen (2002) model is used, otherwise GHI is computed after
+        Haurwitz (1945) and DNI after Meinel (1976). Air mass is estimated with pvlib if with_pvlib is True.
 
         P. Ineichen and R. Perez, "A New airmass independent formulation for the Linke turbidity coefficient",
          Solar Energy, vol 73, pp. 151-157, 2002
@@ -214,37 +462,403 @@ def clear_sky_irradiances(dates=None, daydate=_daydate, longitude=_longitude,
 
     """
 
-    location = dict(latitude=latitude,
-                    longitude=longitude,
-                    altitude=altitude,
-                    timezone=timezone)
-    df = sun_position(dates=dates, daydate=daydate, **location)
-    am = air_mass(df['zenith'], altitude, with_pvlib=with_pvlib)
-    dni_extra = sun_extraradiation(df.index)
-
+    if geometry is None:
+        geometry = SolarGeometry(dates, daydate, latitude=latitude, longitude=longitude, altitude=altitude,
+                                 timezone=timezone, store=store)
+    df = geometry.sun_position()
     if pvlib and with_pvlib:
-        tl = pvlib.clearsky.lookup_linke_turbidity(df.index, latitude,
-                                                   longitude)
-
-        clearsky = pvlib.clearsky.ineichen(df['zenith'], am, tl,
-                                           dni_extra=dni_extra,
-                                           altitude=altitude)
-        clearsky = pandas.concat([df, clearsky], axis=1)
+        am = geometry.air_mass
     else:
-        clearsky = df
-        z = numpy.radians(df['zenith'])
-        clearsky['ghi'] = 1098 * numpy.cos(z) * numpy.exp(-0.057 / numpy.cos(z))
-        clearsky['dni'] = dni_extra * numpy.power(0.7, numpy.power(am, 0.678))
-        clearsky['dhi'] = clearsky['ghi'] - horizontal_irradiance(clearsky['dni'], df['elevation'])
+        am = air_mass(df['zenith'], geometry.altitude, with_pvlib=with_pvlib)
+    function, _, needs_turbidity = _clear_sky_models[_clear_sky_model_name(model, with_pvlib)]
+    tl = None
+    if needs_turbidity:
+        tl = linke_turbidity(df.index, geometry.latitude, geometry.longitude)
+    df['ghi'], df['dni'], df['dhi'] = function(df['zenith'], am, geometry.dni_extra, turbidity=tl,
+                                               altitude=geometry.altitude)
+
+    return df.loc[:, ['ghi', 'dni', 'dhi']]
+
+
+def sites_clear_sky_irradiances(dates=None, daydate=_daydate, longitude=_longitude, latitude=_latitude,
+                                altitude=_altitude, timezone=_timezone, with_pvlib=True, model=None):
+    """ Estimate component of sky irradiance for clear sky conditions at several sites
+
+    Args:
+        dates: A pandas datetime index (as generated by pandas.date_range). If
+            None, daydate is used.
+        daydate: (str) yyyy-mm-dd (not used if dates is not None).
+        longitude: float or (S,) array-like of site longitudes (degrees)
+        latitude: float or (S,) array-like of site latitudes (degrees)
+        altitude: float or (S,) array-like of site altitudes (m)
+        timezone:(str) the time zone (not used if dates are already localised)
+        with_pvlib : Should we use pvlib library to estimate clearsky ?
+        model: (str) the name of the clear sky model (see clear_sky_irradiances)
+
+    Returns:
+        a dict with the localised dates ('dates') and (S, T) arrays of sun 'elevation', 'azimuth' and 'zenith' and of
+        clear sky 'ghi', 'dni' and 'dhi' (null when the sun is below the horizon).
+
+    Details:
+        Sun positions of all sites are computed in a single call (see sun_position.sun_positions). Extraterrestrial
+        radiation is computed once for all sites, air mass and Linke turbidity (day of year interpolation weights)
+        once for all (site x time) and shared by the model.
+    """
+    longitude, latitude, altitude = numpy.broadcast_arrays(numpy.atleast_1d(longitude), numpy.atleast_1d(latitude),
+                                                           numpy.atleast_1d(altitude))
+    sites = sun_positions(dates=dates, daydate=daydate, latitude=latitude, longitude=longitude, altitude=altitude,
+                          timezone=timezone)
+    zenith = sites['zenith']
+    dni_extra = numpy.asarray(sun_extraradiation(sites['dates']), dtype=float)[None, :]
+    am = numpy.asarray(air_mass(zenith, altitude[:, None], with_pvlib=with_pvlib))
+    function, _, needs_turbidity = _clear_sky_models[_clear_sky_model_name(model, with_pvlib)]
+    tl = None
+    if needs_turbidity:
+        tl = linke_turbidities(sites['dates'], latitude, longitude)
+    day = sites['elevation'] > 0
+    with numpy.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        irradiances = function(zenith, am, dni_extra, turbidity=tl, altitude=altitude[:, None])
+    for name, values in zip(('ghi', 'dni', 'dhi'), irradiances):
+        sites[name] = numpy.where(day, numpy.broadcast_to(values, zenith.shape), 0)
+    return sites
+
+
+# first day of months, as day of year index of a leap year
+_leap_month_starts = numpy.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+
+class ClearSkyTemplate(object):
+    """ Hourly sun geometry and clear sky irradiance of a site for every day of a reference leap year
+
+    The template is a (366, 24, 8) table of sun elevation, azimuth and zenith, extraterrestrial radiation, air mass and
+    clear sky ghi, dni and dhi of a clear sky model (see clear_sky_irradiances), computed on the hourly UTC grid of the
+    reference year (shifted by the minutes of the site UTC offset), with null irradiance at night. Dates of other years
+    are looked up by UTC month, day and hour: the error on sun position due to the year shift is a few tenths of degree
+    at most.
 
-    return clearsky.loc[:, ['ghi', 'dni', 'dhi']]
+    Args:
+        latitude: (float) in degrees
+        longitude: (float) in degrees
+        altitude: (float) in meter
+        timezone:(str) the time zone of the site
+        with_pvlib : Should we use pvlib library to estimate clearsky ?
+        model: (str) the name of the clear sky model (see clear_sky_irradiances)
+        year: (int) the (leap) reference year
+        table: a (366, 24, 8) precomputed table (see load). If None (default), the table is computed
+    """
+
+    fields = SolarGeometryStore.fields + ('ghi', 'dni', 'dhi')
+
+    def __init__(self, latitude=_latitude, longitude=_longitude, altitude=_altitude, timezone=_timezone,
+                 with_pvlib=True, model=None, year=2000, table=None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.timezone = timezone
+        self.with_pvlib = with_pvlib
+        self.model = _clear_sky_model_name(model, with_pvlib)
+        self.year = year
+        offset = pandas.Timestamp('{0}-01-01'.format(year), tz=timezone).utcoffset()
+        self.minute = int(offset.total_seconds() // 60) % 60
+        if table is None:
+            table = self.compute()
+        self.table = table
+
+    @property
+    def location(self):
+        """latitude, longitude, altitude and timezone of the site"""
+        return dict(latitude=self.latitude, longitude=self.longitude, altitude=self.altitude,
+                    timezone=self.timezone)
+
+    def compute(self):
+        """ (366, 24, 8) table of the template"""
+        start = pandas.Timestamp('{0}-01-01 00:{1:02d}'.format(self.year, self.minute), tz='UTC')
+        times = pandas.date_range(start, periods=366 * 24, freq='h').tz_convert(self.timezone)
+        geometry = SolarGeometry(times, filter_night=False, **self.location)
+        daytime = (geometry.elevation > 0).values
+        day = geometry.subset(daytime)
+        table = numpy.zeros((len(times), len(self.fields)))
+        table[:, 0] = geometry.elevation
+        table[:, 1] = geometry.azimuth
+        table[:, 2] = geometry.zenith
+        table[:, 3] = geometry.dni_extra
+        table[:, 4] = geometry.air_mass
+        cs = clear_sky_irradiances(with_pvlib=self.with_pvlib, geometry=day, model=self.model)
+        table[daytime, 5:] = cs.loc[:, ['ghi', 'dni', 'dhi']].values
+        return table.reshape((366, 24, len(self.fields)))
+
+    def lookup(self, dates):
+        """ Template values at dates
+
+        Args:
+            dates: a pandas datetime index of hourly dates (naive dates are localised with the site timezone)
+
+        Returns:
+            a pandas dataframe with template fields as columns, indexed by dates
+        """
+        if dates.tz is None:
+            dates = dates.tz_localize(self.timezone)
+        utc = dates.tz_convert('UTC')
+        if numpy.any(utc.minute != self.minute) or numpy.any((utc.second != 0) | (utc.microsecond != 0)):
+            raise ValueError('dates are not on the hourly grid of the clear sky template')
+        day = _leap_month_starts[utc.month - 1] + utc.day - 1
+        return pandas.DataFrame(self.table[day, utc.hour], index=dates, columns=self.fields)
+
+    def save(self, path):
+        """ Save the template to a npz file"""
+        numpy.savez(path, table=self.table, latitude=self.latitude, longitude=self.longitude,
+                    altitude=self.altitude, timezone=self.timezone, with_pvlib=self.with_pvlib, model=self.model,
+                    year=self.year)
+
+    @classmethod
+    def load(cls, path):
+        """ Load a template from a npz file"""
+        with numpy.load(path) as data:
+            # templates saved without model use the default model
+            model = str(data['model']) if 'model' in data.files else None
+            return cls(latitude=float(data['latitude']), longitude=float(data['longitude']),
+                       altitude=float(data['altitude']), timezone=str(data['timezone']),
+                       with_pvlib=bool(data['with_pvlib']), model=model, year=int(data['year']),
+                       table=data['table'])
+
+
+# in-memory cache of clear sky templates, indexed by site and model
+_clear_sky_templates = {}
+
+
+def clear_sky_template(longitude=_longitude, latitude=_latitude, altitude=_altitude, timezone=_timezone,
+                       with_pvlib=True, path=None, model=None):
+    """ Clear sky template of a site, built once and cached in memory
+
+    Args:
+        longitude: (float) in degrees
+        latitude: (float) in degrees
+        altitude: (float) in meter
+        timezone:(str) the time zone of the site
+        with_pvlib : Should we use pvlib library to estimate clearsky ?
+        path: (str) a npz file where the template is persisted. If the file holds the template of the same site and
+            model, the template is loaded from it, otherwise the template is built and saved to it. If None (default),
+            the template is not persisted.
+        model: (str) the name of the clear sky model (see clear_sky_irradiances)
+
+    Returns:
+        a ClearSkyTemplate
+    """
+    model = _clear_sky_model_name(model, with_pvlib)
+    key = (latitude, longitude, altitude, timezone, with_pvlib, model)
+    if key not in _clear_sky_templates:
+        template = None
+        if path is not None and os.path.exists(path):
+            template = ClearSkyTemplate.load(path)
+            if (template.latitude, template.longitude, template.altitude, template.timezone, template.with_pvlib,
+                    template.model) != key:
+                template = None
+        if template is None:
+            template = ClearSkyTemplate(latitude=latitude, longitude=longitude, altitude=altitude,
+                                        timezone=timezone, with_pvlib=with_pvlib, model=model)
+            if path is not None:
+                template.save(path)
+        _clear_sky_templates[key] = template
+    return _clear_sky_templates[key]
+
+
+def _clearness(ghi, zenith, dni_extra, min_cos_zenith=0.065):
+    """clearness index bounded to [0, 1] and cosine of sun zenith, as in pvlib decomposition models"""
+    cos_zenith = numpy.cos(numpy.radians(zenith))
+    kt = ghi / (dni_extra * numpy.maximum(cos_zenith, min_cos_zenith))
+    return numpy.minimum(numpy.maximum(kt, 0), 1), cos_zenith
+
+
+def _split(ghi, zenith, cos_zenith, diffuse_fraction, max_zenith=87):
+    """direct normal and diffuse horizontal irradiance from diffuse fraction, as in pvlib decomposition models"""
+    dhi = diffuse_fraction * ghi
+    dni = (ghi - dhi) / cos_zenith
+    bad_values = (zenith > max_zenith) | (ghi < 0) | (dni < 0)
+    return numpy.where(bad_values, 0, dni), numpy.where(bad_values, ghi, dhi)
+
+
+def erbs_decomposition(ghi, zenith, dni_extra, times=None, pressure=101325, temp_dew=None):
+    """Direct normal and diffuse horizontal irradiance after Erbs et al. (1982)
+
+    Args:
+        ghi: (array-like) global horizontal irradiance (W.m-2)
+        zenith: (array-like) sun zenith angle (deg)
+        dni_extra: (array-like) extraterrestrial radiation (W.m-2)
+        times: a pandas datetime index (not used)
+        pressure: the site pressure (Pa) (not used)
+        temp_dew: the dew point temperature (not used)
+
+    Returns:
+        dni, dhi arrays
+
+    Details:
+        D.G. Erbs, S.A. Klein, J.A. Duffie, "Estimation of the diffuse radiation fraction for hourly, daily and
+        monthly-average global radiation", Solar Energy, Volume 28, Issue 4, 1982, Pages 293-302
+    """
+    kt, cos_zenith = _clearness(ghi, zenith, dni_extra)
+    fraction = numpy.where(kt <= 0.22, 1 - 0.09 * kt,
+                           numpy.where(kt <= 0.8,
+                                       0.9511 - 0.1604 * kt + 4.388 * kt ** 2 - 16.638 * kt ** 3 + 12.336 * kt ** 4,
+                                       0.165))
+    return _split(ghi, zenith, cos_zenith, fraction)
+
+
+def boland_decomposition(ghi, zenith, dni_extra, times=None, pressure=101325, temp_dew=None, a_coeff=8.645,
+                         b_coeff=0.613):
+    """Direct normal and diffuse horizontal irradiance after the logistic model of Boland et al. (2008)
+
+    Args:
+        ghi: (array-like) global horizontal irradiance (W.m-2)
+        zenith: (array-like) sun zenith angle (deg)
+        dni_extra: (array-like) extraterrestrial radiation (W.m-2)
+        times: a pandas datetime index (not used)
+        pressure: the site pressure (Pa) (not used)
+        temp_dew: the dew point temperature (not used)
+        a_coeff, b_coeff: logistic coefficients (defaults are those of pvlib, fitted on 15 min data. Hourly data
+            coefficients are 7.997 and 0.586)
+
+    Returns:
+        dni, dhi arrays
+
+    Details:
+        J. Boland, B. Ridley, B. Brown, "Models of diffuse solar radiation", Renewable Energy, Volume 33, Issue 4,
+        2008, Pages 575-584
+    """
+    kt, cos_zenith = _clearness(ghi, zenith, dni_extra)
+    fraction = 1.0 / (1.0 + numpy.exp(a_coeff * (kt - b_coeff)))
+    return _split(ghi, zenith, cos_zenith, fraction)
+
+
+def spitters_decomposition(ghi, zenith, dni_extra, times=None, pressure=101325, temp_dew=None):
+    """Direct normal and diffuse horizontal irradiance after Spitters et al. (1986)
+
+    Args:
+        ghi: (array-like) global horizontal irradiance (W.m-2)
+        zenith: (array-like) sun zenith angle (deg)
+        dni_extra: (array-like) extraterrestrial radiation (W.m-2)
+        times: a pandas datetime index (not used)
+        pressure: the site pressure (Pa) (not used)
+        temp_dew: the dew point temperature (not used)
+
+    Returns:
+        dni, dhi arrays
+
+    Details:
+        Spitters CJT, Toussaint HAJM, Goudriaan J (1986) "Separating the diffuse and direct component of global
+         radiation and its implications for modeling canopy photosynthesis.Part I.Components of incoming radiation",
+         Agricultural and Forest Meteorology 38: 217-229.
+    """
+    costheta = numpy.cos(numpy.radians(zenith))
+    RsRso = ghi / (dni_extra * costheta)
+    R = 0.847 - 1.61 * costheta + 1.04 * costheta * costheta
+    K = (1.47 - R) / 1.66
+    RdRs = numpy.where(RsRso <= 0.22, 1,
+                       numpy.where(RsRso <= 0.35,
+                                   1 - 6.4 * (RsRso - 0.22) ** 2,
+                                   numpy.where(RsRso <= K,
+                                               1.47 - 1.66 * RsRso,
+                                               R)))
+    dhi = ghi * RdRs
+    return numpy.asarray((ghi - dhi) / costheta), numpy.asarray(dhi)
+
+
+def disc_decomposition(ghi, zenith, dni_extra, times, pressure=101325, temp_dew=None):
+    """Direct normal and diffuse horizontal irradiance after the DISC model of Maxwell (1987), using pvlib
+
+    Args:
+        ghi: (array-like) global horizontal irradiance (W.m-2)
+        zenith: (array-like) sun zenith angle (deg)
+        dni_extra: (array-like) extraterrestrial radiation (W.m-2) (not used: DISC uses its own solar constant)
+        times: a pandas datetime index
+        pressure: the site pressure (Pa)
+        temp_dew: the dew point temperature (not used)
+
+    Returns:
+        dni, dhi arrays
+
+    Details:
+        Maxwell, E. L., "A Quasi-Physical Model for Converting Hourly Global Horizontal to Direct Normal Insolation",
+        Technical Report No. SERI/TR-215-3087, Golden, CO: Solar Energy Research Institute, 1987.
+    """
+    dni = numpy.asarray(pvlib.irradiance.disc(ghi, zenith, times, pressure=pressure)['dni'])
+    return dni, numpy.asarray(ghi - horizontal_irradiance(dni, 90 - zenith))
+
+
+def dirint_decomposition(ghi, zenith, dni_extra, times, pressure=101325, temp_dew=None):
+    """Direct normal and diffuse horizontal irradiance after the DIRINT model of Perez et al. (1992), using pvlib
+
+    Args:
+        ghi: (array-like) global horizontal irradiance (W.m-2) of successive timesteps
+        zenith: (array-like) sun zenith angle (deg)
+        dni_extra: (array-like) extraterrestrial radiation (W.m-2) (not used: DIRINT uses its own solar constant)
+        times: a pandas datetime index
+        pressure: the site pressure (Pa)
+        temp_dew: the dew point temperature
+
+    Returns:
+        dni, dhi arrays
+
+    Details:
+        Perez, R., P. Ineichen, E. Maxwell, R. Seals and A. Zelenka, (1992). "Dynamic Global-to-Direct Irradiance
+         Conversion Models", ASHRAE Transactions-Research Series, pp. 354-369
+    """
+    dni = numpy.asarray(pvlib.irradiance.dirint(ghi, zenith, times, pressure=pressure, temp_dew=temp_dew))
+    return dni, numpy.asarray(ghi - horizontal_irradiance(dni, 90 - zenith))
+
+
+# registry of decomposition models: name -> (function, is_available)
+# functions take ghi, sun zenith, extraterrestrial radiation, times, pressure and dew temperature and return dni and
+# dhi arrays
+_decomposition_models = {}
+
+
+def register_decomposition_model(name, function, available=True):
+    """ Register a model estimating direct and diffuse components of global horizontal irradiance
+
+    Args:
+        name (str): the name of the model
+        function: a function with (ghi, zenith, dni_extra, times, pressure=101325, temp_dew=None) signature,
+            returning direct normal and diffuse horizontal irradiance arrays
+        available (bool): is the model usable on this system ?
+    """
+    _decomposition_models[name] = (function, available)
+
+
+def available_decomposition_models():
+    """ Names of the decomposition models usable on this system"""
+    return [k for k, (_, available) in _decomposition_models.items() if available]
+
+
+def decomposition_model(name=None, with_pvlib=True):
+    """ A registered decomposition model
+
+    Args:
+        name (str): the name of the model. If None (default), 'dirint' is used if pvlib is available and with_pvlib
+            is True, 'spitters' otherwise
+        with_pvlib : Should we use pvlib library (only used if name is None)?
+
+    Returns:
+        the decomposition function
+    """
+    if name is None:
+        name = 'dirint' if pvlib and with_pvlib else 'spitters'
+    if name not in available_decomposition_models():
+        raise ValueError('unavailable decomposition model: ' + str(name))
+    return _decomposition_models[name][0]
+
+
+register_decomposition_model('erbs', erbs_decomposition)
+register_decomposition_model('boland', boland_decomposition)
+register_decomposition_model('spitters', spitters_decomposition)
+register_decomposition_model('disc', disc_decomposition, pvlib is not None)
+register_decomposition_model('dirint', dirint_decomposition, pvlib is not None)
 
 
 def actual_sky_irradiances(dates=None, daydate=_daydate, ghi=None,
                            attenuation=None,
                            pressure=101325, temp_dew=None, longitude=_longitude,
                            latitude=_latitude, altitude=_altitude,
-                           timezone=_timezone, with_pvlib=True):
+                           timezone=_timezone, with_pvlib=True, store=None, geometry=None, model=None):
     """ Estimate component of sky irradiances from measured actual global
     horizontal irradiance or attenuated clearsky conditions.
 
@@ -263,13 +877,22 @@ def actual_sky_irradiances(dates=None, daydate=_daydate, ghi=None,
         altitude: (float) in meter
         timezone:(str) the time zone (not used if dates are already localised)
         with_pvlib : Should we use pvlib library to estimate sky irradiances ?
+        store: a SolarGeometryStore from which sun position and
+            extraterrestrial radiation are read. If None (default), they are
+            computed.
+        geometry: the SolarGeometry of the request. If not None, dates,
+            daydate, location and store arguments are not used.
+        model: (str) the name of the decomposition model (see
+            available_decomposition_models). If None (default), the model is
+            chosen according to with_pvlib.
 
     Returns:
         a pandas dataframe with global horizontal irradiance, direct normal
         irradiance and diffuse horizontal irradiance.
 
     Details:
-        if with_pvlib is True, the 'dirint' model of Perez (1992) is used, otherwise the model of Spitters (1986) is used
+        if model is None and with_pvlib is True, the 'dirint' model of Perez (1992) is used, otherwise the model of
+        Spitters (1986) is used
 
         Perez, R., P. Ineichen, E. Maxwell, R. Seals and A. Zelenka, (1992). "Dynamic Global-to-Direct Irradiance
          Conversion Models", ASHRAE Transactions-Research Series, pp. 354-369
@@ -278,14 +901,13 @@ def actual_sky_irradiances(dates=None, daydate=_daydate, ghi=None,
          Agricultural and Forest Meteorology 38: 217-229.
     """
 
-    location = dict(latitude=latitude,
-                    longitude=longitude,
-                    altitude=altitude,
-                    timezone=timezone)
-    df = sun_position(dates=dates, daydate=daydate, **location)
+    if geometry is None:
+        geometry = SolarGeometry(dates, daydate, latitude=latitude, longitude=longitude, altitude=altitude,
+                                 timezone=timezone, store=store)
+    df = geometry.sun_position()
 
     if ghi is None:
-        cs = clear_sky_irradiances(dates=df.index, **location, with_pvlib=with_pvlib)
+        cs = clear_sky_irradiances(with_pvlib=with_pvlib, geometry=geometry)
         ghi = cs['ghi']
 
     df['ghi'] = ghi
@@ -293,25 +915,9 @@ def actual_sky_irradiances(dates=None, daydate=_daydate, ghi=None,
     if attenuation is not None:
         df.ghi *= attenuation
 
-    if pvlib and with_pvlib:
-        df['dni'] = pvlib.irradiance.dirint(df.ghi, 90 - df.elevation, df.index,
-                                            pressure=pressure, temp_dew=temp_dew)
-        df['dhi'] = df.ghi - horizontal_irradiance(df.dni, df.elevation)
-    else:
-        Io = sun_extraradiation(df.index)
-        costheta = numpy.sin(numpy.radians(df.elevation))
-        So = Io * costheta
-        RsRso = df.ghi / So
-        R = 0.847 - 1.61 * costheta + 1.04 * costheta * costheta
-        K = (1.47 - R) / 1.66
-        RdRs = numpy.where(RsRso <= 0.22, 1,
-                           numpy.where(RsRso <= 0.35,
-                                       1 - 6.4 * (RsRso - 0.22) ** 2,
-                                       numpy.where(RsRso <= K,
-                                                   1.47 - 1.66 * RsRso,
-                                                   R)))
-        df['dhi'] = df.ghi * RdRs
-        df['dni'] = directional_luminance(df['ghi'] - df['dhi'], df['elevation'])
+    decomposition = decomposition_model(model, with_pvlib=with_pvlib)
+    df['dni'], df['dhi'] = decomposition(df.ghi, 90 - df.elevation, geometry.dni_extra, df.index,
+                                         pressure=pressure, temp_dew=temp_dew)
 
     return df.loc[:, ('ghi', 'dhi', 'dni')]
 
@@ -321,7 +927,7 @@ def sky_irradiance(dates=None, ghi=None, dhi=None, ppfd=None,
                    attenuation=None,
                    pressure=101325, temp_dew=None, longitude=_longitude,
                    latitude=_latitude, altitude=_altitude,
-                   timezone=_timezone, with_pvlib=True):
+                   timezone=_timezone, with_pvlib=True, store=None, geometry=None, template=None, model=None):
     """ Estimate variables related to sky irradiance.
 
     Args:
@@ -345,47 +951,289 @@ def sky_irradiance(dates=None, ghi=None, dhi=None, ppfd=None,
         altitude: (float) in meter
         timezone:(str) the time zone (not used if dates are already localised)
         with_pvlib : Should we use pvlib library to estimate sky irradiances ?
+        store: a SolarGeometryStore from which sun geometry is read. If None
+            (default), sun geometry is computed.
+        geometry: the SolarGeometry of the request, shared by all irradiance estimates. If None (default), it is
+            computed once from dates, daydate, location and store.
+        template: a ClearSkyTemplate of the site, from which clear sky irradiance used to disaggregate day_ghi are
+            read. If None (default), they are computed.
+        model: (str) the name of the model used to estimate dni and dhi from ghi (see available_decomposition_models).
+            If None (default), the model is chosen according to with_pvlib (see actual_sky_irradiances)
 
     Returns:
         a pandas dataframe with azimuth, zenital and elevation angle of the sun, global horizontal irradiance, direct
         normal irradiance and diffuse horizontal irradiance of the sky.
     """
 
-    location = dict(latitude=latitude,
-                    longitude=longitude,
-                    altitude=altitude,
-                    timezone=timezone)
-    df = sun_position(dates=dates, daydate=daydate, **location)
+    if geometry is None:
+        geometry = SolarGeometry(dates, daydate, latitude=latitude, longitude=longitude, altitude=altitude,
+                                 timezone=timezone, store=store)
+    df = geometry.sun_position()
     if len(df) < 1:  # night
         if ghi is not None:  # twilight conditions (sun_el < 0, ghi > 0)
-            df = sun_position(dates=dates, daydate=daydate, filter_night=False, **location)
+            geometry = geometry.with_night()
+            df = geometry.sun_position()
             df['ghi'] = ghi
             df['dhi'] = ghi
             df['dni'] = 0
-            df = df.loc[df.ghi > 0, :]
+            twilight = df.ghi > 0
+            df = df.loc[twilight, :]
+            geometry = geometry.subset(twilight)
         else:
             df['ghi'] = 0
             df['dhi'] = 0
             df['dni'] = 0
     else:   # day
         if dates is None and day_ghi is not None:
-            cs = clear_sky_irradiances(daydate=daydate, with_pvlib=with_pvlib, **location)
+            if template is None:
+                cs = clear_sky_irradiances(with_pvlib=with_pvlib, geometry=geometry)
+            else:
+                cs = template.lookup(geometry.index)
             mj_cs = cs.ghi.sum() * 3600 / 1e6
             ghi = cs.ghi * day_ghi / mj_cs
         if ghi is None or dhi is None:
-            irr = actual_sky_irradiances(dates=df.index, ghi=ghi,
-                                         attenuation=attenuation, pressure=pressure,
-                                         temp_dew=temp_dew, with_pvlib=with_pvlib, **location)
+            irr = actual_sky_irradiances(ghi=ghi, attenuation=attenuation, pressure=pressure,
+                                         temp_dew=temp_dew, with_pvlib=with_pvlib, geometry=geometry, model=model)
             df = pandas.concat([df, irr], axis=1)
         else:
             df['ghi'] = ghi
             df['dhi'] = dhi
             df['dni'] = directional_luminance(numpy.array(ghi) - numpy.array(dhi), df.elevation)
     if ppfd is None:
-        ppfd = df.ghi * micromol_per_joule(df.index, df.ghi, df.elevation, temp_dew=temp_dew)
+        ppfd = df.ghi * micromol_per_joule(df.index, df.ghi, df.elevation, temp_dew=temp_dew, geometry=geometry)
     df['ppfd'] = ppfd
 
     return df.loc[:,
            ['azimuth', 'zenith', 'elevation', 'ghi', 'dni', 'dhi', 'ppfd']]
 
 
+def _stream_chunk(chunk, previous, following, pressure, with_pvlib, model, location):
+    """sky irradiance of the daytime rows of a chunk, with the neighbouring daytime rows as dirint context"""
+    sun, record = chunk
+    if len(sun) == 0:
+        return pandas.DataFrame(columns=['azimuth', 'zenith', 'elevation', 'ghi', 'dni', 'dhi', 'ppfd'],
+                                index=sun.index, dtype=float)
+    parts = [part for part in (previous, chunk, following) if part is not None]
+    sun = pandas.concat([part[0] for part in parts])
+    record = pandas.concat([part[1] for part in parts])
+    geometry = SolarGeometry(sun.index, sun=sun, **location)
+    kwds = {k: record[k] for k in ('dhi', 'ppfd', 'temp_dew', 'pressure') if k in record}
+    kwds.setdefault('pressure', pressure)
+    df = sky_irradiance(dates=sun.index, ghi=record['ghi'], with_pvlib=with_pvlib, geometry=geometry, model=model,
+                        **kwds, **location)
+    start = 0 if previous is None else 1
+    return df.iloc[start:start + len(chunk[0])]
+
+
+def iter_sky_irradiance(records, pressure=101325, longitude=_longitude, latitude=_latitude, altitude=_altitude,
+                        timezone=_timezone, with_pvlib=True, store=None, model=None):
+    """ Estimate variables related to sky irradiance (see sky_irradiance) for a stream of meteorological records
+
+    Records are consumed chunk by chunk, so that long sub-hourly series can be processed with a bounded memory
+    footprint. The dirint decomposition model uses the clearness of neighbouring daytime timesteps: the last daytime
+    row of the previous chunk and the first daytime row of the next chunk are used as context, so that outputs are
+    the same as sky_irradiance on the whole series. A chunk is therefore yielded once the next chunk with daytime
+    records has been read.
+
+    Args:
+        records: an iterable of datetime indexed dataframes in chronological order (e.g. as returned by
+            pandas.read_csv(..., chunksize=...)), with a 'ghi' column (W.m-2) and optionally 'dhi', 'ppfd',
+            'temp_dew' and 'pressure' columns (see sky_irradiance). Naive dates are localised with timezone.
+        pressure: the site pressure (Pa) (for dirint model), if not given in records
+        longitude: (float) in degrees
+        latitude: (float) in degrees
+        altitude: (float) in meter
+        timezone:(str) the time zone
+        with_pvlib : Should we use pvlib library to estimate sky irradiances ?
+        store: a SolarGeometryStore from which sun geometry is read. If None (default), sun geometry is computed.
+        model: (str) the name of the decomposition model (see sky_irradiance)
+
+    Yields:
+        for each chunk, a pandas dataframe with azimuth, zenital and elevation angle of the sun, global horizontal
+        irradiance, direct normal irradiance, diffuse horizontal irradiance and ppfd of the sky at daytime records.
+    """
+    location = dict(latitude=latitude, longitude=longitude, altitude=altitude, timezone=timezone)
+    previous = None  # last daytime (sun, record) row of yielded chunks
+    waiting = []  # (sun, record) daytime rows of chunks waiting for the next daytime record
+    for record in records:
+        if record.index.tz is None:
+            record = record.tz_localize(timezone)
+        geometry = SolarGeometry(record.index, filter_night=False, store=store, **location)
+        daytime = (geometry.elevation > 0).values
+        chunk = (geometry.sun.loc[daytime, :], record.loc[daytime, :])
+        if len(chunk[0]) == 0:
+            waiting.append(chunk)
+            continue
+        following = (chunk[0].iloc[:1], chunk[1].iloc[:1])
+        for pending in waiting:
+            yield _stream_chunk(pending, previous, following, pressure, with_pvlib, model, location)
+            if len(pending[0]) > 0:
+                previous = (pending[0].iloc[-1:], pending[1].iloc[-1:])
+        waiting = [chunk]
+    for pending in waiting:
+        yield _stream_chunk(pending, previous, None, pressure, with_pvlib, model, location)
+        if len(pending[0]) > 0:
+            previous = (pending[0].iloc[-1:], pending[1].iloc[-1:])
+
+
+def _per_hour(values, shape):
+    """broadcast a scalar or a (D,) array of daily values to a (D, H) array"""
+    values = numpy.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    return numpy.broadcast_to(values, shape)
+
+
+def _day_hours(daydates, timezone=_timezone):
+    """(D * 24,) localised hourly dates of days, as generated by sky_irradiance for each daydate"""
+    starts = pandas.DatetimeIndex(pandas.to_datetime(daydates))
+    if starts.tz is None:
+        starts = starts.tz_localize(timezone)
+    utc = starts.tz_convert('UTC').tz_localize(None).values.astype('datetime64[ns]')
+    hours = utc[:, None] + numpy.arange(24) * numpy.timedelta64(1, 'h')
+    return pandas.DatetimeIndex(hours.ravel()).tz_localize('UTC').tz_convert(starts.tz)
+
+
+def _daily_dirint(ghi, zenith, times, pressure=101325, temp_dew=None):
+    """dirint direct normal irradiance for (D, H) arrays of hourly ghi (nan at night) of successive days
+
+    dirint uses the clearness index of neighbouring timesteps: a nan separator is appended to each day, so that all
+    days are decomposed in a single pass with the same boundary conditions as day-by-day computations.
+    """
+    d, h = ghi.shape
+    utc = times.tz_convert('UTC').tz_localize(None).values.reshape(d, h)
+    utc = numpy.concatenate([utc, utc[:, -1:] + numpy.timedelta64(30, 'm')], axis=1)
+    padded = pandas.DatetimeIndex(utc.ravel()).tz_localize('UTC').tz_convert(times.tz)
+
+    def _pad(values):
+        return numpy.concatenate([values, numpy.full((d, 1), numpy.nan)], axis=1).ravel()
+
+    pressure = _pad(_per_hour(pressure, (d, h)))
+    if temp_dew is not None:
+        temp_dew = _pad(_per_hour(temp_dew, (d, h)))
+    dni = pvlib.irradiance.dirint(pandas.Series(_pad(ghi), index=padded),
+                                  pandas.Series(_pad(zenith), index=padded), padded,
+                                  pressure=pressure, temp_dew=temp_dew)
+    return numpy.asarray(dni).reshape(d, h + 1)[:, :-1]
+
+
+def daily_sky_irradiances(daydates, day_ghi=None, attenuation=None, pressure=101325, temp_dew=None,
+                          longitude=_longitude, latitude=_latitude, altitude=_altitude, timezone=_timezone,
+                          with_pvlib=True, store=None, template=None, model=None):
+    """ Hourly sky irradiance of a series of days, disaggregated from daily global horizontal irradiance
+
+    This is the batch equivalent of calling sky_irradiance(daydate=daydate, day_ghi=ghi, ...) for every day and
+    concatenating the results: sun positions, clear sky profiles, scaling to daily irradiance and decomposition are
+    computed once for all (day x hour) timesteps.
+
+    Args:
+        daydates: a sequence of D days (str yyyy-mm-dd, dates or a pandas.DatetimeIndex)
+        day_ghi: (array-like) the D daily global horizontal irradiance (MJ.m-2). If None (default), clear sky
+            irradiance are used
+        attenuation: (float or array-like) an attenuation factor for daily global (actual_ghi = attenuation * ghi),
+            possibly one per day. If None (default), no attenuation is applied
+        pressure: the site pressure (Pa) (for dirint model), possibly one per day
+        temp_dew: the dew point temperature (dirint model), possibly one per day
+        longitude: (float) in degrees
+        latitude: (float) in degrees
+        altitude: (float) in meter
+        timezone:(str) the time zone of the site
+        with_pvlib : Should we use pvlib library to estimate sky irradiances ?
+        store: a SolarGeometryStore from which sun geometry is read. If None (default), sun geometry is computed.
+        template: a ClearSkyTemplate of the site, from which sun geometry and clear sky irradiance are read. If None
+            (default), they are computed (see store).
+        model: (str) the name of the decomposition model (see sky_irradiance)
+
+    Returns:
+        a pandas dataframe with azimuth, zenital and elevation angle of the sun, global horizontal irradiance, direct
+        normal irradiance, diffuse horizontal irradiance and ppfd of the sky for daytime hours of all days.
+    """
+    dates = _day_hours(daydates, timezone)
+    shape = (len(dates) // 24, 24)
+    location = dict(latitude=latitude, longitude=longitude, altitude=altitude, timezone=timezone)
+    if template is None:
+        geometry = SolarGeometry(dates, filter_night=False, store=store, **location)
+    else:
+        cs = template.lookup(dates)
+        geometry = SolarGeometry(dates, sun=cs.loc[:, list(SolarGeometryStore.fields)], **location)
+    daytime = (geometry.elevation > 0).values
+    day = geometry.subset(daytime)
+
+    ghi = numpy.zeros(len(dates))
+    if template is None:
+        ghi[daytime] = clear_sky_irradiances(with_pvlib=with_pvlib, geometry=day)['ghi'].values
+    else:
+        ghi[daytime] = cs['ghi'].values[daytime]
+    ghi = ghi.reshape(shape)
+    if day_ghi is not None:
+        mj_cs = ghi.sum(axis=1) * 3600 / 1e6
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            ghi = ghi * _per_hour(numpy.asarray(day_ghi, dtype=float) / mj_cs, shape)
+    if attenuation is not None:
+        ghi = ghi * _per_hour(attenuation, shape)
+
+    df = day.sun_position()
+    df['ghi'] = ghi.ravel()[daytime]
+    decomposition = decomposition_model(model, with_pvlib=with_pvlib)
+    if decomposition is dirint_decomposition:
+        ghi = numpy.where(daytime.reshape(shape), ghi, numpy.nan)
+        zenith = numpy.where(daytime, 90 - geometry.elevation.values, numpy.nan).reshape(shape)
+        dni = _daily_dirint(ghi, zenith, dates, pressure=pressure, temp_dew=temp_dew)
+        df['dni'] = dni.ravel()[daytime]
+        df['dhi'] = df.ghi - horizontal_irradiance(df.dni, df.elevation)
+    if temp_dew is not None:
+        temp_dew = _per_hour(temp_dew, shape).ravel()[daytime]
+    if decomposition is not dirint_decomposition:
+        df['dni'], df['dhi'] = decomposition(df.ghi, 90 - df.elevation, day.dni_extra, df.index,
+                                             pressure=_per_hour(pressure, shape).ravel()[daytime], temp_dew=temp_dew)
+    df['ppfd'] = df.ghi * micromol_per_joule(df.index, df.ghi, df.elevation, temp_dew=temp_dew, geometry=day)
+
+    return df.loc[:, ['azimuth', 'zenith', 'elevation', 'ghi', 'dni', 'dhi', 'ppfd']]
+
+
+def benchmark_decomposition_models(ghi=None, latitude=43.61, longitude=3.87, altitude=56, timezone=_timezone,
+                                   reference='dirint', repeat=3):
+    """ Time decomposition models and compare their estimates to a reference model
+
+    Args:
+        ghi: a datetime indexed series of measured global horizontal irradiance (W.m-2). If None (default),
+            the bundled Montpellier 2013 measurements (astk.data_access) are used. Missing values and night time
+            measurements are discarded
+        latitude: (float) in degrees
+        longitude: (float) in degrees
+        altitude: (float) in meter
+        timezone:(str) the time zone (not used if dates are already localised)
+        reference: (str) the name of the reference model. Bundled measurements have no diffuse component, so
+            accuracy is assessed against a reference model rather than measured dhi.
+        repeat: the number of timed runs (the fastest is retained)
+
+    Returns:
+        a pandas dataframe indexed by model names, with 'time' (s), 'throughput' (timesteps per second), 'rmse_dhi'
+        and 'mbe_dhi' (root mean square and mean bias deviations of dhi from the reference, W.m-2) and
+        'diffuse_fraction' (total dhi / total ghi) columns, sorted by time
+    """
+    if ghi is None:
+        from openalea.astk.data_access import montpellier_spring_2013, montpellier_winter_2013
+        ghi = pandas.concat([montpellier_winter_2013(), montpellier_spring_2013()])['ghi']
+    ghi = ghi.dropna()
+    geometry = SolarGeometry(ghi.index, latitude=latitude, longitude=longitude, altitude=altitude,
+                             timezone=timezone)
+    ghi = ghi.loc[geometry.index]
+    zenith = 90 - geometry.elevation
+    results = {}
+    for name in available_decomposition_models():
+        function = _decomposition_models[name][0]
+        dni, dhi = function(ghi, zenith, geometry.dni_extra, geometry.index)
+        timing = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            function(ghi, zenith, geometry.dni_extra, geometry.index)
+            timing.append(time.perf_counter() - start)
+        results[name] = (min(timing), dhi)
+    _, ref = results[reference]
+    report = {}
+    for name, (timing, dhi) in results.items():
+        report[name] = {'time': timing, 'throughput': len(ghi) / timing,
+                        'rmse_dhi': numpy.sqrt(numpy.mean((dhi - ref) ** 2)), 'mbe_dhi': numpy.mean(dhi - ref),
+                        'diffuse_fraction': dhi.sum() / ghi.sum()}
+    return pandas.DataFrame(report).T.sort_values('time')
@@ -14,13 +14,15 @@
 """ A collection of equation for modelling distribution of sky luminance
 """
 import numpy
+from collections import OrderedDict
 from openalea.astk.sky_irradiance import (
     horizontal_irradiance,
     all_weather_sky_clearness, 
     f_clear_sky,
     all_weather_sky_brightness
 )
-from openalea.astk.sky_map import ksi_grid, scale_sky, sky_ni, sky_lum
+from openalea.astk.sky_map import (ksi_grid, scale_sky, sky_ni, sky_lum, as_sky_grid, rotate_azimuth,
+                                   _per_map)
 
 
 def cie_luminance_gradation(z, a=4, b=-0.7):
@@ -69,12 +71,16 @@ def cie_relative_luminance(sky_zenith=None, grid=None, sun_zenith=None,
     sun_azimuth: azimuth angle of the sun (deg)
     type is one of 'soc' (standard overcast sky), 'uoc' (uniform radiance)
     or 'clear_sky' (standard clear sky low turbidity)
+
+    For 'clear_sky', sun_zenith and sun_azimuth can be (T,) arrays, in which case
+    a (T,) stack of luminance grids is returned
     """
 
     if sky_zenith is None and grid is None:
         raise ValueError('Either sky_zenith or grid should be passed')
     sky_azimuth = None
     if grid is not None:
+        grid = as_sky_grid(grid)
         _, sky_zenith, _ = grid
     else:
         sky_zenith = numpy.array(sky_zenith)
@@ -93,7 +99,7 @@ def cie_relative_luminance(sky_zenith=None, grid=None, sun_zenith=None,
     indicatrix = 1
     if type == 'clear_sky':
         cde = {'c': 10, 'd': -3, 'e': 0.45}
-        ksi_sun = sun_zenith
+        ksi_sun = _per_map(grid, sun_zenith)
         ksi = ksi_grid(grid, sun_zenith, sun_azimuth)
         indicatrix = cie_scattering_indicatrix(ksi, ksi_sun=ksi_sun, **cde)
 
@@ -109,20 +115,14 @@ def all_weather_abcde(sun_zenith, clearness, brightness):
         brightness: sky brightness as defined in Perez et al. (1993)
 
     Returns:
-        a tuple of 5 parameters to be used by CIE sky luminance functions
+        a tuple of 5 parameters to be used by CIE sky luminance functions. If sun_zenith, clearness and brightness
+        are (T,) arrays, each parameter is a (T,) array.
 
     Details:
         R. Perez, R. Seals, J. Michalsky, "All-weather model for sky luminance distribution—Preliminary configuration and
         validation", Solar Energy, Volume 50, Issue 3, 1993, Pages 235-245,
     """
 
-    def _awfit(p1, p2, p3, p4, zen, br):
-        p1 = numpy.array(p1)
-        p2 = numpy.array(p2)
-        p3 = numpy.array(p3)
-        p4 = numpy.array(p4)
-        return p1 + p2 * zen + br * (p3 + p4 * zen)
-
     bins = [1, 1.065, 1.23, 1.5, 1.95, 2.8, 4.5, 6.2]
     a1 = (1.3525, -1.2219, -1.1000, -0.5484, -0.6000, -1.0156, -1.0000, -1.0500)
     a2 = (-0.2576, -0.7730, -0.2215, -0.6654, -0.3566, -0.3670, 0.0211, 0.0289)
@@ -147,24 +147,30 @@ def all_weather_abcde(sun_zenith, clearness, brightness):
     e3 = (-0.5718, -0.2190, 0.4199, -0.0876, -0.0656, 0.3017, -2.4517, 1.8564)
     e4 = (0.9938, -0.4285, -0.5562, -0.0329, -0.1294, -0.4844, 1.4656, 0.5636)
 
-    index = max(0, numpy.searchsorted(bins, clearness) - 1)
+    # (parameter, fit coefficient, clearness bin) array of coefficients
+    coefs = numpy.array([[a1, a2, a3, a4],
+                         [b1, b2, b3, b4],
+                         [c1, c2, c3, c4],
+                         [d1, d2, d3, d4],
+                         [e1, e2, e3, e4]])
+
+    clearness = numpy.asarray(clearness, dtype=float)
+    brightness = numpy.asarray(brightness, dtype=float)
     z = numpy.radians(sun_zenith)
-    a = _awfit(a1, a2, a3, a4, z, brightness)[index]
-    b = _awfit(b1, b2, b3, b4, z, brightness)[index]
-    c = _awfit(c1, c2, c3, c4, z, brightness)[index]
-    d = _awfit(d1, d2, d3, d4, z, brightness)[index]
-    e = _awfit(e1, e2, e3, e4, z, brightness)[index]
+    index = numpy.maximum(0, numpy.searchsorted(bins, clearness) - 1)
+    p1, p2, p3, p4 = numpy.moveaxis(coefs[:, :, index], 1, 0)
+    a, b, c, d, e = p1 + p2 * z + brightness * (p3 + p4 * z)
 
-    if clearness <= 1.065:
-        c = numpy.exp(numpy.power(brightness * (c1[0] + c2[0] * z), c3[0])) - \
-            c4[0]
-        d = -numpy.exp(brightness * (d1[0] + d2[0] * z)) + d3[0] + d4[
-                                                                       0] * brightness
+    # first clearness bin uses specific formula for c and d
+    first = clearness <= 1.065
+    with numpy.errstate(invalid='ignore', over='ignore'):
+        c = numpy.where(first, numpy.exp(numpy.power(brightness * (c1[0] + c2[0] * z), c3[0])) - c4[0], c)
+        d = numpy.where(first, -numpy.exp(brightness * (d1[0] + d2[0] * z)) + d3[0] + d4[0] * brightness, d)
 
-    return a, b, c, d, e
+    return tuple(x[()] for x in (a, b, c, d, e))
 
 
-def all_weather_relative_luminance(grid, sun_zenith, sun_azimuth, clearness, brightness):
+def all_weather_relative_luminance(grid, sun_zenith, sun_azimuth, clearness, brightness, ksi=None):
     """All weather relative luminance of a sky element relative to the luminance
     at zenith
 
@@ -174,23 +180,223 @@ def all_weather_relative_luminance(grid, sun_zenith, sun_azimuth, clearness, bri
         sun_azimuth: azimuth angle of the sun (deg)
         clearness: sky clearness as defined in Perez et al. (1993
         brightness: sky brightness as defined in Perez et al. (1993)
+        ksi: (optional) angular distance between grid cells and the sun (deg), such as returned by
+            astk.sky_map.ksi_grid. If None (default), it is computed from sun_zenith and sun_azimuth
+
+        sun_zenith, sun_azimuth, clearness and brightness can also be (T,) arrays, in which case a (T,) stack of
+        luminance grids is returned
 
         Details:
             R. Perez, R. Seals, J. Michalsky, "All-weather model for sky luminance distribution—Preliminary configuration and
             validation", Solar Energy, Volume 50, Issue 3, 1993, Pages 235-245,
 
     """
-    a, b, c, d, e = all_weather_abcde(sun_zenith, clearness, brightness)
+    grid = as_sky_grid(grid)
+    a, b, c, d, e = [_per_map(grid, x) for x in all_weather_abcde(sun_zenith, clearness, brightness)]
     _, sky_zenith, _ = grid
     gradation = cie_luminance_gradation(sky_zenith, a=a, b=b)
-    ksi_sun = sun_zenith
-    ksi = ksi_grid(grid, sun_zenith, sun_azimuth)
+    ksi_sun = _per_map(grid, sun_zenith)
+    if ksi is None:
+        ksi = ksi_grid(grid, sun_zenith, sun_azimuth)
     indicatrix = cie_scattering_indicatrix(ksi, ksi_sun=ksi_sun, c=c, d=d, e=e)
 
     return gradation * indicatrix
 
 
-def sky_luminance(grid, sky_type='soc', sky_irradiance=None, scale=None, sun_in_sky=False):
+def _zenith_bins(sun_zenith, zenith_step=None):
+    """Distinct values of sun zenith, optionally rounded to multiples of zenith_step, and bin index of sun_zenith"""
+    sun_zenith = numpy.asarray(sun_zenith, dtype=float)
+    if zenith_step is not None:
+        sun_zenith = numpy.round(sun_zenith / zenith_step) * zenith_step
+    return numpy.unique(sun_zenith, return_inverse=True)
+
+
+def clear_sky_luminances(grid, sun_zenith, sun_azimuth, rotate=False, zenith_step=None):
+    """(T,) stack of CIE clear sky luminance grids, scaled to unit horizontal irradiance
+
+    Args:
+        grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
+        sun_zenith : (T,) array of zenith angles of the sun (deg)
+        sun_azimuth: (T,) array of azimuth angles of the sun (deg)
+        rotate: if True, patterns are computed with sun at azimuth 0 and rotated (see sky_luminance)
+        zenith_step: the size of sun zenith bins used for rotated patterns (see sky_luminance)
+    """
+    if rotate:
+        zeniths, bins = _zenith_bins(sun_zenith, zenith_step)
+        patterns = scale_sky(grid,
+                             cie_relative_luminance(grid=grid,
+                                                    sun_zenith=zeniths,
+                                                    sun_azimuth=numpy.zeros_like(zeniths),
+                                                    type='clear_sky'))
+        return rotate_azimuth(grid, patterns, sun_azimuth, index=bins)
+    return scale_sky(grid,
+                     cie_relative_luminance(grid=grid,
+                                            sun_zenith=sun_zenith,
+                                            sun_azimuth=sun_azimuth,
+                                            type='clear_sky'))
+
+
+def all_weather_luminances(grid, sun_zenith, sun_azimuth, clearness, brightness, rotate=False, zenith_step=None):
+    """(T,) stack of all weather sky luminance grids, scaled to unit horizontal irradiance
+
+    Args:
+        grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
+        sun_zenith : (T,) array of zenith angles of the sun (deg)
+        sun_azimuth: (T,) array of azimuth angles of the sun (deg)
+        clearness: (T,) array of sky clearness as defined in Perez et al. (1993)
+        brightness: (T,) array of sky brightness as defined in Perez et al. (1993)
+        rotate: if True, sun angular distance maps are computed with sun at azimuth 0 and rotated (see sky_luminance)
+        zenith_step: the size of sun zenith bins used for rotated patterns (see sky_luminance)
+    """
+    ksi = None
+    if rotate:
+        zeniths, bins = _zenith_bins(sun_zenith, zenith_step)
+        ksi = rotate_azimuth(grid, ksi_grid(grid, zeniths, numpy.zeros_like(zeniths)), sun_azimuth, index=bins)
+    return scale_sky(grid,
+                     all_weather_relative_luminance(grid,
+                                                    sun_zenith=sun_zenith,
+                                                    sun_azimuth=sun_azimuth,
+                                                    brightness=brightness,
+                                                    clearness=clearness,
+                                                    ksi=ksi))
+
+
+class SkyPatternCache(object):
+    """A bounded LRU cache of clear sky and all weather luminance grids (scaled to unit horizontal irradiance)
+    indexed by quantized sun position, sky clearness and sky brightness.
+
+    Patterns are computed for the quantized values, so that timesteps falling in the same quantization cell share
+    the same luminance grid. Each cached grid uses about 260 kb of memory on the default 1 degree sky grid.
+
+    Args:
+        maxsize (int): the maximal number of luminance grids kept in memory
+        angle_tolerance (float): sun zenith and azimuth are rounded to multiples of angle_tolerance (deg)
+        clearness_tolerance (float): sky clearness is rounded to multiples of clearness_tolerance (all_weather only)
+        brightness_tolerance (float): sky brightness is rounded to multiples of brightness_tolerance (all_weather
+            only)
+    """
+
+    def __init__(self, maxsize=256, angle_tolerance=0.1, clearness_tolerance=0.01, brightness_tolerance=0.005):
+        self.maxsize = maxsize
+        self.angle_tolerance = angle_tolerance
+        self.clearness_tolerance = clearness_tolerance
+        self.brightness_tolerance = brightness_tolerance
+        self.hits = 0
+        self.misses = 0
+        self._patterns = OrderedDict()
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def info(self):
+        """Cache statistics"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self), 'maxsize': self.maxsize}
+
+    def clear(self):
+        """Empty the cache and reset statistics"""
+        self._patterns.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _quantize(self, sun_zenith, sun_azimuth, clearness=None, brightness=None):
+        n_az = int(round(360. / self.angle_tolerance))
+        q = [numpy.round(numpy.asarray(sun_zenith) / self.angle_tolerance),
+             numpy.round(numpy.asarray(sun_azimuth) / self.angle_tolerance) % n_az]
+        if clearness is not None:
+            q += [numpy.round(numpy.asarray(clearness) / self.clearness_tolerance),
+                  numpy.round(numpy.asarray(brightness) / self.brightness_tolerance)]
+        return numpy.stack(q, axis=-1).astype(int)
+
+    def luminances(self, grid, sun_zenith, sun_azimuth, clearness=None, brightness=None, rotate=False,
+                   zenith_step=None):
+        """(T,) stack of luminance grids for the T quantized sun positions (and sky conditions)
+
+        Args:
+            grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
+            sun_zenith : (T,) array of zenith angles of the sun (deg)
+            sun_azimuth: (T,) array of azimuth angles of the sun (deg)
+            clearness: (T,) array of sky clearness. If None (default), CIE clear sky grids are returned, otherwise
+                all weather sky grids are returned.
+            brightness: (T,) array of sky brightness (used with clearness)
+            rotate: passed to clear_sky_luminances or all_weather_luminances for computing missing grids
+            zenith_step: passed to clear_sky_luminances or all_weather_luminances for computing missing grids
+        """
+        grid = as_sky_grid(grid)
+        quantized = self._quantize(sun_zenith, sun_azimuth, clearness, brightness)
+        sky_type = 'clear_sky' if clearness is None else 'all_weather'
+        keys = [(grid.key, sky_type) + tuple(q) for q in quantized.tolist()]
+        missing = OrderedDict()
+        for key, q in zip(keys, quantized):
+            if key in self._patterns:
+                self._patterns.move_to_end(key)
+                self.hits += 1
+            elif key in missing:
+                self.hits += 1
+            else:
+                missing[key] = q
+                self.misses += 1
+        computed = {}
+        if len(missing) > 0:
+            q = numpy.array(list(missing.values()))
+            zenith = q[:, 0] * self.angle_tolerance
+            azimuth = q[:, 1] * self.angle_tolerance
+            if clearness is None:
+                lums = clear_sky_luminances(grid, zenith, azimuth, rotate=rotate, zenith_step=zenith_step)
+            else:
+                lums = all_weather_luminances(grid, zenith, azimuth,
+                                              clearness=q[:, 2] * self.clearness_tolerance,
+                                              brightness=q[:, 3] * self.brightness_tolerance,
+                                              rotate=rotate, zenith_step=zenith_step)
+            computed = dict(zip(missing, lums))
+        stack = numpy.stack([computed[k] if k in computed else self._patterns[k] for k in keys])
+        for key, lum in computed.items():
+            self._patterns[key] = lum
+        while len(self._patterns) > self.maxsize:
+            self._patterns.popitem(last=False)
+        return stack
+
+
+def _relative_luminances(grid, sky_type, sky_irradiance, soc=None, rotate=False, zenith_step=None, cache=None):
+    """(T,) stack of sky luminance grids, scaled to unit horizontal irradiance, for the T timesteps of sky_irradiance
+
+    Args:
+        grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
+        sky_type (str): one of ('clear_sky', 'sun_soc', 'blended', 'all_weather').
+        sky_irradiance: a datetime indexed dataframe specifying sky irradiances
+        soc: the scaled CIE soc luminance grid (needed for 'sun_soc' and 'blended' sky types)
+        rotate: if True, sun-dependant patterns are computed with sun at azimuth 0 and rotated (see sky_luminance)
+        zenith_step: the size of sun zenith bins used for rotated patterns (see sky_luminance)
+        cache: a SkyPatternCache used to retrieve sun-dependant patterns. If None, patterns are computed.
+    """
+    zenith = sky_irradiance.zenith.values
+    azimuth = sky_irradiance.azimuth.values
+    if sky_type == 'sun_soc':
+        return numpy.broadcast_to(soc, (len(zenith),) + soc.shape)
+    elif sky_type in ('clear_sky', 'blended'):
+        if cache is None:
+            cs = clear_sky_luminances(grid, zenith, azimuth, rotate=rotate, zenith_step=zenith_step)
+        else:
+            cs = cache.luminances(grid, zenith, azimuth, rotate=rotate, zenith_step=zenith_step)
+        if sky_type == 'clear_sky':
+            return cs
+        epsilon = all_weather_sky_clearness(sky_irradiance.dni.values, sky_irradiance.dhi.values, zenith)
+        f_clear = _per_map(grid, f_clear_sky(epsilon))
+        return f_clear * cs + (1 - f_clear) * soc
+    elif sky_type == 'all_weather':
+        brightness = numpy.asarray(all_weather_sky_brightness(sky_irradiance.index, sky_irradiance.dhi.values, zenith))
+        clearness = all_weather_sky_clearness(sky_irradiance.dni.values, sky_irradiance.dhi.values, zenith)
+        if cache is None:
+            return all_weather_luminances(grid, zenith, azimuth, clearness, brightness, rotate=rotate,
+                                          zenith_step=zenith_step)
+        else:
+            return cache.luminances(grid, zenith, azimuth, clearness, brightness, rotate=rotate,
+                                    zenith_step=zenith_step)
+    else:
+        raise ValueError('undefined sky type: ' + sky_type)
+
+
+def sky_luminance(grid, sky_type='soc', sky_irradiance=None, scale=None, sun_in_sky=False, chunk_size=24,
+                  rotate=False, zenith_step=None, cache=None):
     """Sun and sky luminance as a function of sky type and sky_irradiance
 
     Args:
@@ -206,6 +412,18 @@ def sky_luminance(grid, sky_type='soc', sky_irradiance=None, scale=None, sun_in_
             - 'par': sun+sky horizontal flux equals time-integrated PPFD (molPAR.m-2)
         sun_in_sky: Should the sun be added to the sky ? If True, sky luminance is set to sun luminance in the sun region,
             and sun luminance list is emptied. Ignored for sky types 'uoc' and 'soc'.
+        chunk_size (int): the number of timesteps of sky_irradiance whose luminance maps are computed together. Larger
+            chunks are faster but need more memory (about 2 Mb per timestep on the default 1 degree grid)
+        rotate (bool): if True, the sun-dependant part of 'clear_sky', 'blended' and 'all_weather' skies is computed
+            once per distinct sun zenith with the sun at azimuth 0, and rotated along azimuth to the actual sun
+            azimuth of each timestep (with linear interpolation between grid cells). Requires a grid with a regular
+            azimuth discretisation, such as returned by astk.sky_map.sky_grid. If False (default), luminance is
+            computed for every timestep
+        zenith_step (float): if not None and rotate is True, sun zenith angles are rounded to multiples of
+            zenith_step (deg) before computing rotated patterns, so that timesteps with close sun zenith share the
+            same pattern. If None (default), one pattern is computed per distinct sun zenith
+        cache: a SkyPatternCache used to memoize 'clear_sky', 'blended' and 'all_weather' luminance grids over
+            quantized sun positions and sky conditions. If None (default), no memoization is done
 
     Returns:
         sun, sky : a (sun_elevation, sun_azimuth, sun_luminance), sky_luminance tuple defining sun luminance
@@ -239,6 +457,7 @@ def sky_luminance(grid, sky_type='soc', sky_irradiance=None, scale=None, sun_in_
         if sky_irradiance is None:
             raise ValueError('sky_irradiance is required for this type of sky')
 
+    grid = as_sky_grid(grid)
     sun = []
     if sky_type in ('soc', 'uoc'):
         sky = scale_sky(grid, cie_relative_luminance(grid=grid, type=sky_type))
@@ -250,48 +469,28 @@ def sky_luminance(grid, sky_type='soc', sky_irradiance=None, scale=None, sun_in_
             hi_sum = sky_irradiance.ghi.sum()
         else:
             hi_sum = sky_irradiance.dhi.sum()
+        soc = None
         if sky_type in ('blended', 'sun_soc'):
             soc = scale_sky(grid, cie_relative_luminance(grid=grid, type='soc'))
-        for row in sky_irradiance.itertuples():
-            if sky_type in ('clear_sky', 'blended'):
-                cs = scale_sky(grid,
-                               cie_relative_luminance(grid=grid,
-                                                      sun_zenith=row.zenith,
-                                                      sun_azimuth=row.azimuth,
-                                                      type='clear_sky'))
-            if sky_type == 'clear_sky':
-                _lum = cs.copy()
-            elif sky_type == 'sun_soc':
-                _lum = soc.copy()
-            elif sky_type == 'blended':
-                epsilon = all_weather_sky_clearness(row.dni, row.dhi, row.zenith)
-                f_clear = f_clear_sky(epsilon)
-                _lum = f_clear * cs + (1 - f_clear) * soc
-            elif sky_type == 'all_weather':
-                brightness = all_weather_sky_brightness(row.Index, row.dhi, row.zenith)
-                clearness = all_weather_sky_clearness(row.dni, row.dhi, row.zenith)
-                _lum = scale_sky(grid,
-                                 all_weather_relative_luminance(grid,
-                                                                sun_zenith=row.zenith,
-                                                                sun_azimuth=row.azimuth,
-                                                                brightness=brightness,
-                                                                clearness=clearness))
-            else:
-                raise ValueError('undefined sky type: ' + sky_type)
-
-
-            if row.dni > 0:
-                sun.append((90 - row.zenith, row.azimuth, row.dni))
-
+        for start in range(0, len(sky_irradiance), chunk_size):
+            chunk = sky_irradiance.iloc[start:start + chunk_size]
+            _lum = _relative_luminances(grid, sky_type, chunk, soc, rotate=rotate, zenith_step=zenith_step,
+                                        cache=cache)
             if sun_in_sky:
-                ksi_sun = ksi_grid(grid, sun_zenith=row.zenith, sun_azimuth=row.azimuth)
-                sun_index = numpy.unravel_index(numpy.argmin(ksi_sun), ksi_sun.shape)
-                _lum = sky_ni(grid, scale_sky(grid, _lum, row.dhi))
-                _lum[sun_index] = max(row.dni, _lum[sun_index])
-                _lum = scale_sky(grid, sky_lum(grid, _lum), row.ghi / hi_sum)
+                ksi_sun = ksi_grid(grid, sun_zenith=chunk.zenith.values, sun_azimuth=chunk.azimuth.values)
+                sun_index = ksi_sun.reshape(len(chunk), -1).argmin(axis=1)
+                rows = numpy.arange(len(chunk))
+                _ni = sky_ni(grid, scale_sky(grid, _lum, chunk.dhi.values)).reshape(len(chunk), -1)
+                _ni[rows, sun_index] = numpy.maximum(chunk.dni.values, _ni[rows, sun_index])
+                _lum = scale_sky(grid, sky_lum(grid, _ni.reshape(_lum.shape)), chunk.ghi.values / hi_sum)
+                sky += _lum.sum(axis=0)
             else:
-                _lum *= row.dhi / hi_sum
-            sky += _lum
+                sky += numpy.tensordot(chunk.dhi.values / hi_sum, _lum, axes=1)
+
+        daylight = sky_irradiance.dni > 0
+        sun = list(zip(90 - sky_irradiance.zenith[daylight],
+                       sky_irradiance.azimuth[daylight],
+                       sky_irradiance.dni[daylight]))
 
     sky = scale_sky(grid, sky)
 
@@ -325,6 +524,3 @@ def sky_luminance(grid, sky_type='soc', sky_irradiance=None, scale=None, sun_in_
     sky *= sc
 
     return sun, sky
-
-
-
@@ -16,6 +16,12 @@
 """
 import numpy
 import warnings
+from collections import OrderedDict
+from functools import cached_property
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
 matplotlib_installed=True
 try:
     from matplotlib import pyplot as plt
@@ -24,6 +30,93 @@ except ImportError:
     warnings.warn('matplotlib not found: consider installation before calling plotting functions')
 
 
+class SkyGrid(tuple):
+    """A (az_c, z_c, sr_c) tuple of sky grid coordinates that computes once and caches the geometric quantities
+    derived from cell coordinates.
+
+    Args:
+        az_c: coordinate matrix of azimuth of grid cells center
+        z_c: coordinate matrix of zenith of grid cells center
+        sr_c: coordinate matrix of sky vault steradians covered by grid cells
+    """
+
+    def __new__(cls, az_c, z_c, sr_c):
+        return super().__new__(cls, (az_c, z_c, sr_c))
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    @property
+    def az_c(self):
+        return self[0]
+
+    @property
+    def z_c(self):
+        return self[1]
+
+    @property
+    def sr_c(self):
+        return self[2]
+
+    @cached_property
+    def cos_z(self):
+        """cosine of zenith angle of grid cells center"""
+        return numpy.cos(numpy.radians(self.z_c))
+
+    @cached_property
+    def sin_z(self):
+        """sine of zenith angle of grid cells center"""
+        return numpy.sin(numpy.radians(self.z_c))
+
+    @cached_property
+    def directions(self):
+        """cartesian coordinates of unit vectors pointing to grid cells center (X+ at azimuth 0, Z+ at zenith)"""
+        phi = numpy.radians(self.az_c)
+        return numpy.stack((self.sin_z * numpy.cos(phi), self.sin_z * numpy.sin(phi), self.cos_z), axis=-1)
+
+    @cached_property
+    def polar(self):
+        """coordinates of grid cells center in the polar (zenith, azimuth) projection of the sky, north along Y+"""
+        theta = numpy.pi / 2 - numpy.radians(self.az_c)
+        return numpy.stack((self.z_c * numpy.cos(theta), self.z_c * numpy.sin(theta)), axis=-1)
+
+    @cached_property
+    def hi_weights(self):
+        """horizontal irradiance produced by a unit luminance in grid cells"""
+        return self.sr_c * self.cos_z
+
+    @cached_property
+    def boundaries(self):
+        """azimuth and zenith boundaries of grid cells"""
+        return cell_boundaries(self)
+
+    @cached_property
+    def key(self):
+        """a hashable identifier of grid cells coordinates and solid angles"""
+        return (numpy.shape(self.z_c), hash(numpy.asarray(self.az_c, dtype=float).tobytes()),
+                hash(numpy.asarray(self.z_c, dtype=float).tobytes()),
+                hash(numpy.asarray(self.sr_c, dtype=float).tobytes()))
+
+    @cached_property
+    def azimuth_step(self):
+        """azimuthal width of grid cells if grid rows regularly sample azimuth from North, else None"""
+        az, z = self.az_c, self.z_c
+        if numpy.ndim(az) != 2:
+            return None
+        step = 360. / az.shape[1]
+        regular = (numpy.allclose(az, (numpy.arange(az.shape[1]) + 0.5) * step)
+                   and numpy.allclose(z, z[:, :1])
+                   and numpy.allclose(self.sr_c, self.sr_c[:, :1]))
+        return step if regular else None
+
+
+def as_sky_grid(grid):
+    """Return grid as a SkyGrid, wrapping (az_c, z_c, sr_c) plain tuples"""
+    if isinstance(grid, SkyGrid):
+        return grid
+    return SkyGrid(*grid)
+
+
 def sky_grid(d_az=1, d_z=1, n_az=None, n_z=None):
     """Sky grid creation
 
@@ -34,6 +127,7 @@ def sky_grid(d_az=1, d_z=1, n_az=None, n_z=None):
         n_z: number of cells in zenital directions
 
     Returns:
+        a SkyGrid, ie a (az_c, z_c, sr_c) tuple with:
         az_c: coordinate matrix of azimuth of grid cells center
         z_c: coordinate matrix of zenith of grid cells center
         sr_c: coordinate matrix of sky vault steradians covered by grid cells
@@ -61,7 +155,7 @@ def sky_grid(d_az=1, d_z=1, n_az=None, n_z=None):
     # steradians of sky vault covered by grid cells
     sr_c = numpy.radians(d_az) * (numpy.cos(numpy.radians(z_c - d_z / 2)) - numpy.cos(numpy.radians(z_c + d_z / 2)))
 
-    return az_c, z_c, sr_c
+    return SkyGrid(az_c, z_c, sr_c)
 
 
 def cell_boundaries(grid):
@@ -80,8 +174,7 @@ def sky_hi(grid, luminance):
         grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
         luminance : sky luminance gridded array describing distribution of luminance over the sky hemisphere
     """
-    az, z, sr = grid
-    return luminance * sr * numpy.cos(numpy.radians(z))
+    return luminance * as_sky_grid(grid).hi_weights
 
 
 def sky_ni(grid, luminance):
@@ -99,23 +192,170 @@ def sky_lum(grid, ni):
     return ni / sr
 
 
+def _cells_sum(grid, values):
+    """Sum values over the cells of a grid, keeping leading (eg time) dimensions"""
+    _, _, sr = grid
+    axis = tuple(range(-numpy.ndim(sr), 0))
+    return numpy.sum(values, axis=axis, keepdims=True)
+
+
+def _per_map(grid, x):
+    """Reshape a scalar or a (T,) array to broadcast against a (T,) stack of grid maps"""
+    _, _, sr = grid
+    x = numpy.asarray(x)
+    return x.reshape(x.shape + (1,) * numpy.ndim(sr))
+
+
 def scale_sky(grid, luminance, irradiance=1):
     """Rescale sky luminance to force producing a given sky irradiance
 
     Args:
         grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
-        luminance: unscaled relative luminance of cells covering sky vault
-        irradiance: global horizontal sky irradiance
+        luminance: unscaled relative luminance of cells covering sky vault. A (T,) stack of luminance maps
+            can also be passed, in which case each map is rescaled independently
+        irradiance: global horizontal sky irradiance (a scalar or a (T,) array matching the stack of maps)
     """
-    az, z, sr = grid
+    grid = as_sky_grid(grid)
     hi = sky_hi(grid, luminance)
-    scaled_hi = hi / hi.sum() * irradiance
-    return scaled_hi / sr / numpy.cos(numpy.radians(z))
+    scaled_hi = hi / _cells_sum(grid, hi) * _per_map(grid, irradiance)
+    return scaled_hi / grid.hi_weights
+
 
+def closest_point(point_grid, point_list, max_size=2**22):
+    """Index of the closest point of point_list for all points of point_grid
+
+    Args:
+        point_grid: a (..., k) array of points coordinates
+        point_list: a (n, k) array-like of points coordinates
+        max_size: the maximal number of point-to-point distances computed at once if scipy is not installed. If
+            scipy is installed, a kd-tree of point_list is used instead
+
+    Returns:
+        an integer array with the shape of point_grid without its last dimension
+    """
+    point_grid = numpy.asarray(point_grid, dtype=float)
+    point_list = numpy.asarray(point_list, dtype=float)
+    k = point_grid.shape[-1]
+    points = point_grid.reshape(-1, k)
+    if cKDTree is not None:
+        _, closest = cKDTree(point_list).query(points)
+    else:
+        closest = numpy.empty(len(points), dtype=int)
+        chunk = max(1, max_size // len(point_list))
+        for start in range(0, len(points), chunk):
+            p = points[start:start + chunk]
+            dists = numpy.sum((p[:, numpy.newaxis, :] - point_list) ** 2, axis=2)
+            closest[start:start + chunk] = numpy.argmin(dists, axis=1)
+    return closest.reshape(point_grid.shape[:-1])
 
-def closest_point(point_grid, point_list):
-    dists = [numpy.sum((point_grid - p)**2, axis=2) for p in point_list]
-    return numpy.argmin(numpy.stack(dists, axis=2), axis=2)
+
+class SkyAggregator(object):
+    """Aggregation operator of sky grid luminance maps along a set of directions
+
+    The assignment of grid cells to their closest direction is computed once, so that the operator can be
+    reused for aggregating and back-projecting any number of luminance maps, or stacks of maps, on the same grid.
+
+    Args:
+        grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
+        new_directions : a [(elevation, azimuth),..] list of tuples defining directions of the aggregated sky
+        metric: the distance used to find the closest direction of grid cells. One of 'polar' (default), for
+            euclidean distance in the polar (zenith, azimuth) projection of the sky, or 'spherical', for angular
+            distance between directions
+    """
+
+    def __init__(self, grid, new_directions, metric='polar'):
+        self.grid = as_sky_grid(grid)
+        self.directions = list(new_directions)
+        self.metric = metric
+
+        def _polar(az, z):
+            # az is from north, positive clockwise.
+            # Theta is from x+ positive counter-clockwise
+            # north is along Y+
+            theta = numpy.pi / 2 - numpy.radians(az)
+            return z * numpy.cos(theta), z * numpy.sin(theta)
+
+        def _cartesian(az, z):
+            theta = numpy.radians(z)
+            phi = numpy.radians(az)
+            return numpy.sin(theta) * numpy.cos(phi), numpy.sin(theta) * numpy.sin(phi), numpy.cos(theta)
+
+        if metric == 'polar':
+            grid_points = self.grid.polar
+            target_points = numpy.array([_polar(a, 90 - el) for el, a in self.directions])
+        elif metric == 'spherical':
+            grid_points = self.grid.directions
+            target_points = numpy.array([_cartesian(a, 90 - el) for el, a in self.directions])
+        else:
+            raise ValueError('unknown metric: ' + metric)
+        # index of closest direction of flattened grid cells
+        self.targets = closest_point(grid_points, target_points).ravel()
+        n = len(self.directions)
+        sr_agg = numpy.bincount(self.targets, weights=numpy.ravel(self.grid.sr_c), minlength=n)
+        el_agg, az_agg = list(map(numpy.array, zip(*self.directions)))
+        self.grid_agg = SkyGrid(az_agg, 90 - el_agg, sr_agg)
+
+    def aggregate(self, luminance, force_hi=False):
+        """Aggregate luminance along the directions of the operator
+
+        Args:
+            luminance : sky luminance gridded array, or (T,) stack of gridded arrays
+            force_hi: if True, aggregated luminance are rescaled to force conservation of global horizontal
+                irradiance of each map. If False (default), no rescaled is applied
+
+        Returns:
+            luminance aggregated along directions, with shape (n_directions,) or (T, n_directions)
+        """
+        luminance = numpy.asarray(luminance)
+        n = len(self.directions)
+        n_cells = self.targets.size
+        stack_shape = luminance.shape[:luminance.ndim - numpy.ndim(self.grid.sr_c)]
+        light_flux = sky_ni(self.grid, luminance).reshape(-1, n_cells)
+        # flux of all maps are binned together by offsetting directions index of the i-th map by i * n
+        bins = (numpy.arange(len(light_flux))[:, numpy.newaxis] * n + self.targets).ravel()
+        light_flux_agg = numpy.bincount(bins, weights=light_flux.ravel(), minlength=len(light_flux) * n)
+        luminance_agg = light_flux_agg.reshape(stack_shape + (n,)) / self.grid_agg.sr_c
+        if force_hi:
+            hi = _cells_sum(self.grid, sky_hi(self.grid, luminance)).reshape(stack_shape)
+            luminance_agg = scale_sky(self.grid_agg, luminance_agg, hi)
+        return luminance_agg
+
+    def project(self, luminance_agg):
+        """Project luminance aggregated along directions back on the grid
+
+        Args:
+            luminance_agg: a (n_directions,) or (T, n_directions) array of aggregated luminance
+
+        Returns:
+            the sky luminance gridded array, or (T,) stack of gridded arrays
+        """
+        luminance_agg = numpy.asarray(luminance_agg)
+        new_luminance = luminance_agg[..., self.targets]
+        return new_luminance.reshape(luminance_agg.shape[:-1] + numpy.shape(self.grid.sr_c))
+
+
+_aggregators = OrderedDict()
+
+
+def sky_aggregator(grid, new_directions, metric='polar', maxsize=32):
+    """A SkyAggregator for grid and new_directions, retrieved from a LRU cache of the last built aggregators
+
+    Args:
+        grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
+        new_directions : a [(elevation, azimuth),..] list of tuples defining directions of the aggregated sky
+        metric: the distance used to find the closest direction of grid cells (see SkyAggregator)
+        maxsize: the maximal number of aggregators kept in cache
+    """
+    grid = as_sky_grid(grid)
+    directions = tuple(map(tuple, numpy.asarray(new_directions, dtype=float).tolist()))
+    key = (grid.key, directions, metric)
+    if key in _aggregators:
+        _aggregators.move_to_end(key)
+    else:
+        _aggregators[key] = SkyAggregator(grid, new_directions, metric=metric)
+        while len(_aggregators) > maxsize:
+            _aggregators.popitem(last=False)
+    return _aggregators[key]
 
 
 def sky_map(grid, luminance, new_directions, force_hi=False):
@@ -123,8 +363,10 @@ def sky_map(grid, luminance, new_directions, force_hi=False):
 
     Args:
         grid: a (az_c, z_c, sr_c) tuple of sky coordinates, such as returned by astk.sky_map.sky_grid
-        luminance : sky luminance gridded array describing distribution of luminance over the sky hemisphere
-        new_directions : a [(elevation, azimuth),..] list of tuples defining directions of the aggregated sky
+        luminance : sky luminance gridded array describing distribution of luminance over the sky hemisphere, or
+            a (T,) stack of such arrays
+        new_directions : a [(elevation, azimuth),..] list of tuples defining directions of the aggregated sky, or a
+            SkyAggregator already built for grid
         force_hi: if True, aggregated luminance are rescaled to force conservation of global horizontal irradiance.
             If False (default), no rescaled is applied
 
@@ -133,40 +375,62 @@ def sky_map(grid, luminance, new_directions, force_hi=False):
         grid_agg: a (azimuth, zenith, sr) tuple describing the aggregated directions and the associated steradians
         luminance_agg_sky: sky aggregated luminance projected on the original sky grid
     """
-    az, z, sr = grid
+    if isinstance(new_directions, SkyAggregator):
+        aggregator = new_directions
+    else:
+        aggregator = sky_aggregator(grid, new_directions)
+    luminance_agg = aggregator.aggregate(luminance, force_hi=force_hi)
+    new_luminance = aggregator.project(luminance_agg)
 
-    def _polar(az, z):
-        # az is from north, positive clockwise.
-        # Theta is from x+ positive counter-clockwise
-        # north is along Y+
-        theta = numpy.pi / 2 - numpy.radians(az)
-        return z * numpy.cos(theta), z * numpy.sin(theta)
+    return luminance_agg, aggregator.grid_agg, new_luminance
 
-    grid_points = numpy.stack(_polar(az, z), axis=2)
-    target_points = numpy.array([_polar(a, 90 - el) for el, a in new_directions])
-    targets = closest_point(grid_points, target_points)
-    light_flux = luminance * sr
-    light_flux_agg = numpy.bincount(targets.flatten(), weights=light_flux.flatten())
-    sr_agg = numpy.bincount(targets.flatten(), weights=sr.flatten())
-    luminance_agg = light_flux_agg / sr_agg
-    new_luminance = numpy.zeros_like(luminance)
-    for i, w in enumerate(luminance_agg):
-        new_luminance[targets == i] = w
 
-    el_agg, az_agg = list(map(numpy.array, zip(*new_directions)))
-    grid_agg = (az_agg, 90 - el_agg, sr_agg)
+def rotate_azimuth(grid, maps, azimuth, index=None):
+    """Rotate grid maps along azimuth
 
-    if force_hi:
-        hi = sky_hi(grid, luminance)
-        luminance_agg = scale_sky(grid_agg, luminance_agg, hi.sum())
-        for i, w in enumerate(luminance_agg):
-            new_luminance[targets == i] = w
+    Args:
+        grid: a (az_c, z_c, sr_c) tuple of sky coordinates with regular azimuth discretisation, such as returned by
+            astk.sky_map.sky_grid
+        maps: a grid map or a (N,) stack of grid maps to be rotated
+        azimuth: the azimuth angle (deg, positive clockwise) of the rotation, or a (T,) array of angles
+        index: (optional) a (T,) array giving, for each azimuth, the index of the map to be rotated in the stack.
+            If None (default), maps and azimuth are paired
 
-    return luminance_agg, grid_agg, new_luminance
+    Returns:
+        the rotated maps. Rotations that are not multiple of the grid azimuthal step are linearly interpolated
+        between the two closest cell shifts
+    """
+    grid = as_sky_grid(grid)
+    step = grid.azimuth_step
+    if step is None:
+        raise ValueError('azimuthal rotation needs a grid with a regular azimuth discretisation')
+    maps = numpy.asarray(maps)
+    single = maps.ndim == 2
+    azimuth = numpy.asarray(azimuth, dtype=float)
+    if single:
+        maps = maps[numpy.newaxis]
+    if index is None:
+        index = numpy.arange(len(maps))
+    index = numpy.broadcast_to(index, azimuth.reshape(-1).shape)
+    n_z, n_az = maps.shape[-2:]
+    # a map rotated by k cells is a window starting at -k on the map repeated twice along azimuth
+    windows = numpy.lib.stride_tricks.sliding_window_view(numpy.concatenate((maps, maps), axis=-1), n_az, axis=-1)
+    shift = azimuth.reshape(-1) / step
+    k = numpy.floor(shift)
+    start = (-k).astype(int) % n_az
+    rows = numpy.arange(n_z)
+    left = windows[index[:, numpy.newaxis], rows, start[:, numpy.newaxis]]
+    right = windows[index[:, numpy.newaxis], rows, ((start - 1) % n_az)[:, numpy.newaxis]]
+    f = (shift - k)[:, numpy.newaxis, numpy.newaxis]
+    rotated = (1 - f) * left + f * right
+    return rotated.reshape(azimuth.shape + (n_z, n_az))
 
 
 def ksi_grid(grid, sun_zenith=0, sun_azimuth=0):
-    """acute angle between vector pointing to sky cells and sun vector"""
+    """acute angle between vector pointing to sky cells and sun vector
+
+    If sun_zenith and sun_azimuth are (T,) arrays, a (T,) stack of grids is returned
+    """
     def _cartesian(zenith, azimuth):
         theta = numpy.radians(zenith)
         phi = numpy.radians(azimuth)
@@ -175,14 +439,15 @@ def ksi_grid(grid, sun_zenith=0, sun_azimuth=0):
                 numpy.cos(theta))
 
     def _acute(v1, v2):
-        """acute angle between 2 3d vectors"""
-        x = numpy.dot(v1, v2) / (numpy.linalg.norm(v1, axis=2) * numpy.linalg.norm(v2))
+        """acute angle between unit 3d vectors of v1 and 3d vectors of v2"""
+        x = numpy.tensordot(v2, v1, axes=(-1, -1))
+        x /= _per_map(grid, numpy.linalg.norm(v2, axis=-1))
         angle = numpy.arccos(numpy.clip(x, -1, 1))
         return numpy.degrees(angle)
 
-    sky_azimuth, sky_zenith, _ = grid
-    v_sky = numpy.stack(_cartesian(sky_zenith, sky_azimuth), axis=2)
-    v_sun = _cartesian(sun_zenith, sun_azimuth)
+    grid = as_sky_grid(grid)
+    v_sky = grid.directions
+    v_sun = numpy.stack(_cartesian(sun_zenith, sun_azimuth), axis=-1)
 
     return _acute(v_sky, v_sun)
 
@@ -212,7 +477,7 @@ def show_sky(grid, sky, cmap='jet', shading='flat'):
     """
     if not matplotlib_installed:
         warnings.warn('matplotlib not found: consider installation before calling plotting functions')
-    az, z = cell_boundaries(grid)
+    az, z = as_sky_grid(grid).boundaries
     theta = numpy.pi/2 - numpy.radians(az)
     r = z
     fig, ax = plt.subplots(subplot_kw={'projection': 'polar'})
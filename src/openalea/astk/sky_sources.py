@@ -14,11 +14,12 @@
 """ A collection of equation for modelling sun position, sun irradiance and sky
 irradiance
 """
+import time
 import numpy
 
-from .icosphere import turtle_mesh, spherical_face_centers
+from .icosphere import turtle_sectors
 from openalea.astk.sky_luminance import sky_luminance
-from .sky_map import sky_grid, sky_map, sky_hi
+from .sky_map import sky_grid, sky_aggregator, sky_hi
 
 
 def regular_sky(d_az=10, d_z=10, n_az=None, n_z=None):
@@ -40,8 +41,8 @@ def hierarchical_turtle(sectors=46):
 
 
 def icospherical_turtle(sectors=46):
-    sky_mesh = turtle_mesh(sectors)
-    return spherical_face_centers(sky_mesh)
+    _, _, directions, _ = turtle_sectors(sectors)
+    return [*zip(directions[:, 0], directions[:, 1])]
 
 
 def sky_turtle(sectors=46):
@@ -51,6 +52,99 @@ def sky_turtle(sectors=46):
         return icospherical_turtle(sectors)
 
 
+def _normalise_angle(angle, north):
+    """normalise an angle to the [0, 360] range"""
+    angle = numpy.array(angle, dtype=float)
+    angle = north - angle
+    modulo = 360
+    angle %= modulo
+    # force to [0, modulo] range
+    angle = (angle + modulo) % modulo
+    return angle
+
+
+class SkySourcesEngine(object):
+    """Light sources generator keeping the static state needed by repeated sky_sources calls
+
+    The sky grid, sky directions, grid to directions aggregation operator and normalised azimuths of sky
+    sources are computed once at instantiation. Cumulated computation time (s) of each stage is recorded in the
+    timings attribute.
+
+    Args:
+        sky_dirs (list): a [(elevation,azimuth),...] list of directions sampling the sky hemisphere. If None (default)
+            a hierarchical turtle discretisation of 46 directions is used. Azimuths are relative to North, positive
+            clockwise
+        north: the angle between X+ and North (deg, positive counter-clockwise)
+        force_hi: if True (default), sky sources are rescaled to ensure that global horizontal irradiance of
+            discretised sources is the same as the original sky luminance distribution. If False , no rescaling
+            append, ensuring that global direct irradiance of sky is preserved
+        d_az: delta azimuth of sky grid cells
+        d_z: delta zenith of sky grid cells
+        cache: (optional) a astk.sky_luminance.SkyPatternCache used to memoize sky luminance patterns
+    """
+
+    def __init__(self, sky_dirs=None, north=90, force_hi=True, d_az=1, d_z=1, cache=None):
+        self.timings = {}
+        self.calls = 0
+        self.north = north
+        self.force_hi = force_hi
+        self.cache = cache
+        t = time.perf_counter()
+        self.grid = sky_grid(d_az=d_az, d_z=d_z)
+        t = self._record('grid', t)
+        if sky_dirs is None:
+            sky_dirs = sky_turtle()
+        self.sky_dirs = sky_dirs
+        t = self._record('directions', t)
+        self.aggregator = sky_aggregator(self.grid, sky_dirs)
+        t = self._record('aggregator', t)
+        self.sky_elevation, sky_azimuth = zip(*sky_dirs)
+        self.sky_azimuth = _normalise_angle(sky_azimuth, north)
+        self._record('azimuth', t)
+
+    def _record(self, stage, start):
+        """add time elapsed since start to stage timing and return current time"""
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0) + now - start
+        return now
+
+    def sources(self, sky_type='soc', sky_irradiance=None, scale=None, sun_in_sky=False, **kwds):
+        """ Light sources representing the sun and the sky for a period
+
+        Args:
+            sky_type (str): sky type, one of ('soc', 'uoc', 'clear_sky', 'sun_soc', 'blended', 'all_weather').
+            sky_irradiance: a datetime indexed dataframe specifying sky irradiances for the period, such as returned by
+                astk.meteorology.sky_irradiance.sky_irradiance. Needed for all sky_types except 'uoc' and 'soc'
+            scale (str): How should sun/sky luminance be scaled ? (see sky_sources)
+            sun_in_sky: Should the sun be added to the sky ? (see sky_sources)
+            kwds: other named arguments passed to astk.sky_luminance.sky_luminance (chunk_size, rotate,
+                zenith_step)
+
+        Returns:
+            sun, sky tuple (see sky_sources)
+        """
+        self.calls += 1
+        t = time.perf_counter()
+        sun, sky = sky_luminance(self.grid, sky_type=sky_type, sky_irradiance=sky_irradiance, scale=scale,
+                                 sun_in_sky=sun_in_sky, cache=self.cache, **kwds)
+        t = self._record('luminance', t)
+        sky_agg = self.aggregator.aggregate(sky, force_hi=self.force_hi)
+        sky_irr = sky_hi(self.aggregator.grid_agg, sky_agg)
+        t = self._record('aggregation', t)
+        sky_sources = list(zip(self.sky_elevation, self.sky_azimuth, sky_irr))
+
+        if len(sun) > 0:
+            sun_elevation, sun_azimuth, _ = zip(*sun)
+            sun_irr = source_hi(sun)
+            sun_azimuth = _normalise_angle(sun_azimuth, self.north)
+            sun_sources = list(zip(sun_elevation, sun_azimuth, sun_irr))
+        else:
+            sun_sources = sun
+        self._record('sources', t)
+
+        return sun_sources, sky_sources
+
+
 def sky_sources(sky_type='soc', sky_irradiance=None, sky_dirs=None, scale=None, north=90, sun_in_sky=False, force_hi=True):
     """ Light sources representing the sun and the sky in a scene
 
@@ -101,36 +195,8 @@ def sky_sources(sky_type='soc', sky_irradiance=None, sky_dirs=None, scale=None,
         [4] R. Perez, R. Seals, J. Michalsky, "All-weather model for sky luminance distribution—Preliminary configuration and
             validation", Solar Energy, Volume 50, Issue 3, 1993, Pages 235-245
   """
-    def _normalise_angle(angle, north):
-        """normalise an angle to the [0, 360] range"""
-        angle = numpy.array(angle, dtype=float)
-        angle = north - angle
-        modulo = 360
-        angle %= modulo
-        # force to [0, modulo] range
-        angle = (angle + modulo) % modulo
-        return angle
-
-    grid = sky_grid()
-    sun, sky = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irradiance, scale=scale, sun_in_sky=sun_in_sky)
-    if sky_dirs is None:
-        sky_dirs = sky_turtle()
-
-    sky_agg, grid_agg, _ = sky_map(grid, sky, sky_dirs, force_hi=force_hi)
-    sky_irr = sky_hi(grid_agg, sky_agg)
-    sky_elevation, sky_azimuth = zip(*sky_dirs)
-    sky_azimuth = _normalise_angle(sky_azimuth, north)
-    sky_sources = list(zip(sky_elevation, sky_azimuth, sky_irr))
-
-    if len(sun) > 0:
-        sun_elevation, sun_azimuth, _ = zip(*sun)
-        sun_irr = source_hi(sun)
-        sun_azimuth = _normalise_angle(sun_azimuth, north)
-        sun_sources = list(zip(sun_elevation, sun_azimuth, sun_irr))
-    else:
-        sun_sources = sun
-
-    return sun_sources, sky_sources
+    engine = SkySourcesEngine(sky_dirs=sky_dirs, north=north, force_hi=force_hi)
+    return engine.sources(sky_type=sky_type, sky_irradiance=sky_irradiance, scale=scale, sun_in_sky=sun_in_sky)
 
 
 def source_hi(src_ni):
@@ -0,0 +1,325 @@
+# -*- python -*-
+#
+#       Copyright 2016-2025 Inria - CIRAD - INRAe
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+#       WebSite : https://github.com/openalea/astk
+#
+# ==============================================================================
+
+""" Solar geometry shared by irradiance computations
+
+Sun position, extraterrestrial radiation and air mass only depend on site
+location and dates. SolarGeometry evaluates them lazily, at most once, for the
+dates of a request, so that they can be shared along the irradiance pipeline
+(see astk.sky_irradiance). SolarGeometryStore computes them once per site and
+year on a regular UTC time grid, writes them to .npy files and reads them back
+as memory-mapped arrays, so that irradiance functions can slice them instead
+of recomputing sun positions.
+"""
+
+import os
+from functools import cached_property
+import numpy
+import pandas
+from pandas.tseries.frequencies import to_offset
+
+from openalea.astk.cache import cache_dir, save_atomic
+
+try:
+    from openalea.astk.sun_position import (
+        sun_position,
+        sun_extraradiation,
+        get_backend
+    )
+except ImportError:
+    from openalea.astk.sun_position_astk import (
+        sun_position,
+        sun_extraradiation,
+    )
+    get_backend = None
+
+# default location and dates
+_daydate = '2000-06-21'
+_timezone = 'Europe/Paris'
+_longitude = 3.52
+_latitude = 43.36
+_altitude = 56
+
+_store_format = 1
+
+
+def solar_geometry_dir():
+    """ Default directory of solar geometry tables: the solar_geometry
+    sub-directory of the astk cache (see cache.cache_dir)"""
+    return os.path.join(cache_dir(), 'solar_geometry')
+
+
+class SolarGeometryStore(object):
+    """ Memory-mapped per-site, per-year tables of solar geometry
+
+    A table holds, for every step of a regular UTC time grid covering one
+    (UTC) year, the sun elevation, azimuth and zenith (deg), the
+    extraterrestrial radiation (W.m-2) and the pressure-corrected air mass.
+    Tables are keyed by site location, timezone (extraterrestrial radiation
+    depends on the local day of year), time step and sun position backend.
+    They are computed on first use, saved atomically to disk and memory-mapped.
+
+    Args:
+        directory (str): the directory where tables are stored. If None
+            (default), solar_geometry_dir() is used
+        freq (str): the time step of tables, as a fixed pandas frequency
+            (default 'h')
+        backend (str): the sun position backend (see
+            sun_position.set_backend). If None (default), the default backend
+            at store creation is used
+    """
+
+    fields = ('elevation', 'azimuth', 'zenith', 'dni_extra', 'air_mass')
+
+    def __init__(self, directory=None, freq='h', backend=None):
+        if directory is None:
+            directory = solar_geometry_dir()
+        if backend is None and get_backend is not None:
+            backend = get_backend()
+        self.directory = directory
+        self.freq = freq
+        self.step = to_offset(freq).nanos
+        self.backend = backend
+        self._tables = {}
+
+    def key(self, year, latitude=_latitude, longitude=_longitude,
+            altitude=_altitude, timezone=_timezone):
+        """ File name of a table"""
+        site = '{0:.5f}_{1:.5f}_{2:.1f}_{3}'.format(
+            latitude, longitude, altitude, str(timezone).replace('/', '-'))
+        return 'v{0}_{1}_{2}_{3}_{4}.npy'.format(
+            _store_format, site, self.freq, self.backend, int(year))
+
+    def _grid(self, year):
+        start = pandas.Timestamp('{0}-01-01'.format(int(year)), tz='UTC')
+        end = pandas.Timestamp('{0}-01-01'.format(int(year) + 1), tz='UTC')
+        return pandas.date_range(start, end, freq=self.freq,
+                                 inclusive='left')
+
+    def compute(self, year, latitude=_latitude, longitude=_longitude,
+                altitude=_altitude, timezone=_timezone):
+        """ (N, 5) array of solar geometry fields for one year"""
+        # lazy import: sky_irradiance uses the store
+        from openalea.astk.sky_irradiance import air_mass
+        times = self._grid(year).tz_convert(timezone)
+        location = dict(latitude=latitude, longitude=longitude,
+                        altitude=altitude, timezone=timezone)
+        if get_backend is None:
+            df = sun_position(dates=times, filter_night=False, **location)
+        else:
+            df = sun_position(dates=times, filter_night=False,
+                              backend=self.backend, **location)
+        dni_extra = sun_extraradiation(times)
+        am = air_mass(df['zenith'], altitude)
+        return numpy.column_stack(
+            [df['elevation'], df['azimuth'], df['zenith'], dni_extra,
+             am]).astype(float)
+
+    def table(self, year, latitude=_latitude, longitude=_longitude,
+              altitude=_altitude, timezone=_timezone):
+        """ Memory-mapped (N, 5) table of solar geometry fields for one year,
+        computed and stored if needed"""
+        name = self.key(year, latitude, longitude, altitude, timezone)
+        if name not in self._tables:
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path):
+                values = self.compute(year, latitude, longitude, altitude,
+                                      timezone)
+                save_atomic(path, lambda f: numpy.save(f, values))
+            self._tables[name] = numpy.load(path, mmap_mode='r')
+        return self._tables[name]
+
+    def geometry(self, dates, latitude=_latitude, longitude=_longitude,
+                 altitude=_altitude, timezone=_timezone):
+        """ Solar geometry at dates, read from tables
+
+        Args:
+            dates: a pandas.DatetimeIndex. Naive dates are localised with
+                timezone
+            latitude: float
+            longitude: float
+            altitude: (float) altitude in m
+            timezone: (str) the timezone of the site
+
+        Returns:
+            a pandas dataframe with elevation, azimuth, zenith, dni_extra and
+            air_mass columns indexed by localised dates, or None if some dates
+            do not fall on the time grid of the store, or are localised in
+            another timezone than the site one.
+        """
+        if isinstance(dates, pandas.Timestamp):
+            dates = pandas.DatetimeIndex([dates])
+        if dates.tz is None:
+            dates = dates.tz_localize(timezone)
+        elif str(dates.tz) != str(timezone):
+            return None
+        values = numpy.empty((len(dates), len(self.fields)))
+        utc = dates.tz_convert('UTC').tz_localize(None)
+        ns = utc.values.astype('datetime64[ns]').astype(numpy.int64)
+        years = utc.year
+        for year in numpy.unique(years):
+            sel = years == year
+            start = numpy.datetime64('{0:04d}-01-01'.format(year), 'ns')
+            start = start.astype(numpy.int64)
+            index, offset = numpy.divmod(ns[sel] - start, self.step)
+            if numpy.any(offset != 0):
+                return None
+            table = self.table(year, latitude, longitude, altitude, timezone)
+            values[sel] = table[index]
+        return pandas.DataFrame(values, index=dates, columns=self.fields)
+
+    def sun_position(self, dates=None, daydate=_daydate,
+                     latitude=_latitude, longitude=_longitude,
+                     altitude=_altitude, timezone=_timezone,
+                     filter_night=True):
+        """ Sun position and related quantities, read from tables if
+        possible (see sun_position.sun_position for arguments)
+
+        Returns:
+            a pandas dataframe with elevation, azimuth, zenith, dni_extra and
+            air_mass columns indexed by localised dates. Dates not on the time
+            grid of the store are computed directly.
+        """
+        if dates is None:
+            dates = pandas.date_range(daydate, periods=24, freq='h',
+                                      tz=timezone)
+        df = self.geometry(dates, latitude, longitude, altitude, timezone)
+        if df is None:
+            from openalea.astk.sky_irradiance import air_mass
+            location = dict(latitude=latitude, longitude=longitude,
+                            altitude=altitude, timezone=timezone)
+            if get_backend is None:
+                df = sun_position(dates=dates, filter_night=False, **location)
+            else:
+                df = sun_position(dates=dates, filter_night=False,
+                                  backend=self.backend, **location)
+            df = df.loc[:, ['elevation', 'azimuth', 'zenith']]
+            df['dni_extra'] = sun_extraradiation(df.index)
+            df['air_mass'] = air_mass(df['zenith'], altitude)
+        if filter_night:
+            df = df.loc[df['elevation'] > 0, :]
+        return df
+
+
+class SolarGeometry(object):
+    """ Sun geometry at a site for the dates of a request
+
+    Sun positions are computed (or read from a SolarGeometryStore) once at
+    creation. Derived quantities are evaluated lazily, at most once, and
+    aligned with sun positions.
+
+    Args:
+        dates: a pandas.DatetimeIndex specifying the dates of the request. If
+            None, daydate is used and one position per hour is generated
+        daydate: (str) yyyy-mm-dd (not used if dates is not None).
+        latitude: float
+        longitude: float
+        altitude: (float) altitude in m
+        timezone: (str) the timezone associated to dates if they are not
+            already localised
+        filter_night (bool) : Should positions of sun during night be
+            filtered ?
+        store: a SolarGeometryStore from which geometry is read. If None
+            (default), geometry is computed
+        sun: a dataframe of sun positions, as returned by
+            sun_position.sun_position, to be used instead of computing them
+    """
+
+    def __init__(self, dates=None, daydate=_daydate, latitude=_latitude,
+                 longitude=_longitude, altitude=_altitude, timezone=_timezone,
+                 filter_night=True, store=None, sun=None):
+        self.dates = dates
+        self.daydate = daydate
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.timezone = timezone
+        self.store = store
+        if sun is None:
+            location = self.location
+            if store is None:
+                sun = sun_position(dates=dates, daydate=daydate,
+                                   filter_night=filter_night, **location)
+            else:
+                sun = store.sun_position(dates=dates, daydate=daydate,
+                                         filter_night=filter_night,
+                                         **location)
+        self.sun = sun
+
+    def __len__(self):
+        return len(self.sun)
+
+    @property
+    def location(self):
+        """latitude, longitude, altitude and timezone of the site"""
+        return dict(latitude=self.latitude, longitude=self.longitude,
+                    altitude=self.altitude, timezone=self.timezone)
+
+    @property
+    def index(self):
+        """localised dates of sun positions"""
+        return self.sun.index
+
+    @property
+    def elevation(self):
+        """sun elevation (deg)"""
+        return self.sun['elevation']
+
+    @property
+    def azimuth(self):
+        """sun azimuth (deg, from North, positive clockwise)"""
+        return self.sun['azimuth']
+
+    @property
+    def zenith(self):
+        """sun zenith angle (deg)"""
+        return self.sun['zenith']
+
+    @cached_property
+    def sin_elevation(self):
+        """sine of sun elevation"""
+        return numpy.sin(numpy.radians(self.elevation))
+
+    @cached_property
+    def dni_extra(self):
+        """extraterrestrial radiation (W.m-2)"""
+        if 'dni_extra' in self.sun:
+            return self.sun['dni_extra']
+        return sun_extraradiation(self.index)
+
+    @cached_property
+    def air_mass(self):
+        """pressure-corrected air mass at site altitude"""
+        if 'air_mass' in self.sun:
+            return self.sun['air_mass']
+        from openalea.astk.sky_irradiance import air_mass
+        return air_mass(self.zenith, self.altitude)
+
+    def sun_position(self):
+        """ a dataframe with elevation, azimuth and zenith of the sun"""
+        return self.sun.loc[:, ['elevation', 'azimuth', 'zenith']]
+
+    def with_night(self):
+        """ the geometry of the same request, night included"""
+        return SolarGeometry(self.dates, self.daydate, filter_night=False,
+                             store=self.store, **self.location)
+
+    def subset(self, mask):
+        """ the geometry restricted to the dates selected by a boolean mask,
+        keeping the derived quantities already evaluated"""
+        mask = numpy.asarray(mask, dtype=bool)
+        geometry = SolarGeometry(self.dates, self.daydate, store=self.store,
+                                 sun=self.sun.loc[mask, :], **self.location)
+        for name in ('sin_elevation', 'dni_extra', 'air_mass'):
+            if name in self.__dict__:
+                geometry.__dict__[name] = self.__dict__[name][mask]
+        return geometry
@@ -15,9 +15,16 @@
 
 """ Sun position using pvlib lib
 """
+import importlib.util
+import time
+import numpy
 import pandas
 
+from openalea.astk import sun_position_astk
+
 try:
+    from pvlib import spa
+    from pvlib.atmosphere import alt2pres
     from pvlib.solarposition import get_solarposition
     try:
         from pvlib.irradiance import get_extra_radiation
@@ -37,10 +44,202 @@ _longitude = 3.52
 _latitude = 43.36
 _altitude = 56
 
+# NREL SPA settings of pvlib.solarposition.get_solarposition: annual average
+# temperature (degC), difference between terrestrial and universal time (s)
+# and approximate atmospheric refraction at sunrise and sunset (deg)
+_spa_temperature = 12.
+_spa_delta_t = 67.0
+_spa_atmos_refract = 0.5667
+
+
+def _pvlib_backend(method, **kwds):
+    """ sun position function calling pvlib get_solarposition"""
+    def _sun_position(times, latitude, longitude, altitude):
+        df = get_solarposition(times, latitude, longitude, altitude,
+                               method=method, **kwds)
+        return pandas.DataFrame(
+            {'elevation': df['apparent_elevation'], 'azimuth': df['azimuth'],
+             'zenith': df['apparent_zenith']}, index=df.index)
+    return _sun_position
+
+
+def _astk_backend(times, latitude, longitude, altitude):
+    """ sun position function using astk equations"""
+    return sun_position_astk.sun_position(times, latitude=latitude,
+                                          longitude=longitude,
+                                          altitude=altitude,
+                                          filter_night=False)
+
+
+def _approximate_backend(times, latitude, longitude, altitude):
+    """ sun position function using astk approximate ephemeris"""
+    return sun_position_astk.approximate_sun_position(
+        times, latitude=latitude, longitude=longitude, altitude=altitude,
+        filter_night=False)
+
+
+# registry of sun position backends: name -> (function, is_available)
+# functions take localised times, latitude, longitude and altitude and return
+# a dataframe with elevation, azimuth and zenith columns
+_backends = {}
+_default_backend = 'nrel_numpy'
+
+
+def register_backend(name, function, available=True):
+    """ Register a sun position backend
+
+    Args:
+        name (str): the name of the backend
+        function: a function taking localised dates, latitude, longitude and
+        altitude as arguments, and returning a dataframe with 'elevation',
+        'azimuth' and 'zenith' columns (degrees) indexed by dates
+        available (bool): is the backend usable on this system ?
+    """
+    _backends[name] = (function, available)
+
+
+def available_backends():
+    """ Names of the sun position backends usable on this system"""
+    return [k for k, (_, available) in _backends.items() if available]
+
+
+def set_backend(name='nrel_numpy', numthreads=None):
+    """ Set the default sun position backend
+
+    Args:
+        name (str): the name of a registered backend
+        numthreads (int): if not None, the number of threads used by the
+        'nrel_numba' backend
+    """
+    global _default_backend
+    if numthreads is not None:
+        register_backend('nrel_numba',
+                         _pvlib_backend('nrel_numba', numthreads=numthreads),
+                         _backends['nrel_numba'][1])
+    if name not in available_backends():
+        raise ValueError('unavailable sun position backend: ' + str(name))
+    _default_backend = name
+
+
+def get_backend():
+    """ Name of the default sun position backend"""
+    return _default_backend
+
+
+register_backend('nrel_numpy', _pvlib_backend('nrel_numpy'))
+register_backend('nrel_numba', _pvlib_backend('nrel_numba', numthreads=4),
+                 importlib.util.find_spec('numba') is not None)
+register_backend('ephemeris', _pvlib_backend('ephemeris'))
+register_backend('astk', _astk_backend)
+register_backend('approximate', _approximate_backend)
+
+
+def _nrel_numpy_sites(times, latitude, longitude, altitude):
+    """ NREL SPA positions of several sites in a single call to the numpy
+    implementation of pvlib, or None if pvlib spa is numba compiled"""
+    if spa.USE_NUMBA:
+        # numba compiled spa does not broadcast sites
+        return None
+    lat, lon, alt = (x[:, None] for x in (latitude, longitude, altitude))
+    epoch = pandas.Timestamp('1970-01-01', tz='UTC')
+    unixtime = numpy.asarray((times.tz_convert('UTC') - epoch) /
+                             pandas.Timedelta('1s'), dtype=float)
+    zenith, _, elevation, _, azimuth, _ = spa.solar_position_numpy(
+        unixtime, lat, lon, alt, alt2pres(alt) / 100, _spa_temperature,
+        _spa_delta_t, _spa_atmos_refract, 1)
+    return {'elevation': elevation, 'azimuth': azimuth, 'zenith': zenith}
+
+
+def _astk_sites(times, latitude, longitude, altitude):
+    """ astk positions of several sites, broadcast in a single call"""
+    return sun_position_astk.sun_positions(times, latitude=latitude,
+                                           longitude=longitude,
+                                           altitude=altitude)
+
+
+def _approximate_sites(times, latitude, longitude, altitude):
+    """ approximate positions of several sites, broadcast in a single call"""
+    return sun_position_astk.approximate_sun_positions(
+        times, latitude=latitude, longitude=longitude, altitude=altitude)
+
+
+# multi-site versions of backends broadcasting site coordinates: name ->
+# function taking localised times and (S,) arrays of latitude, longitude and
+# altitude, and returning a dict of elevation, azimuth and zenith arrays
+# broadcastable to (S, T), or None if sites cannot be broadcast. Other
+# backends are called site by site (see sun_positions)
+_sites_backends = {'nrel_numpy': _nrel_numpy_sites, 'astk': _astk_sites,
+                   'approximate': _approximate_sites}
+
+
+def _angular_error(elevation, azimuth, ref_elevation, ref_azimuth):
+    """ angle (deg) between sun directions"""
+    def _vector(el, az):
+        el, az = numpy.radians(el), numpy.radians(az)
+        return numpy.stack([numpy.cos(el) * numpy.sin(az),
+                            numpy.cos(el) * numpy.cos(az), numpy.sin(el)], -1)
+    u = _vector(elevation, azimuth)
+    v = _vector(ref_elevation, ref_azimuth)
+    return numpy.degrees(numpy.arctan2(
+        numpy.linalg.norm(numpy.cross(u, v), axis=-1), (u * v).sum(axis=-1)))
+
+
+def calibrate_backends(dates=None, latitude=_latitude, longitude=_longitude,
+                       altitude=_altitude, tolerance=0.1, repeat=3,
+                       select=False):
+    """ Time sun position backends and evaluate their accuracy against the
+    NREL SPA algorithm
+
+    Args:
+        dates: a localised pandas.DatetimeIndex used for benchmarking. If None,
+        hourly dates of year 2020 (UTC) are used
+        latitude: float
+        longitude: float
+        altitude: (float) altitude in m
+        tolerance: the maximal angular error (deg) for a backend to be selected
+        repeat: the number of timed runs (the fastest is retained)
+        select: if True, the fastest backend with an error below tolerance is
+        set as the default backend (see set_backend). This changes sun
+        positions computed afterwards by the whole process. If False
+        (default), the default backend is left unchanged: the caller may pick
+        one from the returned ranking and pass it to set_backend
+
+    Returns:
+        a pandas dataframe indexed by backend names, with 'time' (s) and
+        'max_error' (deg, over positions with the sun above the horizon)
+        columns, sorted by time
+    """
+    if dates is None:
+        dates = pandas.date_range('2020-01-01', '2021-01-01', freq='h',
+                                  tz='UTC', inclusive='left')
+    reference = _backends['nrel_numpy'][0](dates, latitude, longitude, altitude)
+    day = reference['elevation'].values > 0
+    report = {}
+    for name in available_backends():
+        function = _backends[name][0]
+        # first call may include compilation or caching
+        sunpos = function(dates, latitude, longitude, altitude)
+        timing = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            function(dates, latitude, longitude, altitude)
+            timing.append(time.perf_counter() - start)
+        error = _angular_error(sunpos['elevation'].values[day],
+                               sunpos['azimuth'].values[day],
+                               reference['elevation'].values[day],
+                               reference['azimuth'].values[day])
+        report[name] = {'time': min(timing), 'max_error': error.max()}
+    report = pandas.DataFrame(report).T.sort_values('time')
+    if select:
+        candidates = report.index[report['max_error'] <= tolerance]
+        if len(candidates) > 0:
+            set_backend(candidates[0])
+    return report
+
 
 def sun_position(dates=None, daydate=_day, latitude=_latitude,
                  longitude=_longitude, altitude=_altitude, timezone=_timezone,
-                 filter_night=True):
+                 filter_night=True, backend=None):
     """ Sun position
 
     Args:
@@ -54,6 +253,8 @@ def sun_position(dates=None, daydate=_day, latitude=_latitude,
         dates is not already localised.
         This args is not used if dates are already localised
         filter_night (bool) : Should positions of sun during night be filtered ?
+        backend (str): the name of the sun position backend. If None, the
+        default backend (see set_backend and calibrate_backends) is used
 
     Returns:
         a pandas dataframe with sun position at requested dates indexed by
@@ -68,10 +269,9 @@ def sun_position(dates=None, daydate=_day, latitude=_latitude,
     else:
         times = dates
 
-    df = get_solarposition(times, latitude, longitude, altitude)
-    sunpos = pandas.DataFrame(
-        {'elevation': df['apparent_elevation'], 'azimuth': df['azimuth'],
-         'zenith': df['apparent_zenith']}, index=df.index)
+    if backend is None:
+        backend = _default_backend
+    sunpos = _backends[backend][0](times, latitude, longitude, altitude)
 
     if filter_night and sunpos is not None:
         sunpos = sunpos.loc[sunpos['elevation'] > 0, :]
@@ -79,6 +279,73 @@ def sun_position(dates=None, daydate=_day, latitude=_latitude,
     return sunpos
 
 
+def _sites(latitude, longitude, altitude):
+    """ (S,) arrays of site coordinates"""
+    return [numpy.asarray(x, dtype=float) for x in
+            numpy.broadcast_arrays(numpy.atleast_1d(latitude),
+                                   numpy.atleast_1d(longitude),
+                                   numpy.atleast_1d(altitude))]
+
+
+def sun_positions(dates=None, daydate=_day, latitude=_latitude,
+                  longitude=_longitude, altitude=_altitude, timezone=_timezone,
+                  backend=None):
+    """ Sun positions at several sites
+
+    Args:
+        dates: a pandas.DatetimeIndex specifying the dates at which sun position
+        is required.If None, daydate is used and one position per hour is generated
+        daydate: (str) yyyy-mm-dd (not used if dates is not None).
+        latitude: float or (S,) array-like of site latitudes
+        longitude: float or (S,) array-like of site longitudes
+        altitude: float or (S,) array-like of site altitudes (m)
+        timezone: a string identifying the timezone to be associated to dates if
+        dates is not already localised.
+        This args is not used if dates are already localised
+        backend (str): the name of the sun position backend. If None, the
+        default backend (see set_backend and calibrate_backends) is used
+
+    Returns:
+        a dict with the localised dates ('dates') and the (S, T) arrays of sun
+        'elevation', 'azimuth' (from North, positive clockwise) and 'zenith'
+        (degrees) at the sites. Night positions are not filtered.
+
+    Details:
+        The 'nrel_numpy', 'astk' and 'approximate' backends broadcast site
+        coordinates against dates, so that all sites are processed in a single
+        call and time-only terms are computed once. 'nrel_numpy' uses the numpy
+        implementation of the NREL SPA algorithm of pvlib, with the settings
+        of pvlib.solarposition.get_solarposition. Backends that cannot
+        broadcast sites ('nrel_numba', 'ephemeris' and user registered
+        backends) are called site by site.
+    """
+    if dates is None:
+        dates = pandas.date_range(daydate, periods=24, freq='h', tz=timezone)
+
+    if dates.tz is None:
+        times = dates.tz_localize(timezone)
+    else:
+        times = dates
+
+    if backend is None:
+        backend = _default_backend
+    lat, lon, alt = _sites(latitude, longitude, altitude)
+    shape = (len(lat), len(times))
+    sites = None
+    if backend in _sites_backends:
+        sites = _sites_backends[backend](times, lat, lon, alt)
+    if sites is None:
+        function = _backends[backend][0]
+        dfs = [function(times, *site) for site in zip(lat, lon, alt)]
+        sites = {name: numpy.array([df[name].values for df in dfs]) for name
+                 in ('elevation', 'azimuth', 'zenith')}
+
+    return {'dates': times,
+            'elevation': numpy.broadcast_to(sites['elevation'], shape),
+            'azimuth': numpy.broadcast_to(sites['azimuth'], shape),
+            'zenith': numpy.broadcast_to(sites['zenith'], shape)}
+
+
 def sun_extraradiation(dates=None, daydate=_day, solar_constant=1366.1,
                        method='spencer', timezone=_timezone):
     """ Extraterrestrial radiation (W.m2) at the top of the earth atmosphere
@@ -247,6 +247,67 @@ def eot(hUTC, dayofyear, year):
     return (L - ra) / 15.
 
 
+def ephemeris(hUTC, dayofyear, year, latitude=_latitude, longitude=_longitude):
+    """ Sun ephemeris, computing shared intermediates once per timestamp
+
+    Args:
+        hUTC: fractional hour (UTC time)
+        dayofyear (int):
+        year (int):
+        latitude (float): the location latitude (degrees)
+        longitude (float): the location longitude (degrees, east positive)
+
+    Returns:
+        a dict of arrays with keys 'julian_date', 'ecliptic_longitude' (degrees),
+        'declination' (radians), 'right_ascension' (degrees), 'hour_angle'
+        (hour), 'elevation' (degrees), 'azimuth' (degrees, from North, positive
+        clockwise) and 'eot' (hour)
+
+    Details:
+        Results are the same as the ones of the julian_date,
+        ecliptic_longitude, declination, right_ascension, hour_angle,
+        sun_elevation, sun_azimuth and eot functions.
+    """
+    hUTC = numpy.asarray(hUTC, dtype=float)
+    dayofyear = numpy.asarray(dayofyear)
+    year = numpy.asarray(year)
+    jd = julian_date(hUTC, dayofyear, year)
+    n = jd - 2451545
+    # ecliptic longitude (deg)
+    L = numpy.mod(280.46 + 0.9856474 * n, 360)
+    g = numpy.mod(357.528 + 0.9856003 * n, 360)
+    l = L + 1.915 * numpy.sin(numpy.radians(g)) + 0.02 * numpy.sin(
+        numpy.radians(2 * g))
+    obliquity = 23.439 - 0.0000004 * n
+    sinl = numpy.sin(numpy.radians(l))
+    cosl = numpy.cos(numpy.radians(l))
+    # declination (rad)
+    dec = numpy.arcsin(numpy.sin(numpy.radians(obliquity)) * sinl)
+    # right ascension (deg)
+    tanra = numpy.cos(numpy.radians(obliquity)) * sinl / cosl
+    ra = numpy.degrees(numpy.arctan(tanra)) + numpy.where(cosl >= 0, 0, 180)
+    # hour angle (hour)
+    gmst = numpy.mod(6.697375 + 0.0657098242 * n + hUTC, 24)
+    lmst = numpy.mod(gmst + longitude / 15., 24)
+    ha = numpy.mod(lmst - ra / 15. + 12, 24) - 12
+    # elevation (deg)
+    lat = numpy.radians(latitude)
+    har = numpy.radians(ha * 15)
+    sinel = numpy.sin(dec) * numpy.sin(lat) + numpy.cos(dec) * numpy.cos(
+        lat) * numpy.cos(har)
+    el = numpy.degrees(numpy.arcsin(sinel))
+    # azimuth (deg), using method of Michalsky to get az from sinaz
+    elr = numpy.radians(el)
+    sinaz = -numpy.cos(dec) * numpy.sin(har) / numpy.cos(elr)
+    elc = numpy.arcsin(numpy.sin(dec) / numpy.sin(lat))
+    az = numpy.degrees(numpy.arcsin(sinaz))
+    az = numpy.where(elr >= elc, 180 - az, numpy.where(har > 0, 360 + az, az))
+
+    return {'julian_date': jd, 'ecliptic_longitude': l, 'declination': dec,
+            'right_ascension': ra, 'hour_angle': ha, 'elevation': el,
+            'azimuth': az, 'eot': (L - ra) / 15.}
+
+
 def daylength(dayofyear, year, latitude):
     """ estimate of daylength"""
 
@@ -300,8 +361,8 @@ def sun_position(dates=None, daydate=_day, latitude=_latitude,
     hUTC = d.hour + d.minute / 60.
     dayofyear = d.dayofyear
     year = d.year
-    el = sun_elevation(hUTC, dayofyear, year, latitude, longitude)
-    az = sun_azimuth(hUTC, dayofyear, year, latitude, longitude)
+    eph = ephemeris(hUTC, dayofyear, year, latitude, longitude)
+    el, az = eph['elevation'], eph['azimuth']
     sunpos = pandas.DataFrame(
         {'elevation': el, 'azimuth': az, 'zenith': 90 - el}, index=times)
 
@@ -311,6 +372,236 @@ def sun_position(dates=None, daydate=_day, latitude=_latitude,
     return sunpos
 
 
+def sun_positions(dates=None, daydate=_day, latitude=_latitude,
+                  longitude=_longitude, altitude=_altitude, timezone=_timezone):
+    """ Sun positions at several sites
+
+    Args:
+        dates: a pandas.DatetimeIndex specifying the dates at which sun position
+        is required.If None, daydate is used and one position per hour is generated
+        daydate: (str) yyyy-mm-dd (not used if dates is not None).
+        latitude: float or (S,) array-like of site latitudes
+        longitude: float or (S,) array-like of site longitudes
+        altitude: float or (S,) array-like of site altitudes (m), not used
+        timezone: a string identifying the timezone to be associated to dates if
+        dates is not already localised.
+        This args is not used if dates are already localised
+
+    Returns:
+        a dict with the localised dates ('dates') and the (S, T) arrays of sun
+        'elevation', 'azimuth' (from North, positive clockwise) and 'zenith'
+        (degrees) at the sites. Night positions are not filtered.
+    """
+    if dates is None:
+        dates = pandas.date_range(daydate, periods=24, freq='h', tz=timezone)
+
+    if dates.tz is None:
+        times = dates.tz_localize(timezone)
+    else:
+        times = dates
+
+    latitude, longitude, _ = numpy.broadcast_arrays(
+        numpy.atleast_1d(latitude), numpy.atleast_1d(longitude),
+        numpy.atleast_1d(altitude))
+    d = times.tz_convert('UTC')
+    hUTC = numpy.asarray(d.hour + d.minute / 60.)
+    eph = ephemeris(hUTC, numpy.asarray(d.dayofyear), numpy.asarray(d.year),
+                    numpy.asarray(latitude, dtype=float)[:, None],
+                    numpy.asarray(longitude, dtype=float)[:, None])
+    shape = (len(latitude), len(times))
+    el = numpy.broadcast_to(eph['elevation'], shape)
+    az = numpy.broadcast_to(eph['azimuth'], shape)
+
+    return {'dates': times, 'elevation': el, 'azimuth': az, 'zenith': 90 - el}
+
+
+# Fourier series of sun declination (deg) and equation of time (minutes) as a
+# function of the (tropical) year angle, with coefficients linearly varying with
+# time (julian centuries since J2000.0). Rows are (coefficient, secular
+# variation) of the constant, cos(x), sin(x), cos(2x), sin(2x), ..., sin(4x)
+# terms. Coefficients were fitted by least squares on NREL SPA geocentric
+# declination and equation of time over years 1950-2100.
+_declination_series = numpy.array([
+    (0.3789364514, -0.003862771771),
+    (-22.87701127, 0.01238137657),
+    (4.223740706, -0.002282936485),
+    (-0.378019002, -0.000517640751),
+    (0.04937086648, -0.01183498043),
+    (-0.1478773565, 0.0002268234512),
+    (0.08646037527, -0.0005772300286),
+    (-0.007216478759, -0.0001167913009),
+    (0.003784411424, -0.0002571773521)])
+_eot_series = numpy.array([
+    (0.007425771618, 0.002638110401),
+    (0.4616579273, 0.2361647148),
+    (-7.348251549, 0.02593328967),
+    (-3.510985885, 0.008819302877),
+    (-9.282350996, 0.01135674368),
+    (-0.0941350907, 0.01013975367),
+    (-0.3033474969, -0.002185352605),
+    (-0.1434282301, 0.000967098173),
+    (-0.1659744083, 0.0002348330496)])
+
+
+def approximate_declination_eot(n):
+    """ Sun declination and equation of time from low order Fourier series
+
+    Args:
+        n: (fractional) number of days since J2000.0 (2000-01-01 12:00 UTC)
+
+    Returns:
+        the sun declination (degrees) and the equation of time (minutes)
+
+    Details:
+        Maximal errors against NREL SPA are 0.008 degree for declination and
+        0.05 minute for the equation of time over years 1950-2100.
+    """
+    n = numpy.asarray(n, dtype=float)
+    t = n / 36525.
+    x = 2 * numpy.pi * n / 365.2422
+    cos1, sin1 = numpy.cos(x), numpy.sin(x)
+    harmonics = [numpy.ones_like(x)]
+    cosk, sink = cos1, sin1
+    for k in range(4):
+        harmonics += [cosk, sink]
+        cosk, sink = cosk * cos1 - sink * sin1, sink * cos1 + cosk * sin1
+    dec = sum(h * (c + d * t) for h, (c, d) in zip(harmonics,
+                                                   _declination_series))
+    eot = sum(h * (c + d * t) for h, (c, d) in zip(harmonics, _eot_series))
+    return dec, eot
+
+
+def atmospheric_refraction(elevation, altitude=_altitude, temperature=12.):
+    """ Atmospheric refraction correction of sun elevation
+
+    Args:
+        elevation: the (geometric) sun elevation (degrees)
+        altitude: (float) altitude in m, used to estimate atmospheric pressure
+        temperature: (float) air temperature (degrees C)
+
+    Returns:
+        the refraction correction (degrees)
+
+    Details:
+        I. Reda and A. Andreas, Solar position algorithm for solar radiation
+        applications. Solar Energy, vol. 76, no. 5, pp. 577-589, 2004.
+    """
+    elevation = numpy.asarray(elevation, dtype=float)
+    pressure = ((44331.514 - altitude) / 11880.516) ** (1 / 0.1902632)
+    correction = pressure / 1010. * 283. / (273. + temperature) * 1.02 / (
+        60 * numpy.tan(numpy.radians(elevation + 10.3 / (elevation + 5.11))))
+    return numpy.where(elevation >= -(0.26667 + 0.5667), correction, 0)
+
+
+def approximate_sun_position(dates=None, daydate=_day, latitude=_latitude,
+                             longitude=_longitude, altitude=_altitude,
+                             timezone=_timezone, filter_night=True):
+    """ Sun position from approximate Fourier series of declination and
+    equation of time
+
+    Args:
+        dates: a pandas.DatetimeIndex specifying the dates at which sun position
+        is required.If None, daydate is used and one position per hour is generated
+        daydate: (str) yyyy-mm-dd (not used if dates is not None).
+        latitude: float
+        longitude: float
+        altitude: (float) altitude in m
+        timezone: a string identifying the timezone to be associated to dates if
+        dates is not already localised.
+        This args is not used if dates are already localised
+        filter_night (bool) : Should positions of sun during night be filtered ?
+
+    Returns:
+        a pandas dataframe with sun position at requested dates indexed by
+        localised dates. Sun azimuth is given from North, positive clockwise.
+        Elevation includes atmospheric refraction.
+
+    Details:
+        The maximal angular error against NREL SPA apparent positions of the
+        sun above the horizon is 0.02 degree over years 1950-2100
+        (see approximate_declination_eot).
+    """
+    if dates is None:
+        dates = pandas.date_range(daydate, periods=24, freq='h', tz=timezone)
+
+    if dates.tz is None:
+        times = dates.tz_localize(timezone)
+    else:
+        times = dates
+
+    el, az = _approximate_elevation_azimuth(times, latitude, longitude,
+                                            altitude)
+    sunpos = pandas.DataFrame(
+        {'elevation': el, 'azimuth': az, 'zenith': 90 - el}, index=times)
+
+    if filter_night and sunpos is not None:
+        sunpos = sunpos.loc[sunpos['elevation'] > 0, :]
+
+    return sunpos
+
+
+def _approximate_elevation_azimuth(times, latitude, longitude, altitude):
+    """ apparent sun elevation and azimuth (deg) at localised times, from
+    approximate declination and equation of time. Site coordinates broadcast
+    against times"""
+    epoch = pandas.Timestamp('2000-01-01 12:00', tz='UTC')
+    n = numpy.asarray((times - epoch) / pandas.Timedelta('1D'), dtype=float)
+    dec, eot = approximate_declination_eot(n)
+    dec = numpy.radians(dec)
+    # hours since midnight UTC
+    hUTC = numpy.mod(n + 0.5, 1) * 24
+    ha = numpy.radians(15 * (hUTC - 12) + longitude + eot / 4.)
+    lat = numpy.radians(latitude)
+    sinel = numpy.sin(lat) * numpy.sin(dec) + numpy.cos(lat) * numpy.cos(
+        dec) * numpy.cos(ha)
+    el = numpy.degrees(numpy.arcsin(sinel))
+    el = el + atmospheric_refraction(el, altitude)
+    az = numpy.degrees(numpy.arctan2(numpy.sin(ha), numpy.cos(ha) * numpy.sin(
+        lat) - numpy.tan(dec) * numpy.cos(lat)))
+    az = numpy.mod(az + 180, 360)
+    return el, az
+
+
+def approximate_sun_positions(dates=None, daydate=_day, latitude=_latitude,
+                              longitude=_longitude, altitude=_altitude,
+                              timezone=_timezone):
+    """ Sun positions at several sites, from approximate Fourier series of
+    declination and equation of time (see approximate_sun_position)
+
+    Args:
+        dates: a pandas.DatetimeIndex specifying the dates at which sun position
+        is required.If None, daydate is used and one position per hour is generated
+        daydate: (str) yyyy-mm-dd (not used if dates is not None).
+        latitude: float or (S,) array-like of site latitudes
+        longitude: float or (S,) array-like of site longitudes
+        altitude: float or (S,) array-like of site altitudes (m)
+        timezone: a string identifying the timezone to be associated to dates if
+        dates is not already localised.
+        This args is not used if dates are already localised
+
+    Returns:
+        a dict with the localised dates ('dates') and the (S, T) arrays of sun
+        'elevation', 'azimuth' (from North, positive clockwise) and 'zenith'
+        (degrees) at the sites. Night positions are not filtered.
+    """
+    if dates is None:
+        dates = pandas.date_range(daydate, periods=24, freq='h', tz=timezone)
+
+    if dates.tz is None:
+        times = dates.tz_localize(timezone)
+    else:
+        times = dates
+
+    latitude, longitude, altitude = (
+        numpy.asarray(x, dtype=float)[:, None] for x in numpy.broadcast_arrays(
+            numpy.atleast_1d(latitude), numpy.atleast_1d(longitude),
+            numpy.atleast_1d(altitude)))
+    el, az = _approximate_elevation_azimuth(times, latitude, longitude,
+                                            altitude)
+
+    return {'dates': times, 'elevation': el, 'azimuth': az, 'zenith': 90 - el}
+
+
 def sun_extraradiation(dates=None, daydate=_day, solar_constant=1366.1,
                        method='spencer', timezone=_timezone):
     """ Extraterrestrial radiation (W.m2) at the top of the earth atmosphere
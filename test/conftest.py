@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def astk_cache_dir(tmp_path, monkeypatch):
+    """ keep files cached during tests out of the user cache"""
+    monkeypatch.setenv('ASTK_CACHE_DIR', str(tmp_path / 'cache'))
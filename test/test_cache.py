@@ -0,0 +1,21 @@
+import os
+
+from openalea.astk.cache import cache_dir, save_atomic
+
+
+def test_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('ASTK_CACHE_DIR', str(tmp_path))
+    assert cache_dir() == str(tmp_path)
+    monkeypatch.delenv('ASTK_CACHE_DIR')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert cache_dir() == os.path.join(str(tmp_path), 'openalea.astk')
+
+
+def test_save_atomic(tmp_path):
+    path = tmp_path / 'data' / 'file.bin'
+    save_atomic(str(path), lambda f: f.write(b'astk'))
+    assert path.read_bytes() == b'astk'
+    assert os.listdir(str(tmp_path / 'data')) == ['file.bin']
+    umask = os.umask(0)
+    os.umask(umask)
+    assert path.stat().st_mode & 0o777 == 0o666 & ~umask
@@ -0,0 +1,148 @@
+import os
+import numpy
+
+import openalea.astk.icosphere as icosphere_module
+from openalea.astk.icosphere import (
+    icosahedron,
+    icosphere,
+    split_triangles,
+    star_split,
+    dual,
+    vertex_faces,
+    upper_icosphere,
+    turtle_mesh,
+    spherical_face_centers,
+    face_solid_angles,
+    turtle_sectors,
+    locate_sectors,
+    sample_faces,
+    iter_sample_faces)
+
+
+def test_split_triangles():
+    vertices, faces = icosahedron()
+    new_vertices, new_faces, tags = split_triangles(vertices, faces,
+                                                    list(range(len(faces))))
+    assert new_vertices.shape == (42, 3)
+    assert new_faces.shape == (80, 3)
+    numpy.testing.assert_allclose(numpy.linalg.norm(new_vertices, axis=1), 1)
+    # middle points are numbered in order of first encounter
+    numpy.testing.assert_array_equal(new_faces[:4], [(0, 12, 14),
+                                                     (11, 13, 12),
+                                                     (5, 14, 13),
+                                                     (12, 13, 14)])
+    numpy.testing.assert_array_equal(tags, numpy.repeat(range(20), 4))
+
+
+def test_dual():
+    vertices, faces = icosphere(1)
+    ring, valence = vertex_faces(faces)
+    assert ring.shape == (42, 6)
+    assert list(valence[:12]) == [5] * 12
+    dual_vertices, dual_faces = dual(vertices, faces)
+    assert len(dual_vertices) == 80
+    assert len(dual_faces) == 42
+    assert [len(f) for f in dual_faces] == list(valence)
+    # consecutive faces around a vertex share an edge
+    for v, face in enumerate(dual_faces):
+        ifaces = ring[v, :valence[v]]
+        for f1, f2 in zip(ifaces, numpy.roll(ifaces, -1)):
+            assert len(set(faces[f1]) & set(faces[f2])) == 2
+
+
+def test_star_split():
+    vertices, faces = dual(*icosahedron())
+    new_vertices, new_faces, tags = star_split(vertices, faces, range(12))
+    assert new_vertices.shape == (32, 3)
+    assert new_faces.shape == (60, 3)
+    numpy.testing.assert_array_equal(new_faces[:5, 2], [20] * 5)
+    numpy.testing.assert_array_equal(new_faces[:5, 0], faces[0])
+    numpy.testing.assert_array_equal(tags, numpy.repeat(range(12), 5))
+
+
+def test_upper_icosphere():
+    vertices, faces = icosphere(3, 1)
+    upper_vertices, upper_faces = upper_icosphere(3, 1)
+    assert len(upper_faces) < 0.7 * len(faces)
+    assert upper_vertices[upper_faces].max(axis=1)[:, 2].min() > -0.5
+    # faces are ordered as in the full icosphere
+    full = {tuple(vertices[f].ravel()): i for i, f in enumerate(faces)}
+    index = [full[tuple(upper_vertices[f].ravel())] for f in upper_faces]
+    assert index == sorted(index)
+
+
+def test_turtle_mesh():
+    for n in (6, 16, 26, 46, 66, 91, 136, 196, 251, 341, 406, 556, 751, 976):
+        vertices, faces = turtle_mesh(n)
+        assert len(faces) == n
+        assert len(vertices) == len(numpy.unique(sum(faces, [])))
+    vertices, faces = turtle_mesh(1000)
+    assert len(faces) == 1226
+    elevation, azimuth = zip(*spherical_face_centers((vertices, faces)))
+    assert min(elevation) > -5
+
+
+def test_turtle_sectors(tmp_path, monkeypatch):
+    monkeypatch.setenv('ASTK_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(icosphere_module, '_turtles', {})
+    vertices, faces, directions, solid_angles = turtle_sectors(46)
+    cached_files = list(tmp_path.iterdir())
+    assert len(cached_files) == 1
+    umask = os.umask(0)
+    os.umask(umask)
+    assert cached_files[0].stat().st_mode & 0o777 == 0o666 & ~umask
+    assert directions.shape == (46, 2)
+    numpy.testing.assert_allclose(directions, spherical_face_centers(turtle_mesh(46)))
+    # sectors cover the upper hemisphere
+    numpy.testing.assert_allclose(solid_angles.sum(), 2 * numpy.pi)
+    # reload from disk
+    monkeypatch.setattr(icosphere_module, '_turtles', {})
+    cached = turtle_sectors(46)
+    numpy.testing.assert_array_equal(cached[0], vertices)
+    assert cached[1] == faces
+    numpy.testing.assert_array_equal(cached[3], solid_angles)
+
+
+def test_face_solid_angles():
+    vertices, faces = icosphere(2)
+    numpy.testing.assert_allclose(face_solid_angles(vertices, faces).sum(), 4 * numpy.pi)
+    numpy.testing.assert_allclose(face_solid_angles(*dual(vertices, faces)).sum(), 4 * numpy.pi)
+
+
+def test_locate_sectors():
+    for n in (16, 46, 136):
+        vertices, faces, directions, _ = turtle_sectors(n, cache=False)
+        elevation, azimuth = numpy.radians(directions.T)
+        centers = numpy.stack([numpy.cos(elevation) * numpy.cos(azimuth),
+                               numpy.cos(elevation) * numpy.sin(azimuth),
+                               numpy.sin(elevation)], axis=-1)
+        numpy.testing.assert_array_equal(locate_sectors(centers, n),
+                                         numpy.arange(len(faces)))
+        points = numpy.random.default_rng(0).normal(size=(2000, 3))
+        sectors = locate_sectors(points, n, chunk_size=500)
+        assert numpy.all(sectors[points[:, 2] > 0.5] >= 0)
+        assert numpy.all(sectors[points[:, 2] < -0.5] == -1)
+        # points lie inside the spherical polygon of their sector
+        for point, sector in zip(points, sectors):
+            if sector >= 0:
+                polygon = vertices[faces[sector]]
+                normals = numpy.cross(polygon, numpy.roll(polygon, -1, axis=0))
+                assert numpy.all(normals @ point > -1e-12)
+
+
+def test_sample_faces():
+    vertices, faces = turtle_mesh(16)
+    n = sum(len(f) for f in faces)
+    points, tags = sample_faces(vertices, faces, iter=2)
+    assert points.shape == (n * 16, 3)
+    numpy.testing.assert_array_equal(numpy.bincount(tags),
+                                     [len(f) * 16 for f in faces])
+    directions, _ = sample_faces(vertices, faces, iter=2, spheric=True)
+    assert directions.shape == (n * 16, 2)
+    chunks = list(iter_sample_faces(vertices, faces, iter=2, spheric=True,
+                                    chunk_size=100))
+    assert [len(c[0]) for c in chunks[:-1]] == [100] * (len(chunks) - 1)
+    numpy.testing.assert_array_equal(numpy.concatenate([c[0] for c in chunks]),
+                                     directions)
+    numpy.testing.assert_array_equal(numpy.concatenate([c[1] for c in chunks]),
+                                     tags)
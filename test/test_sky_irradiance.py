@@ -4,6 +4,15 @@ from openalea.astk.sky_irradiance import (
     clear_sky_irradiances,
     actual_sky_irradiances,
     sky_irradiance,
+    daily_sky_irradiances,
+    iter_sky_irradiance,
+    available_decomposition_models,
+    decomposition_model,
+    benchmark_decomposition_models,
+    available_clear_sky_models,
+    sites_clear_sky_irradiances,
+    clear_sky_template,
+    ClearSkyTemplate,
     all_weather_sky_clearness,
     f_clear_sky)
 
@@ -58,4 +67,119 @@ def test_twilight():
     sky_irr = sky_irradiance(ghi=1.0, dates=pandas.Timestamp('2017-08-17 19:00:00+0400', tz='Indian/Reunion'), latitude=-21.32,
                     longitude=55.5, timezone='Indian/Reunion')
     assert sky_irr.dhi.sum() == 1
-    assert sky_irr.dni.sum() == 0
\ No newline at end of file
+    assert sky_irr.dni.sum() == 0
+
+
+def test_linke_turbidity():
+    import pvlib
+    from openalea.astk.sky_irradiance import (
+        linke_turbidity,
+        monthly_linke_turbidity,
+        preload_linke_turbidity,
+        _linke_turbidities)
+    preload_linke_turbidity([(43.36, 3.52), (-21.32, 55.5)])
+    assert (-21.32, 55.5) in _linke_turbidities
+    assert len(monthly_linke_turbidity(-21.32, 55.5)) == 12
+    for dates in (pandas.date_range('2015-12-25', '2016-03-05', freq='6h', tz='Europe/Paris'),
+                  pandas.date_range('2016-12-20', '2017-01-10', freq='h')):
+        for interp in (True, False):
+            expected = pvlib.clearsky.lookup_linke_turbidity(dates, -21.32, 55.5, interp_turbidity=interp)
+            pandas.testing.assert_series_equal(linke_turbidity(dates, -21.32, 55.5, interp_turbidity=interp),
+                                               expected)
+
+
+def test_daily_sky_irradiances():
+    days = pandas.date_range('2001-03-24', '2001-03-27')
+    rad = [5, 25, 12, 18]
+    for with_pvlib in (True, False):
+        df = daily_sky_irradiances(days, rad, with_pvlib=with_pvlib)
+        expected = pandas.concat([sky_irradiance(daydate=d, day_ghi=r, with_pvlib=with_pvlib)
+                                  for d, r in zip(days, rad)])
+        assert (df.index == expected.index).all()
+        numpy.testing.assert_allclose(df, expected, atol=1e-9)
+        numpy.testing.assert_allclose(df.ghi.groupby(df.index.date).sum() * 3600 / 1e6, rad)
+
+
+def test_clear_sky_template(tmp_path):
+    path = str(tmp_path / 'template.npz')
+    template = clear_sky_template(path=path)
+    assert template.table.shape == (366, 24, 8)
+    assert clear_sky_template() is template
+    loaded = ClearSkyTemplate.load(path)
+    numpy.testing.assert_array_equal(loaded.table, template.table)
+    assert loaded.timezone == template.timezone
+    # the file of another site is not reused
+    other = clear_sky_template(latitude=48.8, path=path)
+    assert other.latitude == 48.8
+    assert ClearSkyTemplate.load(path).latitude == 48.8
+    assert not numpy.array_equal(other.table, template.table)
+    # templates follow the clear sky model
+    haurwitz = clear_sky_template(model='haurwitz')
+    assert haurwitz.model == 'haurwitz'
+    assert template.model == 'ineichen'
+    cs = clear_sky_irradiances(model='haurwitz')
+    numpy.testing.assert_allclose(haurwitz.lookup(cs.index).loc[:, ['ghi', 'dni', 'dhi']], cs)
+
+    cs = clear_sky_irradiances()
+    numpy.testing.assert_allclose(template.lookup(cs.index).loc[:, ['ghi', 'dni', 'dhi']], cs)
+
+    days = pandas.date_range('2013-05-01', '2013-05-03')
+    rad = [5, 25, 12]
+    df = daily_sky_irradiances(days, rad, template=template)
+    numpy.testing.assert_allclose(df.ghi.groupby(df.index.date).sum() * 3600 / 1e6, rad)
+    expected = daily_sky_irradiances(days, rad)
+    numpy.testing.assert_allclose(df.elevation, expected.elevation, atol=0.5)
+    df = sky_irradiance(daydate='2013-05-02', day_ghi=25, template=template)
+    expected = sky_irradiance(daydate='2013-05-02', day_ghi=25)
+    numpy.testing.assert_allclose(df.ghi, expected.ghi, atol=5)
+
+
+def test_iter_sky_irradiance():
+    dates = pandas.date_range('2001-06-20', '2001-06-23', freq='30min', tz='Europe/Paris')
+    ghi = clear_sky_irradiances(dates=dates).ghi.reindex(dates, fill_value=0)
+    ghi *= numpy.random.default_rng(0).uniform(0.2, 1, len(dates))
+    records = pandas.DataFrame({'ghi': ghi, 'temp_dew': 5.}, index=dates)
+    expected = sky_irradiance(dates=dates, ghi=records.ghi, temp_dew=records.temp_dew)
+    chunks = (records.iloc[i:i + 10] for i in range(0, len(records), 10))
+    out = list(iter_sky_irradiance(chunks))
+    assert len(out) == 15
+    df = pandas.concat([chunk for chunk in out if len(chunk) > 0])
+    assert (df.index == expected.index).all()
+    numpy.testing.assert_allclose(df, expected)
+
+
+def test_decomposition_models():
+    import pvlib
+    from openalea.astk.solar_geometry import SolarGeometry
+    assert {'erbs', 'boland', 'spitters', 'disc', 'dirint'} <= set(available_decomposition_models())
+    geometry = SolarGeometry(pandas.date_range('2013-05-01', '2013-05-04', freq='h', tz='Europe/Paris'))
+    ghi = clear_sky_irradiances(geometry=geometry).ghi * numpy.linspace(0.1, 1, len(geometry))
+    for name, pvlib_model in (('erbs', pvlib.irradiance.erbs), ('boland', pvlib.irradiance.boland)):
+        dni, dhi = decomposition_model(name)(ghi, geometry.zenith, geometry.dni_extra, geometry.index)
+        expected = pvlib_model(ghi, geometry.zenith, geometry.index)
+        numpy.testing.assert_allclose(dni, expected.dni)
+        numpy.testing.assert_allclose(dhi, expected.dhi)
+    for name in available_decomposition_models():
+        df = sky_irradiance(attenuation=0.2, model=name)
+        assert df.dhi.sum() / df.ghi.sum() > 0.95
+        numpy.testing.assert_allclose(df.ghi, df.dhi + df.dni * numpy.sin(numpy.radians(df.elevation)))
+    report = benchmark_decomposition_models(repeat=1)
+    assert report.loc['dirint', 'rmse_dhi'] == 0
+    assert numpy.isfinite(report.values).all()
+
+
+def test_sites_clear_sky_irradiances():
+    assert {'ineichen', 'simplified_solis', 'haurwitz'} <= set(available_clear_sky_models())
+    latitude, longitude, altitude = [43.36, 48.8, -21.32], [3.52, 2.3, 55.5], [56, 35, 100]
+    dates = pandas.date_range('2016-06-20', '2016-06-22', freq='h', tz='UTC')
+    for model in available_clear_sky_models():
+        sites = sites_clear_sky_irradiances(dates, latitude=latitude, longitude=longitude, altitude=altitude,
+                                            model=model)
+        assert sites['ghi'].shape == (3, len(dates))
+        assert (sites['ghi'][sites['elevation'] <= 0] == 0).all()
+        for i in range(3):
+            df = clear_sky_irradiances(dates, latitude=latitude[i], longitude=longitude[i], altitude=altitude[i],
+                                       model=model)
+            day = sites['elevation'][i] > 0
+            for name in ('ghi', 'dni', 'dhi'):
+                numpy.testing.assert_allclose(sites[name][i, day], df[name])
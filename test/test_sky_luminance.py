@@ -1,4 +1,4 @@
-from openalea.astk.sky_luminance import sky_luminance
+from openalea.astk.sky_luminance import sky_luminance, SkyPatternCache, all_weather_abcde
 from openalea.astk.sky_irradiance import sky_irradiance
 from openalea.astk.sky_map import sky_grid, sky_hi, sky_ni
 from openalea.astk.sky_sources import source_hi
@@ -102,3 +102,52 @@ def test_scaling():
     #
     sun, sky = sky_luminance(grid, sky_type='sun_soc', sky_irradiance=sky_irr, scale='ghi')
     numpy.testing.assert_allclose(sky_irr.ghi.mean(), source_hi(sun).sum() + sky_hi(grid, sky).sum())
+
+
+def test_chunk_size():
+    grid = sky_grid()
+    sky_irr = sky_irradiance(attenuation=0.5)
+    for sky_type in ('clear_sky', 'blended', 'all_weather'):
+        for sun_in_sky in (False, True):
+            sun, sky = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irr, sun_in_sky=sun_in_sky,
+                                     chunk_size=1)
+            sun_b, sky_b = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irr, sun_in_sky=sun_in_sky,
+                                         chunk_size=100)
+            assert len(sun) == len(sun_b)
+            numpy.testing.assert_allclose(sky, sky_b)
+
+
+def test_rotate():
+    grid = sky_grid()
+    sky_irr = sky_irradiance(attenuation=0.5)
+    for sky_type in ('clear_sky', 'blended', 'all_weather'):
+        _, sky = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irr)
+        _, rotated = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irr, rotate=True)
+        numpy.testing.assert_allclose(sky_hi(grid, rotated).sum(), sky_hi(grid, sky).sum())
+        numpy.testing.assert_allclose(rotated, sky, atol=0.01 * sky.max())
+        _, rotated = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irr, rotate=True, zenith_step=1)
+        numpy.testing.assert_allclose(rotated, sky, atol=0.01 * sky.max())
+
+
+def test_cache():
+    grid = sky_grid()
+    sky_irr = sky_irradiance()
+    cache = SkyPatternCache(maxsize=20)
+    for sky_type in ('clear_sky', 'all_weather'):
+        _, sky = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irr)
+        _, cached = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irr, cache=cache)
+        numpy.testing.assert_allclose(cached, sky, rtol=0.01)
+    assert cache.info()['misses'] == 2 * len(sky_irr)
+    assert len(cache) == 20
+    _, cached = sky_luminance(grid, sky_type='all_weather', sky_irradiance=sky_irr, cache=cache)
+    assert cache.hits == len(sky_irr)
+
+
+def test_all_weather_abcde():
+    zenith = numpy.array([10, 30, 60, 85])
+    clearness = numpy.array([1.02, 1.2, 3, 7])
+    brightness = numpy.array([0.1, 0.2, 0.3, 0.15])
+    abcde = numpy.array(all_weather_abcde(zenith, clearness, brightness))
+    assert abcde.shape == (5, 4)
+    for i, args in enumerate(zip(zenith, clearness, brightness)):
+        numpy.testing.assert_array_equal(abcde[:, i], all_weather_abcde(*args))
@@ -1,7 +1,11 @@
+import pickle
 import numpy
+import openalea.astk.sky_map as sky_map_module
 from openalea.astk.sky_map import (sky_grid, cell_boundaries, scale_sky,
                                    sky_map, sky_hi, sky_ni, uniform_sky,
-                                   surfacic_irradiance)
+                                   surfacic_irradiance, ksi_grid, SkyGrid,
+                                   rotate_azimuth, SkyAggregator,
+                                   closest_point, sky_aggregator)
 from openalea.astk.sky_sources import regular_sky, sky_turtle
 
 
@@ -19,6 +23,32 @@ def test_sky_grid():
     numpy.testing.assert_almost_equal(sr_c.sum(), 2 * numpy.pi, decimal=2)
 
 
+def test_sky_grid_cache():
+    grid = sky_grid(10, 10)
+    assert isinstance(grid, SkyGrid)
+    az_c, z_c, sr_c = grid
+    numpy.testing.assert_allclose(grid.hi_weights, sr_c * numpy.cos(numpy.radians(z_c)))
+    numpy.testing.assert_allclose(numpy.linalg.norm(grid.directions, axis=-1), 1)
+    assert grid.hi_weights is grid.hi_weights
+    # plain tuples are still accepted
+    lum = numpy.ones_like(az_c)
+    numpy.testing.assert_allclose(sky_hi((az_c, z_c, sr_c), lum), sky_hi(grid, lum))
+    numpy.testing.assert_allclose(ksi_grid((az_c, z_c, sr_c), 30, 60), ksi_grid(grid, 30, 60))
+    copy = pickle.loads(pickle.dumps(grid))
+    assert isinstance(copy, SkyGrid)
+    numpy.testing.assert_allclose(copy.hi_weights, grid.hi_weights)
+
+
+def test_rotate_azimuth():
+    grid = sky_grid()
+    ksi = ksi_grid(grid, 30, 0)
+    numpy.testing.assert_allclose(rotate_azimuth(grid, ksi, 45), ksi_grid(grid, 30, 45), atol=1e-9)
+    rotated = rotate_azimuth(grid, numpy.stack([ksi, ksi]), [45, 200.5])
+    numpy.testing.assert_allclose(rotated, ksi_grid(grid, [30, 30], [45, 200.5]), atol=0.1)
+    rotated = rotate_azimuth(grid, ksi[numpy.newaxis], [45, 90], index=[0, 0])
+    numpy.testing.assert_allclose(rotated[1], ksi_grid(grid, 30, 90), atol=1e-9)
+
+
 def test_cell_boundaries():
     grid = sky_grid()
     az, z = cell_boundaries(grid)
@@ -92,6 +122,49 @@ def test_sky_map():
     numpy.testing.assert_almost_equal(hi_newlum.sum(), hi_ref, decimal=2)
 
 
+def test_sky_aggregator():
+    grid, lum = uniform_sky()
+    lums = numpy.stack([lum, ksi_grid(grid, 30, 45), ksi_grid(grid, 60, 200)])
+    dirs = sky_turtle(46)
+    aggregator = SkyAggregator(grid, dirs)
+    lum_agg = aggregator.aggregate(lums, force_hi=True)
+    assert lum_agg.shape == (3, 46)
+    new_lum = aggregator.project(lum_agg)
+    assert new_lum.shape == (3,) + grid[0].shape
+    for i, l in enumerate(lums):
+        agg, grid_agg, new = sky_map(grid, l, dirs, force_hi=True)
+        numpy.testing.assert_allclose(lum_agg[i], agg)
+        numpy.testing.assert_allclose(new_lum[i], new)
+        numpy.testing.assert_almost_equal(sky_hi(grid_agg, agg).sum(), sky_hi(grid, l).sum())
+    # cached aggregators are not shared by grids with other solid angles
+    az_c, z_c, sr_c = grid
+    _, grid_agg, _ = sky_map(grid, lum, dirs)
+    numpy.testing.assert_almost_equal(grid_agg[2].sum(), 2 * numpy.pi)
+    _, grid_agg, _ = sky_map((az_c, z_c, 2 * sr_c), lum, dirs)
+    numpy.testing.assert_almost_equal(grid_agg[2].sum(), 4 * numpy.pi)
+
+
+def test_closest_point(monkeypatch):
+    grid = sky_grid()
+    dirs = numpy.array(sky_turtle(136))
+    points = numpy.stack([dirs[:, 1], 90 - dirs[:, 0]], axis=1)
+    grid_points = numpy.stack([grid[0], grid[1]], axis=2)
+    closest = closest_point(grid_points, points)
+    assert closest.shape == grid[0].shape
+    monkeypatch.setattr(sky_map_module, 'cKDTree', None)
+    numpy.testing.assert_array_equal(closest_point(grid_points, points, max_size=10000), closest)
+
+
+def test_spherical_aggregation():
+    grid, lum = uniform_sky()
+    dirs = sky_turtle(46)
+    aggregator = SkyAggregator(grid, dirs, metric='spherical')
+    numpy.testing.assert_allclose(aggregator.aggregate(lum), 1)
+    numpy.testing.assert_almost_equal(aggregator.grid_agg.sr_c.sum(), 2 * numpy.pi, decimal=2)
+    # cached aggregators are reused
+    assert sky_aggregator(grid, dirs) is sky_aggregator(grid, dirs)
+
+
 def test_surfacic_irradiance():
     grid, lum = uniform_sky()
     hi_ref = sky_hi(grid, lum).sum()
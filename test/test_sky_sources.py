@@ -1,10 +1,14 @@
 import numpy
 
 from openalea.astk.sky_irradiance import sky_irradiance
+from openalea.astk.sky_luminance import sky_luminance
+from openalea.astk.sky_map import sky_grid, sky_hi, sky_map
 from openalea.astk.sky_sources import (
     regular_sky,
     sky_turtle,
     sky_sources,
+    SkySourcesEngine,
+    source_hi,
     source_ni)
 
 
@@ -23,8 +27,10 @@ def test_sky_turtle():
     assert len(sky_dirs) == 136
     sky_dirs = sky_turtle(500)
     assert len(sky_dirs) == 556
-    sky_dirs = sky_turtle(1000)
+    sky_dirs = sky_turtle(976)
     assert len(sky_dirs) == 976
+    sky_dirs = sky_turtle(1000)
+    assert len(sky_dirs) == 1226
 
 
 def test_regular_sky():
@@ -92,3 +98,33 @@ def test_sky_sources():
     numpy.testing.assert_almost_equal(delta_cs / delta_soc, 14.6, decimal=1)
 
 
+def _reference_sources(sky_type, sky_irradiance, north):
+    """sun and sky sources computed along the sky_luminance, sky_map pipeline"""
+    def _normalise_angle(angle):
+        return (north - numpy.array(angle, dtype=float)) % 360
+
+    grid = sky_grid()
+    sun, sky = sky_luminance(grid, sky_type=sky_type, sky_irradiance=sky_irradiance, scale='global')
+    sky_dirs = sky_turtle()
+    sky_agg, grid_agg, _ = sky_map(grid, sky, sky_dirs, force_hi=True)
+    elevation, azimuth = zip(*sky_dirs)
+    sky_ref = list(zip(elevation, _normalise_angle(azimuth), sky_hi(grid_agg, sky_agg)))
+    if len(sun) > 0:
+        elevation, azimuth, _ = zip(*sun)
+        sun = list(zip(elevation, _normalise_angle(azimuth), source_hi(sun)))
+    return sun, sky_ref
+
+
+def test_sky_sources_engine():
+    sky_irr = sky_irradiance()
+    engine = SkySourcesEngine(north=-90)
+    assert engine.calls == 0
+    for sky_type in ('soc', 'sun_soc', 'blended'):
+        sun, sky = engine.sources(sky_type, sky_irradiance=sky_irr, scale='global')
+        sun_ref, sky_ref = _reference_sources(sky_type, sky_irr, north=-90)
+        numpy.testing.assert_allclose(sky, sky_ref)
+        if len(sun_ref) > 0:
+            numpy.testing.assert_allclose(sun, sun_ref)
+    assert engine.calls == 3
+    for stage in ('grid', 'directions', 'aggregator', 'luminance', 'aggregation', 'sources'):
+        assert engine.timings[stage] >= 0
@@ -0,0 +1,75 @@
+import os
+import numpy
+import pandas
+from openalea.astk.solar_geometry import SolarGeometryStore
+from openalea.astk.sky_irradiance import (
+    clear_sky_irradiances,
+    actual_sky_irradiances,
+    sky_irradiance)
+
+
+def test_store(tmp_path):
+    store = SolarGeometryStore(directory=str(tmp_path))
+    table = store.table(2000)
+    assert isinstance(table, numpy.memmap)
+    assert table.shape == (366 * 24, 5)
+    assert len(os.listdir(str(tmp_path))) == 1
+
+    df = store.sun_position(daydate='2000-06-21')
+    assert len(df) == 15
+    assert list(df.columns) == list(SolarGeometryStore.fields)
+    # dates off the grid are computed
+    dates = pandas.date_range('2000-06-21 00:30', periods=24, freq='h', tz='Europe/Paris')
+    assert store.geometry(dates) is None
+    off = store.sun_position(dates=dates)
+    assert len(off) == 15
+
+    # a new store reads tables from disk
+    store = SolarGeometryStore(directory=str(tmp_path))
+    numpy.testing.assert_array_equal(store.table(2000), table)
+
+
+def test_store_irradiances(tmp_path):
+    store = SolarGeometryStore(directory=str(tmp_path))
+    for with_pvlib in (True, False):
+        numpy.testing.assert_allclose(clear_sky_irradiances(store=store, with_pvlib=with_pvlib),
+                                      clear_sky_irradiances(with_pvlib=with_pvlib))
+        numpy.testing.assert_allclose(actual_sky_irradiances(store=store, with_pvlib=with_pvlib),
+                                      actual_sky_irradiances(with_pvlib=with_pvlib))
+    # dates spanning two years
+    dates = pandas.date_range('2000-12-31', '2001-01-02', freq='h', tz='Europe/Paris')
+    expected = sky_irradiance(dates=dates)
+    df = sky_irradiance(dates=dates, store=store)
+    numpy.testing.assert_allclose(df, expected)
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_solar_geometry(monkeypatch):
+    import openalea.astk.solar_geometry as sg
+    expected = sky_irradiance()
+    expected_no_pvlib = sky_irradiance(with_pvlib=False)
+    calls = {'sun_position': 0, 'sun_extraradiation': 0}
+
+    def counted(name):
+        f = getattr(sg, name)
+
+        def _f(*args, **kwds):
+            calls[name] += 1
+            return f(*args, **kwds)
+        return _f
+
+    for name in calls:
+        monkeypatch.setattr(sg, name, counted(name))
+    geometry = sg.SolarGeometry()
+    df = sky_irradiance(geometry=geometry)
+    numpy.testing.assert_allclose(df, expected)
+    assert calls == {'sun_position': 1, 'sun_extraradiation': 1}
+    # clear sky ghi are used
+    df = sky_irradiance(geometry=sg.SolarGeometry(), with_pvlib=False)
+    numpy.testing.assert_allclose(df, expected_no_pvlib)
+    assert calls == {'sun_position': 2, 'sun_extraradiation': 2}
+
+    night = geometry.with_night()
+    assert len(night) == 24
+    day = night.subset(night.elevation > 0)
+    numpy.testing.assert_array_equal(day.dni_extra, geometry.dni_extra)
@@ -1,11 +1,24 @@
 import numpy
+import pandas
 
 from openalea.astk.sun_position import (
     sun_position, 
-    sun_extraradiation)
+    sun_positions,
+    sun_extraradiation,
+    available_backends,
+    calibrate_backends,
+    get_backend,
+    set_backend)
 from openalea.astk.sun_position_astk import (
     sun_position as sun_position_astk, 
-    sun_extraradiation as sun_extraradiation_astk)
+    sun_extraradiation as sun_extraradiation_astk,
+    ephemeris,
+    sun_positions as sun_positions_astk,
+    approximate_sun_position,
+    sun_elevation,
+    sun_azimuth,
+    hour_angle,
+    eot)
 
 
 
@@ -24,4 +37,88 @@ def test_alternative_sun_position():
 def test_extra_radiation():
     df = sun_extraradiation()
     dfa = sun_extraradiation_astk()
-    numpy.testing.assert_allclose(dfa, df, rtol=0.01)
\ No newline at end of file
+    numpy.testing.assert_allclose(dfa, df, rtol=0.01)
+
+
+def test_ephemeris():
+    hUTC = numpy.linspace(0, 23.5, 48)
+    dayofyear = numpy.repeat([15, 172], 24)
+    eph = ephemeris(hUTC, dayofyear, 2020, latitude=43.36, longitude=3.52)
+    numpy.testing.assert_array_equal(
+        eph['elevation'], sun_elevation(hUTC, dayofyear, 2020, 43.36, 3.52))
+    numpy.testing.assert_array_equal(
+        eph['azimuth'], sun_azimuth(hUTC, dayofyear, 2020, 43.36, 3.52))
+    numpy.testing.assert_array_equal(
+        eph['hour_angle'], hour_angle(hUTC, dayofyear, 2020, 3.52))
+    numpy.testing.assert_array_equal(eph['eot'], eot(hUTC, dayofyear, 2020))
+
+
+def test_sun_positions():
+    latitude = [43.36, -20, 60]
+    longitude = [3.52, 55.5, -150]
+    altitude = [56, 1000, 0]
+    for positions, single in ((sun_positions, sun_position),
+                              (sun_positions_astk, sun_position_astk)):
+        sun = positions(latitude=latitude, longitude=longitude,
+                        altitude=altitude)
+        assert sun['elevation'].shape == (3, 24)
+        assert len(sun['dates']) == 24
+        for i in range(3):
+            df = single(latitude=latitude[i], longitude=longitude[i],
+                        altitude=altitude[i], filter_night=False)
+            numpy.testing.assert_array_equal(sun['elevation'][i], df['elevation'])
+            numpy.testing.assert_array_equal(sun['azimuth'][i], df['azimuth'])
+            numpy.testing.assert_array_equal(sun['zenith'][i], df['zenith'])
+    # multi-site positions follow the sun position backend
+    for backend, single in (('astk', sun_position_astk),
+                            ('approximate', approximate_sun_position),
+                            ('ephemeris', None)):
+        try:
+            set_backend(backend)
+            sun = sun_positions(latitude=latitude, longitude=longitude,
+                                altitude=altitude)
+        finally:
+            set_backend('nrel_numpy')
+        assert sun['elevation'].shape == (3, 24)
+        for i in range(3):
+            if single is None:
+                df = sun_position(latitude=latitude[i], longitude=longitude[i],
+                                  altitude=altitude[i], filter_night=False,
+                                  backend=backend)
+            else:
+                df = single(latitude=latitude[i], longitude=longitude[i],
+                            altitude=altitude[i], filter_night=False)
+            numpy.testing.assert_allclose(sun['elevation'][i], df['elevation'], atol=1e-10)
+            numpy.testing.assert_allclose(sun['azimuth'][i], df['azimuth'], atol=1e-10)
+            numpy.testing.assert_allclose(sun['zenith'][i], df['zenith'], atol=1e-10)
+
+
+def test_backends():
+    assert {'nrel_numpy', 'ephemeris', 'astk', 'approximate'} <= set(available_backends())
+    numpy.testing.assert_array_equal(sun_position(backend='astk'),
+                                     sun_position_astk())
+    report = calibrate_backends(tolerance=0.05, repeat=1)
+    assert report.loc['nrel_numpy', 'max_error'] < 1e-6
+    assert report.loc['astk', 'max_error'] < 1
+    assert get_backend() == 'nrel_numpy'
+    try:
+        report = calibrate_backends(tolerance=0.05, repeat=1, select=True)
+        assert report.loc[get_backend(), 'max_error'] <= 0.05
+        assert report.loc[get_backend(), 'time'] <= report.loc['nrel_numpy', 'time']
+    finally:
+        set_backend('nrel_numpy')
+
+
+def test_approximate_sun_position():
+    dates = pandas.date_range('1950-01-01', '2101-01-01', freq='97h', tz='UTC')
+    for latitude, longitude, altitude in ((43.36, 3.52, 56), (-33.9, 18.4, 1500), (66, -150, 0)):
+        sun = sun_position(dates, latitude=latitude, longitude=longitude,
+                           altitude=altitude, filter_night=False)
+        approx = approximate_sun_position(dates, latitude=latitude,
+                                          longitude=longitude,
+                                          altitude=altitude, filter_night=False)
+        day = sun['elevation'] > 0
+        el, az = numpy.radians(sun.loc[day, ['elevation', 'azimuth']].values.T)
+        ael, aaz = numpy.radians(approx.loc[day, ['elevation', 'azimuth']].values.T)
+        cos_angle = numpy.sin(el) * numpy.sin(ael) + numpy.cos(el) * numpy.cos(ael) * numpy.cos(az - aaz)
+        assert numpy.degrees(numpy.arccos(numpy.minimum(cos_angle, 1))).max() < 0.02